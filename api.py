@@ -0,0 +1,117 @@
+import hmac
+import logging
+from flask import Blueprint, request, jsonify
+import config
+import capacity
+import submission
+from status_store import get_status_many
+
+logger = logging.getLogger(__name__)
+
+# JSON API for group submissions and ops dashboards. Every request needs
+# `Authorization: Bearer <API_TOKEN>`; without API_TOKEN set the API is off.
+
+api_bp = Blueprint("api", __name__, url_prefix="/api")
+
+
+@api_bp.before_request
+def check_token():
+    if not config.API_TOKEN:
+        return jsonify({"error": "The API is disabled."}), 404
+    scheme, _, token = request.headers.get("Authorization", "").partition(" ")
+    if scheme.lower() != "bearer" or not hmac.compare_digest(token.strip(), config.API_TOKEN):
+        return jsonify({"error": "A valid API token is required."}), 401
+
+def _batch(body, field):
+    """
+    Returns body[field] if it is a non-empty list within API_MAX_BATCH, else raises ValueError.
+    """
+    items = body.get(field) if isinstance(body, dict) else None
+    if not isinstance(items, list) or not items:
+        raise ValueError(f"{field} must be a non-empty list")
+    if len(items) > config.API_MAX_BATCH:
+        raise ValueError(f"At most {config.API_MAX_BATCH} {field} per request")
+    return items
+
+@api_bp.route('/jobs', methods=['POST'])
+def submit_jobs():
+    """
+    Submit many swap jobs at once:
+
+        {"jobs": [{"username": "...", "password": "...",
+                   "swaps": [{"old_index": "80270", "new_indexes": ["80271", "80272"]}]}]}
+
+    Every job is validated before any is started; one invalid job rejects the
+    whole request with a 400 listing the errors by position.
+    """
+    try:
+        jobs = _batch(request.get_json(silent=True), "jobs")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # 1) Validate everything first
+    validated, errors, usernames = [], [], set()
+    for i, job in enumerate(jobs):
+        try:
+            if not isinstance(job, dict):
+                raise ValueError("Job must be an object")
+            username, password = job.get("username"), job.get("password")
+            if not isinstance(username, str) or not username.strip() or not isinstance(password, str) or not password:
+                raise ValueError("username and password are required")
+            username = username.strip()
+            if username in usernames:
+                raise ValueError(f"{username} has more than one job in this request")
+            usernames.add(username)
+            validated.append((username, password, submission.swap_items_from(job.get("swaps"))))
+        except ValueError as e:
+            errors.append({"job": i, "error": str(e)})
+    if errors:
+        return jsonify({"errors": errors}), 400
+
+    # 2) Start, queue or park each job; stop at the first one the queue has no room for
+    results = []
+    for i, (username, password, swap_items) in enumerate(validated):
+        try:
+            swap_id, status_data = submission.submit(username, password, swap_items)
+        except capacity.CapacityFull:
+            results.extend({"job": j, "error": "The queue is full."} for j in range(i, len(validated)))
+            break
+        results.append({"job": i, "swap_id": swap_id, "status": status_data["status"], "message": status_data["message"]})
+
+    accepted = sum("swap_id" in result for result in results)
+    logger.info(f"Bulk submission: {accepted} of {len(validated)} jobs accepted.")
+    if not accepted:
+        return jsonify({"jobs": results}), 429, {"Retry-After": "60"}
+    return jsonify({"jobs": results}), 202
+
+@api_bp.route('/status', methods=['POST'])
+def batch_status():
+    """
+    Status of many jobs in one pipelined Redis round trip:
+
+        {"swap_ids": ["..."], "details": false}
+
+    Returns {swap_id: {"status", "message", "modules", "swapped"}} (plus "details"
+    when asked for), or null for jobs that do not exist or have expired.
+    """
+    body = request.get_json(silent=True)
+    try:
+        swap_ids = [str(swap_id) for swap_id in _batch(body, "swap_ids")]
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    with_details = bool(body.get("details"))
+
+    results = {}
+    for swap_id, status_data in get_status_many(swap_ids).items():
+        if status_data is None:
+            results[swap_id] = None
+            continue
+        results[swap_id] = {
+            "status": status_data["status"],
+            "message": status_data["message"],
+            "modules": len(status_data["details"]),
+            "swapped": sum(detail["swapped"] for detail in status_data["details"])
+        }
+        if with_details:
+            results[swap_id]["details"] = status_data["details"]
+    return jsonify(results)
@@ -1,66 +1,50 @@
-import redis
-import json
-from flask import Flask, request, jsonify, render_template, redirect, session, url_for, send_from_directory
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait, Select
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.chrome.service import Service
-from selenium.common.exceptions import TimeoutException, WebDriverException, SessionNotCreatedException
-from threading import Event
-import threading
-import time
+from flask import Flask, Blueprint, Response, request, jsonify, render_template, redirect, session, url_for, send_from_directory
 import logging
-import os
-import subprocess
-from dotenv import load_dotenv
 from datetime import datetime
+import config
+import flight_recorder
+from status_store import (
+    redis_client, get_status_data, get_status_version, get_status_history, update_overall_status, delete_status_data
+)
+from status_stream import broadcaster
+import job_queue
+import vacancy_cache
+import capacity
+import session_cache
+import submission
+from api import api_bp
+import metrics
+
+# Importing this module has no side effects: the app is built by create_app(),
+# engines (and Selenium) are imported on first use, and Chrome/ChromeDriver
+# versions are checked by the separate `python healthcheck.py` command.
 
-def check_chrome_versions():
-    try:
-        chrome_version = subprocess.run(["google-chrome", "--version"], capture_output=True, text=True)
-        chromedriver_version = subprocess.run(["chromedriver", "--version"], capture_output=True, text=True)
-        
-        print("Google Chrome Version:", chrome_version.stdout.strip())
-        print("ChromeDriver Version:", chromedriver_version.stdout.strip())
-    except Exception as e:
-        print("Error checking Chrome versions:", str(e))
-
-check_chrome_versions()  # Run on startup
+logger = logging.getLogger(__name__)
 
-# Load environment variables manually (if needed)
-load_dotenv()
+bp = Blueprint("main", __name__)
 
-# Explicitly fetch the secret key
-flask_secret = os.getenv("FLASK_SECRET_KEY", "fallback_key_for_dev")
-app = Flask(__name__)
-app.config["SECRET_KEY"] = flask_secret
 
-print(f"Loaded Secret Key: {app.config['SECRET_KEY'][:10]}********")
+def create_app():
+    """
+    Build the Flask app. Gunicorn runs it with `app:create_app()`.
+    """
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = config.FLASK_SECRET_KEY
 
-# Configure logging
-logging.basicConfig(
-    level=logging.INFO,  # Set to DEBUG for more detailed logs
-    format="%(asctime)s [%(levelname)s] %(message)s",
-    handlers=[
-        logging.StreamHandler()  # Outputs logs to the console, which Docker captures
-    ]
-)
+    # Configure logging: JSON lines written to the console from a background thread
+    flight_recorder.setup_logging(logging.INFO)  # Set to DEBUG for more detailed logs
 
-# Example logger usage
-logger = logging.getLogger(__name__)
+    app.register_blueprint(bp)
+    app.register_blueprint(api_bp)
+    return app
 
-# Connect to Redis (Read from Environment Variables)
-redis_client = redis.StrictRedis(
-    host=os.environ.get("REDIS_HOST", "red-cug9uopopnds7398r2kg"),
-    port=int(os.environ.get("REDIS_PORT", 6379)),
-    password=os.environ.get("REDIS_PASSWORD", None),
-    decode_responses=True
-)
 
+@bp.route('/healthz')
+def healthz():
+    # Readiness probe: answers as soon as the worker can serve requests, without touching Redis or Chrome
+    return jsonify({"status": "ok"})
 
-@app.route('/test-redis')
+@bp.route('/test-redis')
 def test_redis():
     try:
         redis_client.set("test_key", "Hello, Redis!")
@@ -69,15 +53,7 @@ def test_redis():
     except Exception as e:
         return f"Redis connection error: {str(e)}"
 
-# Utility function to set and get status data from Redis
-def set_status_data(swap_id, data):
-    redis_client.set(swap_id, json.dumps(data))
-
-def get_status_data(swap_id):
-    data = redis_client.get(swap_id)
-    return json.loads(data) if data else {"status": "idle", "details": []}
-
-@app.route('/thumbnail')
+@bp.route('/thumbnail')
 def serve_thumbnail():
     # Serve the image from the "static" directory
     return send_from_directory('static', 'thumbnail.jpg')
@@ -91,78 +67,30 @@ def validate_login():
         return True
     return False
 
-CHROME_BINARY_PATH = "/usr/bin/google-chrome"
-CHROMEDRIVER_PATH = "/usr/local/bin/chromedriver"
-
-def create_driver():
-    """
-    Create and return a new Selenium WebDriver instance.
-    """
-    options = Options()
-    options.binary_location = CHROME_BINARY_PATH
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')  # Avoid shared memory crashes
-    options.add_argument('--window-size=1920x1080')  # Optional, for better rendering
-
-    service = Service(CHROMEDRIVER_PATH)
-    return webdriver.Chrome(service=service, options=options)
-
-def login_to_portal(driver, username, password, swap_id):
-    """
-    Log in to the NTU portal.
-    """
-    url = 'https://wish.wis.ntu.edu.sg/pls/webexe/ldap_login.login?w_url=https://wish.wis.ntu.edu.sg/pls/webexe/aus_stars_planner.main'
-    driver.get(url)
-
-    username_field = driver.find_element(By.ID, "UID")
-    username_field.send_keys(username)
-    ok_button = driver.find_element(By.XPATH, "//input[@value='OK']")
-    ok_button.click()
-
-    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, "PW")))
-
-    password_field = driver.find_element(By.ID, "PW")
-    password_field.send_keys(password)
-    ok_button = driver.find_element(By.XPATH, "//input[@value='OK']")
-    ok_button.click()
-
-    # Check if login is successful or redirected to a different page
-    try:
-        # Wait for the URL to either be the expected URL or the alternate URL
-        WebDriverWait(driver, 10).until(
-        lambda d: d.current_url in [
-            "https://wish.wis.ntu.edu.sg/pls/webexe/AUS_STARS_PLANNER.planner",
-            "https://wish.wis.ntu.edu.sg/pls/webexe/AUS_STARS_PLANNER.time_table"
-        ]
-    )
-        
-        # Check if redirected to the time_table URL
-        if driver.current_url == "https://wish.wis.ntu.edu.sg/pls/webexe/AUS_STARS_PLANNER.time_table":
-            # Check for the "Plan/ Registration" button
-            try:
-                plan_button = driver.find_element(By.XPATH, "//input[@value='Plan/ Registration']")
-                plan_button.click()
-                logger.info("Clicked the 'Plan/ Registration' button to proceed to the planner.")
-            except Exception as e:
-                error_message = "Unable to find or click the 'Plan/ Registration' button."
-                update_overall_status(swap_id, status="Error", message=error_message)
-                logger.error(f"{error_message} {e}")
-                return False
-          
-        # Proceed to wait for the table if on the planner page
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.XPATH, "//table[@bordercolor='#E0E0E0']"))
-        )
-    # If login fails, print exception
-    except Exception:
-        # If login fails, update status and exit
-        error_message = "Incorrect username/password. Please try again."
-        update_overall_status(swap_id, status="Error", message=error_message)
-        logger.error(error_message)
-        return False
-
-@app.route('/')
+@bp.route('/driver-pool')
+def driver_pool_stats():
+    # Report pool size, wait time and hit rate
+    if config.SWAP_ENGINE != "selenium":
+        return jsonify({"error": "Driver pool is only used by the selenium engine."}), 404
+    from engines.selenium_engine import get_driver_pool
+    return jsonify(get_driver_pool().stats())
+
+@bp.route('/metrics')
+def metrics_endpoint():
+    # Prometheus scrape endpoint for step timings, job/browser gauges and Redis latency
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+@bp.route('/capacity')
+def capacity_stats():
+    # Report job slots, queue length and memory budget
+    return jsonify(capacity.utilisation())
+
+@bp.route('/vacancy-cache')
+def vacancy_cache_stats():
+    # Report hit rate and age of the shared vacancy cache
+    return jsonify(vacancy_cache.stats())
+
+@bp.route('/')
 def index():
     # Open Graph metadata
     og_data = {
@@ -196,7 +124,7 @@ def index():
     message = session.pop('logout_message', None)
     return render_template('index.html', message=message, og_data=og_data)
 
-@app.route('/input-index', methods=['POST'])
+@bp.route('/input-index', methods=['POST'])
 def input_index():
     try:
         session['username'] = request.form['username']
@@ -210,7 +138,7 @@ def input_index():
         logger.error(f"Error in input_index: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-@app.route('/swap-status', methods=['GET'])
+@bp.route('/swap-status', methods=['GET'])
 def render_swap_status():
     # Validate login
     if not validate_login():
@@ -220,23 +148,97 @@ def render_swap_status():
     swap_id = session.get("swap_id")
     if not swap_id:
         return jsonify({"status": "idle", "details": [], "message": None})
-    
+
+    # Answer unchanged polls from the version counter alone, without reading the whole status
+    etag = None
+    position = None
+    version, status = get_status_version(swap_id)
+    if version is not None:
+        etag = f"{swap_id}.{version}"
+        if status == capacity.QUEUED_STATUS:
+            # The queue position is not part of the stored status, so it is part of the ETag
+            position = capacity.queue_position(swap_id)
+            etag += f".{position or 0}"
+        if etag in request.if_none_match:
+            response = Response(status=304)
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "no-cache"
+            return response
+
+    # A write between the two reads only makes the next poll fetch again
     status_data = get_status_data(swap_id)
-    
+    if status_data.get("status") == capacity.QUEUED_STATUS:
+        if position is None:
+            position = capacity.queue_position(swap_id)
+        if position:
+            status_data["message"] = capacity.queue_message(position)
+
     # Return status data as JSON for dynamic updates
-    return jsonify(status_data)
+    response = jsonify(status_data)
+    if etag:
+        response.set_etag(etag)
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+@bp.route('/swap-status/stream', methods=['GET'])
+def stream_swap_status():
+    """
+    Pushes status updates to the status page as Server-Sent Events.
+    The page falls back to polling /swap-status if this is unavailable.
+    """
+    # Validate login
+    if not validate_login():
+        return jsonify({"error": "You are not logged in."}), 401
+
+    swap_id = session.get("swap_id")
+    if not swap_id:
+        return jsonify({"status": "idle", "details": [], "message": None})
+
+    # Each stream holds a thread for minutes; past the cap the page falls back to polling
+    if not broadcaster.open_stream():
+        return jsonify({"error": "Too many open status streams; poll /swap-status instead."}), 503
 
-@app.route('/swap-index', methods=['POST'])
+    response = Response(
+        broadcaster.stream(swap_id, config.STATUS_STREAM_SECONDS),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    # Runs however the response ends: stream finished, browser gone, or never started
+    response.call_on_close(broadcaster.close_stream)
+    return response
+
+@bp.route('/swap-status/history', methods=['GET'])
+def swap_status_history():
+    """
+    Pages through the status changes of the current swap session, newest first.
+    Pass the returned `next` as `before` to get the following page.
+    """
+    # Validate login
+    if not validate_login():
+        return jsonify({"error": "You are not logged in."}), 401
+
+    swap_id = session.get("swap_id")
+    if not swap_id:
+        return jsonify({"events": [], "next": None})
+
+    before = request.args.get("before")
+    if before and not before.replace("-", "", 1).isdigit():
+        return jsonify({"error": "before must be an event id."}), 400
+    count = min(max(request.args.get("count", 50, type=int), 1), 200)
+    events = get_status_history(swap_id, before=before, count=count)
+    return jsonify({"events": events, "next": events[-1]["id"] if len(events) == count else None})
+
+@bp.route('/swap-index', methods=['POST'])
 def swap_index():
     # Check if user is logged in
     if 'username' not in session or 'password' not in session:
-        return redirect(url_for('index'))
+        return redirect(url_for('.index'))
     
     try:
         # Get form data
         number_of_modules = request.form.get('number_of_modules')
         if not number_of_modules:
-            app.logger.error("number_of_modules not found in form data")
+            logger.error("number_of_modules not found in form data")
             raise ValueError("Number of modules not provided")
             
         number_of_modules = int(number_of_modules)
@@ -251,7 +253,7 @@ def swap_index():
                 raise ValueError(f"Missing index data for module {i+1}")
             
             # Parse new indexes into a list
-            new_indexes = [index.strip() for index in new_indexes_raw.split(",") if index.strip()]
+            new_indexes = submission.parse_new_indexes(new_indexes_raw)
             if not new_indexes:
                 raise ValueError(f"Invalid new index data for module {i+1}")
             
@@ -261,336 +263,23 @@ def swap_index():
                 "swapped": False
             })
         
-        # Generate a unique ID for this swap session
-        swap_id = f"{session['username']}_{int(time.time())}"
+        try:
+            swap_id, status_data = submission.submit(session['username'], session['password'], swap_items)
+        except capacity.CapacityFull:
+            message = "All swap slots are busy and the queue is full. Please try again in a few minutes."
+            return render_template('error.html', message=message), 429, {"Retry-After": "60"}
         session["swap_id"] = swap_id
 
-         # Initialize Redis with status data
-        status_data = {
-            "status": "Processing",
-            "details": [{"old_index": item["old_index"], 
-                         "new_indexes": ", ".join(item["new_indexes"]), 
-                         "swapped": False,
-                         "message": "Pending..."} for item in swap_items],
-            "message": None
-        }
-        set_status_data(swap_id, status_data)
-        
-        username = session['username']
-        password = session['password']
-        
-        thread = threading.Thread(target=perform_swaps, args=(username, password, swap_items, swap_id), daemon=True)
-        thread.start()
-
         # Render the status page initially
         return render_template('swap_status.html',
                                status=status_data["status"],
                                details=status_data["details"],
                                message=status_data["message"])
     except Exception as e:
-        app.logger.error(f"Error in swap_index: {str(e)}")
+        logger.error(f"Error in swap_index: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
-def perform_swaps(username, password, swap_items, swap_id):
-    driver = None
-
-    try:
-        # Browser setup
-        driver = create_driver()
-        login_to_portal(driver, username, password, swap_id)
-
-        start_time = time.time()
-        while True:
-            for idx, item in enumerate(swap_items):
-                if not item["swapped"]:
-                    failed_indexes = []
-                    for new_index in item["new_indexes"]:
-                        try:
-                            success, message = attempt_swap(
-                                old_index=item["old_index"],
-                                new_index=new_index,
-                                idx=idx,
-                                driver=driver,
-                                swap_id=swap_id
-                            )
-                            if success:
-                                item["swapped"] = True
-                                update_status(
-                                    swap_id,
-                                    idx,
-                                    message=f"Successfully swapped index {item['old_index']} to {item['new_index']}.",
-                                    success=True
-                                )
-                                break
-                            else:
-                                failed_indexes.append(new_index)
-                        except WebDriverException as e:
-                            logger.error(f"WebDriver error: {e}")
-                            driver.quit()
-                            driver.create_driver() # Restart the browser
-                            login_to_portal(driver, username, password)
-                            failed_indexes.append(new_index)
-                        except Exception as e:
-                            error_message = f"Error during swap attempt: {e}"
-                            update_status(swap_id, idx, message=error_message)
-                            logger.error(error_message)
-                            failed_indexes.append(new_index)
-                    if not item["swapped"] and failed_indexes:
-                        update_status(
-                            swap_id,
-                            idx,
-                            message=f"Index {', '.join(failed_indexes)} have no vacancies."
-                        )
-            # Check if all items are swapped
-            all_swapped = all(item["swapped"] for item in swap_items)
-            if all_swapped:
-                update_overall_status(swap_id, status="Completed", message=f"All modules have been successfully swapped.")
-                break
-
-            if time.time() - start_time >= 2 * 3600:
-                update_overall_status(swap_id, status="Timed Out", message="Time limit reached before completing the swap.")
-                logger.error("Time limit reached before completing the swap.")
-                break
-
-            time.sleep(5 * 60)
-    except Exception as e:
-        update_overall_status(swap_id, status="Error", message=f"An error occurred: {str(e)}")
-        logger.error(f"An error occurred: {str(e)}")
-    finally:
-        if driver:
-            driver.quit()
-
-def attempt_swap(old_index, new_index, idx, driver, swap_id):
-    """
-    Returns True if swap was successful, False otherwise.
-    """    
-    try:
-        update_status(swap_id, idx, f"Attempting to swap {old_index} -> {new_index}")
-        # 1) Wait for the table element to appear on the main page
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.XPATH, "//table[@bordercolor='#E0E0E0']"))
-        )
-
-        # 2) Locate the radio button for old_index by its value attribute and click it.
-        try:
-            # Wait for the radio button to be present
-            WebDriverWait(driver, 10).until(
-                EC.presence_of_element_located((By.XPATH, f"//input[@type='radio' and @value='{old_index}']"))
-            )
-            
-            # Locate and click the radio button
-            radio_button = driver.find_element(By.XPATH, f"//input[@type='radio' and @value='{old_index}']")
-            radio_button.click()
-
-        except TimeoutException:
-            # If the radio button is not found within the timeout period
-            error_message = f"Old index  {old_index} not found. Swap cannot proceed."
-            update_status(swap_id, idx, error_message)
-            update_overall_status(swap_id, status="Error", message=error_message)
-            logger.error(error_message)
-            return False, error_message  # Return a value indicating failure
-
-        except Exception as e:
-            # Handle any unexpected errors
-            error_message = f"Unexpected error locating radio button for index {old_index}: {str(e)}"
-            update_status(swap_id, idx, error_message)
-            logger.error(error_message)
-            return False, error_message  # Return a value indicating failure
-
-        # 3) Select the "Change Index" option from the dropdown
-        dropdown = Select(driver.find_element(By.NAME, "opt"))
-        dropdown.select_by_value("C")
-
-        # 4) Click the 'Go' button
-        header = driver.find_element(By.CLASS_NAME, "site-header__body")
-        driver.execute_script("arguments[0].style.visibility = 'hidden';", header)  # Hide the header
-        go_button = driver.find_element(By.XPATH, "//input[@type='submit' and @value='Go']")
-        go_button.click()
-
-        """
-        Swap index page after choosing the mod and index you want to swap
-        """
-
-        # 5) Check for an alert, if portal is closed
-        try:
-            WebDriverWait(driver, 5).until(EC.alert_is_present())
-            alert = driver.switch_to.alert
-            alert_text = alert.text
-            print(f"Alert detected: {alert_text}")
-            alert.accept()  # Close the alert
-            update_overall_status(swap_id, status="Error", message="Portal is closed now. Please try again from 10:30am - 10:00pm.")
-            logger.error("Portal is closed now. Please try again from 10:30am - 10:00pm.")
-            return False
-        except TimeoutException:
-            # If no alert, proceed to the swap index page
-            print("No alert detected, proceeding to the swap index page.")
-
-        # 6) Wait for the swap index page
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.NAME, "AUS_STARS_MENU"))
-        )
-
-        # 7) Check if the new index exists and has vacancies
-        try:
-            # Locate the dropdown for selecting the new index
-            dropdown_element = driver.find_element(By.NAME, "new_index_nmbr")
-            
-            # Locate the option for the new index
-            options = dropdown_element.find_elements(By.XPATH, f".//option[@value='{new_index}']")
-            
-            if not options:
-                # If the desired new index is not in the dropdown, handle the error
-                error_message = f"New Index {new_index} was not found in the dropdown options. Swap cannot proceed."
-                update_status(swap_id, idx, error_message)
-                logger.error(error_message)
-                
-                # Click the 'Back To Timetable' button
-                back_button = driver.find_element(By.XPATH, "//input[@type='submit' and @value='Back to Timetable']")
-                back_button.click()
-                
-                return False, error_message  # Return a value indicating failure
-
-            # Parse the vacancies from the option text (e.g., "01172 / 9 / 1")
-            option_text = options[0].text
-            try:
-                vacancies = int(option_text.split(" / ")[1])  # Parse out the middle number (vacancies)
-                print(f"The number of vacancies for index {new_index} is {vacancies}.")
-            except (IndexError, ValueError) as e:
-                error_message = f"Failed to parse vacancies for index {new_index}: {str(e)}"
-                update_status(swap_id, idx, error_message)
-                logger.error(error_message)
-
-                # Click the 'Back To Timetable' button
-                back_button = driver.find_element(By.XPATH, "//input[@type='submit' and @value='Back to Timetable']")
-                back_button.click()
-
-                return False, error_message
-
-            # Select the new index in the dropdown
-            select_dropdown = Select(dropdown_element)
-            select_dropdown.select_by_value(new_index)
-
-            if vacancies <= 0:
-                # If there are no vacancies, handle it gracefully
-                error_message = f"Index {new_index} has no vacancies. Swap cannot proceed."
-                update_status(swap_id, idx, error_message)
-                logger.error(error_message)
-
-                # Click the 'Back To Timetable' button
-                back_button = driver.find_element(By.XPATH, "//input[@type='submit' and @value='Back to Timetable']")
-                back_button.click()
-
-                return False, error_message
-
-        except Exception as e:
-            # Catch any unexpected errors
-            error_message = f"Unexpected error while checking new index {new_index}: {str(e)}"
-            update_overall_status(swap_id, status="Error", message=error_message)
-            logger.error(error_message)
-
-            # Click the 'Back To Timetable' button
-            back_button = driver.find_element(By.XPATH, "//input[@type='submit' and @value='Back to Timetable']")
-            back_button.click()
-            
-            return False, error_message
-
-        # 8) Click 'OK'
-        ok_button2 = driver.find_element(By.XPATH, "//input[@type='submit' and @value='OK']")
-        ok_button2.click()
-        
-        # Catch Module Clash error with other existing modules
-        try:
-            WebDriverWait(driver, 5).until(EC.alert_is_present())
-            alert = driver.switch_to.alert
-            alert_text = alert.text
-            print(f"Alert detected: {alert_text}")
-            alert.accept()  # Close the alert
-            update_overall_status(swap_id, status="Error", message=alert_text)
-            logger.error(alert_text)
-
-            # Click the 'Back To Timetable' button
-            back_button = driver.find_element(By.XPATH, "//input[@type='submit' and @value='Back to Timetable']")
-            back_button.click()
-            
-            return False, alert_text
-        except TimeoutException:
-            # If no alert, proceed to the swap index page
-            print("No slot clash alert detected, proceeding to confirm swap index.")
-
-        """
-        Confirm Swap Index page after choosing the mod and index you want to swap
-        """
-
-        # 9) Wait for the confirm swap index page
-        WebDriverWait(driver, 10).until(
-            EC.presence_of_element_located((By.XPATH, "//*[@id='top']/div/section[2]/div/div/form[1]"))
-        )
-
-        # 10) Click the 'Confirm to Change Index Number' button 
-        confirm_change_button = driver.find_element(By.XPATH, "//input[@type='submit' and @value='Confirm to Change Index Number']")
-        confirm_change_button.click()
-
-        # 11) Wait for the official changed index alert to pop up and click OK
-        WebDriverWait(driver, 10).until(
-            EC.alert_is_present()
-        )
-
-        alert = driver.switch_to.alert
-        print(f"Alert text: {alert.text}")
-        alert.accept()      # Accept (click OK) on the alert
-
-        return True, "" # Successful swap, no error message
-    
-    except SessionNotCreatedException as e:
-        logger.error("Session expired. Re-logging in...")
-        driver.quit()
-        driver = create_driver()
-        login_to_portal(driver, session['username'], session['password'], swap_id)
-        return False, "Session expired and was refreshed. Retry swap."
-
-    except Exception as e:
-        current_url = driver.current_url
-        page_title = driver.title
-        error_message = (
-            f"Error during swap attempt for {old_index} -> {new_index}: {e}. "
-            f"Current URL: {current_url}, Page Title: {page_title}"
-        )
-        update_status(swap_id, idx, error_message)
-        logger.error(error_message)
-        return False, error_message
-
-def update_status(swap_id, idx, message, success=False):
-    """
-    Updates the status of a specific module swap in Redis.
-
-    Args:
-        swap_id (str): Unique swap session ID.
-        idx (int): Index of the module in the details list.
-        message (str): Message to update in the status.
-        success (bool): Whether the swap was successful.
-    """
-    status_data = get_status_data(swap_id)
-    if idx < len(status_data["details"]):
-        status_data["details"][idx]["message"] = message
-        if success:
-            status_data["details"][idx]["swapped"] = True
-        set_status_data(swap_id, status_data)
-
-def update_overall_status(swap_id, status, message):
-    """
-    Updates the overall status and message of the swap operation in Redis.
-
-    Args:
-        swap_id (str): Unique swap session ID.
-        status (str): The overall status to set (e.g., "Error", "Completed").
-        message (str): The overall message to set.
-    """
-    status_data = get_status_data(swap_id)  # Fetch current status_data
-    status_data["status"] = status  # Update overall status
-    status_data["message"] = message  # Update overall message
-    set_status_data(swap_id, status_data)  # Save changes back to Redis
-
-@app.route('/stop-swap', methods=['POST'])
+@bp.route('/stop-swap', methods=['POST'])
 def stop_swap():
     """
     Stops the ongoing swap operation and logs the user out.
@@ -601,12 +290,13 @@ def stop_swap():
     swap_id = session.get("swap_id")
     if swap_id:
         # Update status_data in Redis
-        status_data = get_status_data(swap_id)
-        status_data["status"] = "Stopped"
-        status_data["message"] = "The swap operation has been stopped by the user."
-        set_status_data(swap_id, status_data)
+        update_overall_status(swap_id, status="Stopped", message="The swap operation has been stopped by the user.")
         # Clear status data from Redis
-        redis_client.delete(swap_id)  # Remove status data associated with the swap_id
+        delete_status_data(swap_id)  # Remove status data associated with the swap_id
+        session_cache.clear(swap_id)  # Forget the cached portal login
+        capacity.cancel(swap_id)  # Drop it from the queue if it has not started
+        if config.JOB_BACKEND == "redis":
+            job_queue.cancel(swap_id)  # Stop the worker running this job
 
     # Clear user session data
     session.clear() # Clear all session data
@@ -614,7 +304,7 @@ def stop_swap():
 
     return jsonify({"message": "Swap operation stopped. Logging out."})
 
-@app.route('/log-out', methods=['POST'])
+@bp.route('/log-out', methods=['POST'])
 def log_out():
     """
     Clears the user session and logs the user out,
@@ -623,7 +313,11 @@ def log_out():
     swap_id = session.get("swap_id")
     if swap_id:
         # Clear status data from Redis
-        redis_client.delete(swap_id)  # Remove status data associated with the swap_id
+        delete_status_data(swap_id)  # Remove status data associated with the swap_id
+        session_cache.clear(swap_id)
+        capacity.cancel(swap_id)
+        if config.JOB_BACKEND == "redis":
+            job_queue.cancel(swap_id)
 
     session.clear()  # Clear all session data
     session['logout_message'] = "Successfully logged out."
@@ -631,5 +325,6 @@ def log_out():
 
 
 if __name__ == '__main__':
+    app = create_app()
     app.config['DEBUG'] = True
     app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
@@ -0,0 +1,375 @@
+"""
+Offline load test for the web front end.
+
+Starts gunicorn (as in the Dockerfile, with the redis job backend) for each
+workers x threads setting and has N simulated students each load /, fill in
+/input-index, submit /swap-index and then poll /swap-status every few seconds,
+as the status page does when Server-Sent Events are unavailable. Stub swap
+workers in this process claim the submitted jobs from the queue and write
+status updates the way swapper does, so the polls read realistic data, without
+a browser or the portal.
+
+Redis is an in-process fakeredis server unless --redis-host is given (use a
+throwaway local redis-server; it is flushed between runs). Every Redis command
+from gunicorn and the stub workers passes through a counting proxy, giving
+Redis ops/sec for either.
+
+Reports p50/p99 latency per endpoint, requests/sec and Redis ops/sec for each
+setting:
+
+    python benchmarks/load_test.py --users 200 --duration 60 --settings 1x8 1x64 2x32
+    python benchmarks/load_test.py --redis-host 127.0.0.1 --redis-port 6380 --json
+"""
+import argparse
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.startup_time import ROOT, free_port
+from benchmarks.swap_benchmark import percentile
+
+ENDPOINTS = ["/", "/input-index", "/swap-index", "/swap-status"]
+
+
+def start_fake_redis():
+    """
+    Serve fakeredis over TCP from a background thread. Returns (host, port).
+    """
+    try:
+        from fakeredis import TcpFakeServer
+    except ImportError:
+        sys.exit("fakeredis is not installed: pip install fakeredis, or pass --redis-host for a local redis-server.")
+    server = TcpFakeServer(("127.0.0.1", 0), server_type="redis")
+    server.daemon_threads = True
+    accept = server.get_request
+
+    def get_request():
+        # Reply without Nagle delays, as redis-server does; pipelined replies otherwise stall on delayed ACKs
+        sock, address = accept()
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return sock, address
+
+    server.get_request = get_request
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server.server_address
+
+
+class CountingProxy:
+    """
+    TCP proxy in front of Redis that counts the commands sent through it.
+    """
+
+    def __init__(self, upstream):
+        self.upstream = upstream
+        self.commands = 0
+        self.lock = threading.Lock()
+        self.listener = socket.socket()
+        self.listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.listener.bind(("127.0.0.1", 0))
+        self.listener.listen(512)
+        self.port = self.listener.getsockname()[1]
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            client, _ = self.listener.accept()
+            server = socket.create_connection(self.upstream)
+            for sock in (client, server):
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            threading.Thread(target=self._pump, args=(client, server, True), daemon=True).start()
+            threading.Thread(target=self._pump, args=(server, client, False), daemon=True).start()
+
+    def _pump(self, source, target, count):
+        buffer = b""
+        try:
+            while True:
+                data = source.recv(65536)
+                if not data:
+                    break
+                target.sendall(data)
+                if count:
+                    buffer = self._count(buffer + data)
+        except OSError:
+            pass
+        finally:
+            for sock in (source, target):
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+                sock.close()
+
+    def _count(self, buffer):
+        """
+        Count the complete RESP commands at the start of buffer and return the rest.
+        """
+        commands = 0
+        while buffer:
+            end = buffer.find(b"\r\n")
+            if end < 0:
+                break
+            if not buffer.startswith(b"*"):
+                # Inline command, one per line
+                buffer = buffer[end + 2:]
+                commands += 1
+                continue
+            pos, complete = end + 2, True
+            for _ in range(int(buffer[1:end])):
+                line_end = buffer.find(b"\r\n", pos)
+                if line_end < 0:
+                    complete = False
+                    break
+                pos = line_end + 2 + int(buffer[pos + 1:line_end]) + 2
+                if pos > len(buffer):
+                    complete = False
+                    break
+            if not complete:
+                break
+            buffer = buffer[pos:]
+            commands += 1
+        with self.lock:
+            self.commands += commands
+        return buffer
+
+
+class StubWorkers(threading.Thread):
+    """
+    Claims jobs from the Redis queue like worker.py, but "runs" each one by
+    writing a status update per module every update_interval seconds and
+    swapping a module with probability swap_chance per check.
+    """
+
+    def __init__(self, update_interval, swap_chance):
+        super().__init__(daemon=True)
+        self.update_interval = update_interval
+        self.swap_chance = swap_chance
+        self.stopping = threading.Event()
+        self.jobs = []
+
+    def run(self):
+        import job_queue
+        while not self.stopping.is_set():
+            job = job_queue.claim("loadtest")
+            if job:
+                thread = threading.Thread(target=self._run_job, args=(job,), daemon=True)
+                thread.start()
+                self.jobs.append(thread)
+            else:
+                self.stopping.wait(0.2)
+
+    def _run_job(self, job):
+        import job_queue
+        from status_store import update_status, update_overall_status
+        swap_id, swap_items = job["swap_id"], job["swap_items"]
+        update_overall_status(swap_id, status="Processing", message=None)
+        while not self.stopping.wait(self.update_interval * random.uniform(0.8, 1.2)):
+            for idx, item in enumerate(swap_items):
+                if item["swapped"]:
+                    continue
+                if random.random() < self.swap_chance:
+                    item["swapped"] = True
+                    update_status(swap_id, idx, f"Successfully swapped to index {item['new_indexes'][0]}", success=True)
+                else:
+                    update_status(swap_id, idx, f"No vacancies yet for {', '.join(item['new_indexes'])} "
+                                                f"(checked {time.strftime('%H:%M:%S')}).")
+            if all(item["swapped"] for item in swap_items):
+                update_overall_status(swap_id, status="Completed", message="All modules swapped successfully.")
+                break
+        job_queue.complete(swap_id)
+
+    def stop(self):
+        self.stopping.set()
+        self.join()
+        for thread in self.jobs:
+            thread.join()
+
+
+def start_gunicorn(workers, threads, redis_port, timeout=30):
+    """
+    Spawn gunicorn against the proxied Redis and wait for /healthz. Returns (process, base_url).
+    """
+    port = free_port()
+    env = dict(
+        os.environ,
+        REDIS_HOST="127.0.0.1",
+        REDIS_PORT=str(redis_port),
+        JOB_BACKEND="redis",
+        PORTAL_OPEN="00:00",  # Never park jobs until the portal opens
+        PORTAL_CLOSE="23:59",
+        MAX_QUEUED_JOBS="1000000"
+    )
+    env.pop("REDIS_PASSWORD", None)
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", str(workers), "-k", "gthread", "--threads", str(threads),
+         "--backlog", "2048", "-b", f"127.0.0.1:{port}", "app:create_app()"],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    started = time.time()
+    while time.time() - started < timeout:
+        if server.poll() is not None:
+            raise RuntimeError("gunicorn exited before becoming ready")
+        try:
+            if requests.get(f"{base_url}/healthz", timeout=1).status_code == 200:
+                return server, base_url
+        except requests.RequestException:
+            pass
+        time.sleep(0.1)
+    server.kill()
+    raise RuntimeError(f"gunicorn was not ready within {timeout}s")
+
+
+def simulate_user(n, base_url, args, deadline, samples, lock):
+    """
+    One student: log in, submit a swap, then poll the status until the deadline.
+    """
+    http = requests.Session()
+
+    def call(method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = http.request(method, f"{base_url}{path}", timeout=30, **kwargs)
+        except requests.RequestException:
+            response = None
+        with lock:
+            samples.append((path, time.perf_counter() - started, response is not None and response.status_code < 400))
+        return response
+
+    form = {"number_of_modules": str(args.modules)}
+    for i in range(args.modules):
+        form[f"old_index_{i}"] = f"{80000 + i * 10}"
+        form[f"new_index_{i}"] = ", ".join(f"{80000 + i * 10 + c}" for c in range(1, 4))
+
+    if not (call("GET", "/")
+            and call("POST", "/input-index", data={"username": f"loadtest{n}", "password": "password",
+                                                   "numModules": str(args.modules)})
+            and call("POST", "/swap-index", data=form)):
+        return
+    # Like the status page, start polling a moment after it loads and send back the last ETag
+    etag = None
+    while not deadline.wait(args.poll_interval * random.uniform(0.9, 1.1)):
+        response = call("GET", "/swap-status", headers={"If-None-Match": etag} if etag else {})
+        if response is not None and response.status_code == 200:
+            etag = response.headers.get("ETag")
+
+
+def run_setting(workers, threads, args, proxy):
+    """
+    Load one gunicorn setting with args.users students for args.duration seconds.
+    """
+    from status_store import redis_client
+    redis_client.flushall()
+
+    server, base_url = start_gunicorn(workers, threads, proxy.port)
+    stub = StubWorkers(args.update_interval, args.swap_chance)
+    stub.start()
+
+    samples, lock = [], threading.Lock()
+    deadline = threading.Event()
+    commands_before = proxy.commands
+    started = time.time()
+    users = []
+    try:
+        for n in range(args.users):
+            # Spread arrivals over the ramp-up instead of a thundering herd
+            user = threading.Thread(target=simulate_user, args=(n, base_url, args, deadline, samples, lock), daemon=True)
+            user.start()
+            users.append(user)
+            time.sleep(args.ramp_up / args.users)
+        deadline.wait(max(0, started + args.duration - time.time()))
+        deadline.set()
+        for user in users:
+            user.join()
+        elapsed = time.time() - started
+        commands = proxy.commands - commands_before
+    finally:
+        stub.stop()
+        server.terminate()
+        server.wait()
+
+    endpoints = {}
+    for path in ENDPOINTS:
+        latencies = [seconds for p, seconds, _ in samples if p == path]
+        endpoints[path] = {
+            "requests": len(latencies),
+            "errors": sum(1 for p, _, ok in samples if p == path and not ok),
+            "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+            "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None
+        }
+    latencies = [seconds for _, seconds, _ in samples]
+    return {
+        "workers": workers,
+        "threads": threads,
+        "users": args.users,
+        "requests_per_second": round(len(samples) / elapsed, 1),
+        "redis_ops_per_second": round(commands / elapsed, 1),
+        "errors": sum(1 for _, _, ok in samples if not ok),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+        "p99_ms": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+        "endpoints": endpoints
+    }
+
+
+def parse_setting(value):
+    workers, _, threads = value.lower().partition("x")
+    try:
+        return int(workers), int(threads)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{value!r} is not WORKERSxTHREADS, e.g. 1x64")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the status and submission endpoints offline.")
+    parser.add_argument("--settings", type=parse_setting, nargs="+", default=[(1, 8), (1, 64), (2, 32)],
+                        help="gunicorn settings to compare, as WORKERSxTHREADS.")
+    parser.add_argument("--users", type=int, default=100, help="Simulated students per setting.")
+    parser.add_argument("--duration", type=float, default=60, help="Seconds to run each setting.")
+    parser.add_argument("--ramp-up", type=float, default=10, help="Seconds over which students arrive.")
+    parser.add_argument("--poll-interval", type=float, default=5, help="Seconds between status polls.")
+    parser.add_argument("--modules", type=int, default=2, help="Modules per swap job.")
+    parser.add_argument("--update-interval", type=float, default=10, help="Seconds between stub worker checks.")
+    parser.add_argument("--swap-chance", type=float, default=0.05, help="Chance a stub check swaps a module.")
+    parser.add_argument("--redis-host", help="Use this Redis (flushed between runs) instead of fakeredis.")
+    parser.add_argument("--redis-port", type=int, default=6379)
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    upstream = (args.redis_host, args.redis_port) if args.redis_host else start_fake_redis()
+    proxy = CountingProxy(upstream)
+
+    # Point the stub workers at the proxy before any project module reads its config
+    os.environ["REDIS_HOST"] = "127.0.0.1"
+    os.environ["REDIS_PORT"] = str(proxy.port)
+    os.environ.pop("REDIS_PASSWORD", None)
+
+    results = []
+    for workers, threads in args.settings:
+        print(f"Running {args.users} users against gunicorn -w {workers} --threads {threads}...")
+        results.append(run_setting(workers, threads, args, proxy))
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    header = (f"{'workers':>7} {'threads':>7} {'req/s':>7} {'p50 (ms)':>9} {'p99 (ms)':>9} "
+              f"{'redis ops/s':>11} {'errors':>7}")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['workers']:>7} {r['threads']:>7} {r['requests_per_second']:>7} {r['p50_ms']!s:>9} "
+              f"{r['p99_ms']!s:>9} {r['redis_ops_per_second']:>11} {r['errors']:>7}")
+        for path, e in r["endpoints"].items():
+            print(f"    {path:<13} {e['requests']:>6} requests  p50 {e['p50_ms']!s:>7} ms  "
+                  f"p99 {e['p99_ms']!s:>7} ms  {e['errors']} errors")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,313 @@
+"""
+Local stand-in for the NTU STARS portal (wish.wis.ntu.edu.sg).
+
+It serves the pages and element names that engines/selenium_engine.py and
+engines/http_engine.py depend on: the UID/PW login forms, the planner table
+(bordercolor='#E0E0E0') with index radios and the opt select, the
+AUS_STARS_MENU change index form with the new_index_nmbr dropdown, the confirm
+page, and the alerts for a closed portal and module clashes.
+
+Run it standalone and point the app at it:
+
+    python benchmarks/mock_portal.py --port 8001 --vacancies 3 --latency-ms 150
+    PORTAL_BASE_URL=http://127.0.0.1:8001/pls/webexe python app.py
+
+Any username logs in; the password "wrong" is rejected. Each user starts
+registered in the first index of every module.
+"""
+import argparse
+import random
+import threading
+import time
+
+from flask import Flask, redirect, render_template_string, request, session, jsonify
+
+BASE_PATH = "/pls/webexe"
+PASSWORD_REJECTED = "wrong"
+
+
+def index_number(module, position):
+    """
+    The index number of the position-th index of a module, e.g. module 0 -> 10000, 10001, ...
+    """
+    return f"{10000 + module * 100 + position:05d}"
+
+
+class PortalState:
+    """
+    Modules, vacancies and registrations of the mock portal.
+    """
+
+    def __init__(self, modules=3, indexes_per_module=8, vacancies=3, waitlist=0, latency_ms=0,
+                 latency_jitter_ms=0, closed=False, clashes=(), redirect_to_timetable=False):
+        self.lock = threading.Lock()
+        self.modules = modules
+        self.indexes_per_module = indexes_per_module
+        self.latency_ms = latency_ms
+        self.latency_jitter_ms = latency_jitter_ms
+        self.closed = closed
+        self.clashes = set(clashes)  # Indexes that clash with every user's timetable
+        self.redirect_to_timetable = redirect_to_timetable
+        self.vacancies = {}
+        self.waitlist = {}
+        for module in range(modules):
+            for position in range(indexes_per_module):
+                index = index_number(module, position)
+                self.vacancies[index] = vacancies
+                self.waitlist[index] = waitlist
+        self.registered = {}  # username -> {module: index}
+        self.page_loads = 0
+        self.swaps = 0
+
+    def module_of(self, index):
+        return (int(index) - 10000) // 100
+
+    def registrations(self, username):
+        with self.lock:
+            if username not in self.registered:
+                self.registered[username] = {m: index_number(m, 0) for m in range(self.modules)}
+            return dict(self.registered[username])
+
+    def module_indexes(self, module):
+        return [index_number(module, p) for p in range(self.indexes_per_module)]
+
+    def swap(self, username, old_index, new_index):
+        """
+        Move a user from old_index to new_index. Returns an error message, or None on success.
+        """
+        with self.lock:
+            module = self.module_of(old_index)
+            if self.registered.get(username, {}).get(module) != old_index:
+                return f"You are not registered in index {old_index}."
+            if self.vacancies.get(new_index, 0) <= 0:
+                return f"Index {new_index} has no vacancy."
+            self.vacancies[new_index] -= 1
+            self.vacancies[old_index] += 1
+            self.registered[username][module] = new_index
+            self.swaps += 1
+            return None
+
+    def update(self, settings):
+        with self.lock:
+            for index, count in settings.get("vacancies", {}).items():
+                self.vacancies[index] = int(count)
+            for key in ("latency_ms", "latency_jitter_ms", "closed", "redirect_to_timetable"):
+                if key in settings:
+                    setattr(self, key, settings[key])
+            if "clashes" in settings:
+                self.clashes = set(settings["clashes"])
+            if settings.get("reset_registrations"):
+                self.registered.clear()
+
+    def snapshot(self):
+        with self.lock:
+            return {
+                "vacancies": dict(self.vacancies),
+                "closed": self.closed,
+                "latency_ms": self.latency_ms,
+                "clashes": sorted(self.clashes),
+                "page_loads": self.page_loads,
+                "swaps": self.swaps,
+                "users": len(self.registered)
+            }
+
+
+LAYOUT = """<!DOCTYPE html>
+<html><head><title>{{ title }}</title></head>
+<body>
+<div class="site-header"><div class="site-header__body">STARS Planner (mock)</div></div>
+{% if alert %}<script>alert({{ alert|tojson }});</script>{% endif %}
+{{ body|safe }}
+</body></html>"""
+
+LOGIN_UID = """
+<form method="post" action="{{ base }}/ldap_login.login">
+  <input type="hidden" name="W_URL" value="{{ w_url }}">
+  <input type="text" id="UID" name="UID">
+  <input type="submit" value="OK">
+</form>"""
+
+LOGIN_PW = """
+<form method="post" action="{{ base }}/ldap_login.login">
+  <input type="hidden" name="W_URL" value="{{ w_url }}">
+  <input type="hidden" name="UID" value="{{ uid }}">
+  <input type="password" id="PW" name="PW">
+  <input type="submit" value="OK">
+</form>"""
+
+TIMETABLE = """
+<form method="post" action="{{ base }}/AUS_STARS_PLANNER.planner">
+  <input type="submit" value="Plan/ Registration">
+</form>"""
+
+PLANNER = """
+<form method="post" action="{{ base }}/AUS_STARS_MENU.menu_option">
+  <table bordercolor="#E0E0E0" border="1">
+    <tr><th></th><th>Course</th><th>Index</th></tr>
+    {% for module, index in registrations %}
+    <tr><td><input type="radio" name="RI" value="{{ index }}"></td><td>MOD{{ module }}</td><td>{{ index }}</td></tr>
+    {% endfor %}
+  </table>
+  <select name="opt">
+    <option value="D">Drop Course</option>
+    <option value="C">Change Index</option>
+    <option value="S">Swap Index</option>
+  </select>
+  <input type="submit" value="Go">
+</form>"""
+
+BACK = """
+<form method="get" action="{{ base }}/AUS_STARS_PLANNER.planner">
+  <input type="submit" value="Back to Timetable">
+</form>"""
+
+CHANGE_INDEX = """
+<form name="AUS_STARS_MENU" method="post" action="{{ base }}/AUS_STARS_MENU.chg_index">
+  <input type="hidden" name="old_index_nmbr" value="{{ old_index }}">
+  <select name="new_index_nmbr">
+    <option value="">Select new index</option>
+    {% for index, vacancies, waitlist in options %}
+    <option value="{{ index }}">{{ index }} / {{ vacancies }} / {{ waitlist }}</option>
+    {% endfor %}
+  </select>
+  <input type="submit" value="OK">
+</form>""" + BACK
+
+CONFIRM = """
+<div id="top"><div>
+  <section>Confirm change of index</section>
+  <section><div><div>
+    <form method="post" action="{{ base }}/AUS_STARS_MENU.confirm">
+      <input type="hidden" name="old_index_nmbr" value="{{ old_index }}">
+      <input type="hidden" name="new_index_nmbr" value="{{ new_index }}">
+      <input type="submit" value="Confirm to Change Index Number">
+    </form>
+    """ + BACK + """
+  </div></div></section>
+</div></div>"""
+
+
+def create_portal_app(state):
+    app = Flask(__name__)
+    app.config["SECRET_KEY"] = "mock-portal"
+
+    def page(title, body, alert=None, **context):
+        context.setdefault("base", BASE_PATH)
+        return render_template_string(
+            LAYOUT, title=title, alert=alert, body=render_template_string(body, **context)
+        )
+
+    def planner(alert=None):
+        registrations = sorted(state.registrations(session["uid"]).items())
+        return page("STARS Planner", PLANNER, alert=alert, registrations=registrations)
+
+    @app.before_request
+    def simulate_latency():
+        with state.lock:
+            state.page_loads += 1
+            delay = state.latency_ms + random.uniform(-1, 1) * state.latency_jitter_ms
+        if delay > 0 and not request.path.startswith("/_mock"):
+            time.sleep(delay / 1000)
+
+    @app.route(f"{BASE_PATH}/ldap_login.login", methods=["GET", "POST"])
+    def login():
+        w_url = request.values.get("w_url") or request.values.get("W_URL", "")
+        if request.method == "GET" or "UID" not in request.form:
+            return page("Login", LOGIN_UID, w_url=w_url)
+        if "PW" not in request.form:
+            return page("Login", LOGIN_PW, w_url=w_url, uid=request.form["UID"])
+        if request.form["PW"] == PASSWORD_REJECTED:
+            return page("Login", LOGIN_UID, alert="Invalid username or password.", w_url=w_url)
+        session["uid"] = request.form["UID"]
+        if state.redirect_to_timetable:
+            return redirect(f"{BASE_PATH}/AUS_STARS_PLANNER.time_table")
+        return redirect(f"{BASE_PATH}/AUS_STARS_PLANNER.planner")
+
+    @app.route(f"{BASE_PATH}/AUS_STARS_PLANNER.time_table")
+    def time_table():
+        if "uid" not in session:
+            return redirect(f"{BASE_PATH}/ldap_login.login")
+        return page("Timetable", TIMETABLE)
+
+    @app.route(f"{BASE_PATH}/AUS_STARS_PLANNER.planner", methods=["GET", "POST"])
+    def planner_page():
+        if "uid" not in session:
+            return redirect(f"{BASE_PATH}/ldap_login.login")
+        return planner()
+
+    @app.route(f"{BASE_PATH}/AUS_STARS_MENU.menu_option", methods=["POST"])
+    def menu_option():
+        if "uid" not in session:
+            return redirect(f"{BASE_PATH}/ldap_login.login")
+        if state.closed:
+            return planner(alert="STARS is not available now. Please try again from 10:30am - 10:00pm.")
+        old_index = request.form.get("RI")
+        if not old_index or request.form.get("opt") != "C":
+            return planner(alert="Please select a course and an option.")
+        module = state.module_of(old_index)
+        with state.lock:
+            options = [(index, state.vacancies[index], state.waitlist[index])
+                       for index in state.module_indexes(module) if index != old_index]
+        return page("Change Index", CHANGE_INDEX, old_index=old_index, options=options)
+
+    @app.route(f"{BASE_PATH}/AUS_STARS_MENU.chg_index", methods=["POST"])
+    def change_index():
+        if "uid" not in session:
+            return redirect(f"{BASE_PATH}/ldap_login.login")
+        old_index = request.form["old_index_nmbr"]
+        new_index = request.form.get("new_index_nmbr")
+        if not new_index:
+            return page("Change Index", BACK, alert="Please select a new index.")
+        if new_index in state.clashes:
+            return page("Change Index", BACK, alert=f"Module Clash: index {new_index} clashes with your timetable.")
+        return page("Confirm Change Index", CONFIRM, old_index=old_index, new_index=new_index)
+
+    @app.route(f"{BASE_PATH}/AUS_STARS_MENU.confirm", methods=["POST"])
+    def confirm():
+        if "uid" not in session:
+            return redirect(f"{BASE_PATH}/ldap_login.login")
+        error = state.swap(session["uid"], request.form["old_index_nmbr"], request.form["new_index_nmbr"])
+        if error:
+            return planner(alert=error)
+        return planner(alert=f"Change index to {request.form['new_index_nmbr']} is successful.")
+
+    @app.route("/_mock/state", methods=["GET", "POST"])
+    def mock_state():
+        # Inspect or change vacancies, latency, clashes and portal hours during a run
+        if request.method == "POST":
+            state.update(request.get_json(force=True))
+        return jsonify(state.snapshot())
+
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run a local mock of the NTU STARS portal.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--modules", type=int, default=3)
+    parser.add_argument("--indexes-per-module", type=int, default=8)
+    parser.add_argument("--vacancies", type=int, default=3, help="Starting vacancies of every index.")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every page load.")
+    parser.add_argument("--latency-jitter-ms", type=float, default=0)
+    parser.add_argument("--closed", action="store_true", help="Answer Go with the portal closed alert.")
+    parser.add_argument("--clash", action="append", default=[], help="Index that raises a module clash alert.")
+    parser.add_argument("--timetable-first", action="store_true",
+                        help="Land on the time_table page after login instead of the planner.")
+    args = parser.parse_args()
+
+    state = PortalState(
+        modules=args.modules,
+        indexes_per_module=args.indexes_per_module,
+        vacancies=args.vacancies,
+        latency_ms=args.latency_ms,
+        latency_jitter_ms=args.latency_jitter_ms,
+        closed=args.closed,
+        clashes=args.clash,
+        redirect_to_timetable=args.timetable_first
+    )
+    print(f"Mock portal: PORTAL_BASE_URL=http://{args.host}:{args.port}{BASE_PATH}")
+    create_portal_app(state).run(host=args.host, port=args.port, threaded=True)
+
+if __name__ == '__main__':
+    main()
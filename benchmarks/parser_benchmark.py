@@ -0,0 +1,100 @@
+"""
+Correctness check and microbenchmark for portal_parsers.
+
+Runs every parser over the recorded pages in benchmarks/fixtures/portal
+(re-record them with benchmarks/record_fixtures.py), compares the results with
+expected.json, and reports the time per call of each parser on each page. Needs
+no browser, portal or Redis.
+
+    python benchmarks/parser_benchmark.py
+    python benchmarks/parser_benchmark.py --min-time 0.5 --json
+
+Exits non-zero if any parser disagrees with a fixture.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import portal_parsers
+from benchmarks.record_fixtures import FIXTURES_DIR
+
+# Parsers timed on a page that has already been parsed, keyed by their expected.json field
+PARSERS = {
+    "page_kind": portal_parsers.page_kind,
+    "alert": portal_parsers.find_alert,
+    "timetable_indexes": portal_parsers.timetable_indexes,
+    "vacancy_table": portal_parsers.vacancy_table
+}
+
+
+def load_fixtures():
+    with open(os.path.join(FIXTURES_DIR, "expected.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    for name, expectation in sorted(manifest.items()):
+        with open(os.path.join(FIXTURES_DIR, f"{name}.html"), encoding="utf-8") as f:
+            yield name, f.read(), expectation
+
+
+def normalise(field, value):
+    """
+    Put a parser result in the JSON shape used by expected.json.
+    """
+    if field == "vacancy_table" and value is not None:
+        return {index: list(counts) for index, counts in value.items()}
+    return value
+
+
+def time_per_call(fn, arg, min_time):
+    """
+    Mean seconds per call of fn(arg), repeating until at least min_time has passed.
+    """
+    calls, started = 0, time.perf_counter()
+    while True:
+        fn(arg)
+        calls += 1
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time:
+            return elapsed / calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check and time the portal page parsers on recorded pages.")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Seconds to spend timing each parser on each page.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    results, mismatches = [], []
+    for name, html, expectation in load_fixtures():
+        soup = portal_parsers.parse_html(html)
+        timings = {"parse_html": time_per_call(portal_parsers.parse_html, html, args.min_time)}
+        for field, fn in PARSERS.items():
+            actual = normalise(field, fn(soup))
+            if actual != expectation[field]:
+                mismatches.append(f"{name}: {field} is {actual!r}, expected {expectation[field]!r}")
+            timings[field] = time_per_call(fn, soup, args.min_time)
+        results.append({
+            "page": name,
+            "bytes": len(html.encode("utf-8")),
+            "us_per_call": {field: round(seconds * 1e6, 1) for field, seconds in timings.items()}
+        })
+
+    if args.json:
+        print(json.dumps({"results": results, "mismatches": mismatches}, indent=2))
+    else:
+        fields = ["parse_html"] + list(PARSERS)
+        header = f"{'page':<20} {'bytes':>7} " + " ".join(f"{field:>17}" for field in fields)
+        print("Microseconds per call")
+        print(header)
+        print("-" * len(header))
+        for r in results:
+            print(f"{r['page']:<20} {r['bytes']:>7} " + " ".join(f"{r['us_per_call'][field]:>17}" for field in fields))
+        for mismatch in mismatches:
+            print(f"MISMATCH {mismatch}")
+    sys.exit(1 if mismatches else 0)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+"""
+Record the portal page fixtures used by benchmarks/parser_benchmark.py.
+
+Walks the mock portal (benchmarks/mock_portal.py) through every page the swap
+engines read - login, timetable, planner, change index, confirm and the alert
+pages - and saves the raw HTML to benchmarks/fixtures/portal/<name>.html, with
+what each page is known to contain in expected.json. The expectations come from
+the mock's own state, not from portal_parsers, so they check the parsers.
+
+    python benchmarks/record_fixtures.py
+
+Pages saved from the real portal can be added to the corpus by hand: drop the
+HTML in the fixtures directory and add its entry to expected.json.
+"""
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_portal import BASE_PATH, PortalState, create_portal_app, index_number
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "portal")
+
+CLOSED_ALERT = "STARS is not available now. Please try again from 10:30am - 10:00pm."
+
+
+def expected(page_kind, alert=None, timetable_indexes=(), vacancy_table=None):
+    return {
+        "page_kind": page_kind,
+        "alert": alert,
+        "timetable_indexes": list(timetable_indexes),
+        "vacancy_table": vacancy_table
+    }
+
+
+def logged_in_client(state, username="fixture"):
+    client = create_portal_app(state).test_client()
+    client.post(f"{BASE_PATH}/ldap_login.login", data={"UID": username, "PW": "password"})
+    return client
+
+
+def record(pages):
+    os.makedirs(FIXTURES_DIR, exist_ok=True)
+    manifest = {}
+    for name, (html, expectation) in pages.items():
+        with open(os.path.join(FIXTURES_DIR, f"{name}.html"), "w", encoding="utf-8", newline="") as f:
+            f.write(html)
+        manifest[name] = expectation
+    with open(os.path.join(FIXTURES_DIR, "expected.json"), "w", encoding="utf-8", newline="") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+        f.write("\n")
+    print(f"Recorded {len(pages)} pages to {FIXTURES_DIR}")
+
+
+def main():
+    pages = {}
+    login = f"{BASE_PATH}/ldap_login.login"
+
+    # Login steps, including a rejected password
+    state = PortalState(modules=3, indexes_per_module=4)
+    client = create_portal_app(state).test_client()
+    pages["login_uid"] = (client.get(login).get_data(as_text=True), expected("login_uid"))
+    pages["login_pw"] = (client.post(login, data={"UID": "fixture"}).get_data(as_text=True), expected("login_pw"))
+    rejected = client.post(login, data={"UID": "fixture", "PW": "wrong"}).get_data(as_text=True)
+    pages["login_failed"] = (rejected, expected("login_uid", alert="Invalid username or password."))
+
+    # Timetable and planner
+    client = logged_in_client(state)
+    registered = [index_number(module, 0) for module in range(3)]
+    pages["timetable"] = (client.get(f"{BASE_PATH}/AUS_STARS_PLANNER.time_table").get_data(as_text=True),
+                          expected("timetable"))
+    pages["planner"] = (client.get(f"{BASE_PATH}/AUS_STARS_PLANNER.planner").get_data(as_text=True),
+                        expected("planner", timetable_indexes=registered))
+
+    # Change index pages: mixed vacancies, a full module, and a large module
+    old_index = index_number(0, 0)
+    state.update({"vacancies": {index_number(0, 1): 0, index_number(0, 2): 5, index_number(0, 3): 12}})
+    state.waitlist[index_number(0, 1)] = 4
+    page = client.post(f"{BASE_PATH}/AUS_STARS_MENU.menu_option", data={"RI": old_index, "opt": "C"})
+    pages["change_index"] = (page.get_data(as_text=True), expected("change_index", vacancy_table={
+        index_number(0, 1): [0, 4], index_number(0, 2): [5, 0], index_number(0, 3): [12, 0]
+    }))
+
+    full = PortalState(modules=1, indexes_per_module=4, vacancies=0, waitlist=7)
+    page = logged_in_client(full).post(f"{BASE_PATH}/AUS_STARS_MENU.menu_option", data={"RI": old_index, "opt": "C"})
+    pages["change_index_full"] = (page.get_data(as_text=True), expected("change_index", vacancy_table={
+        index_number(0, position): [0, 7] for position in range(1, 4)
+    }))
+
+    large = PortalState(modules=1, indexes_per_module=60, vacancies=2, waitlist=1)
+    page = logged_in_client(large).post(f"{BASE_PATH}/AUS_STARS_MENU.menu_option", data={"RI": old_index, "opt": "C"})
+    pages["change_index_large"] = (page.get_data(as_text=True), expected("change_index", vacancy_table={
+        index_number(0, position): [2, 1] for position in range(1, 60)
+    }))
+
+    # Confirm, swap success, module clash and closed portal
+    new_index = index_number(0, 2)
+    page = client.post(f"{BASE_PATH}/AUS_STARS_MENU.chg_index",
+                       data={"old_index_nmbr": old_index, "new_index_nmbr": new_index})
+    pages["confirm"] = (page.get_data(as_text=True), expected("confirm"))
+    page = client.post(f"{BASE_PATH}/AUS_STARS_MENU.confirm",
+                       data={"old_index_nmbr": old_index, "new_index_nmbr": new_index})
+    pages["swap_success"] = (page.get_data(as_text=True), expected(
+        "planner", alert=f"Change index to {new_index} is successful.", timetable_indexes=[new_index] + registered[1:]
+    ))
+
+    clash_index = index_number(1, 1)
+    state.update({"clashes": [clash_index]})
+    page = client.post(f"{BASE_PATH}/AUS_STARS_MENU.chg_index",
+                       data={"old_index_nmbr": index_number(1, 0), "new_index_nmbr": clash_index})
+    pages["module_clash"] = (page.get_data(as_text=True), expected(
+        "unknown", alert=f"Module Clash: index {clash_index} clashes with your timetable."
+    ))
+
+    state.update({"closed": True})
+    page = client.post(f"{BASE_PATH}/AUS_STARS_MENU.menu_option", data={"RI": new_index, "opt": "C"})
+    pages["portal_closed"] = (page.get_data(as_text=True), expected(
+        "planner", alert=CLOSED_ALERT, timetable_indexes=[new_index] + registered[1:]
+    ))
+
+    record(pages)
+
+if __name__ == '__main__':
+    main()
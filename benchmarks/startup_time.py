@@ -0,0 +1,94 @@
+"""
+Cold-start benchmark for the web app.
+
+Measures, over several fresh processes:
+  - import: `import app; app.create_app()` in a new interpreter
+  - ready:  spawning gunicorn (as in the Dockerfile) until /healthz answers 200
+
+and fails if the median is over target, so a slow import creeping back in
+(e.g. Selenium or a subprocess at import time) is caught.
+
+    python benchmarks/startup_time.py
+    python benchmarks/startup_time.py --runs 10 --import-target-ms 500 --ready-target-ms 2000
+"""
+import argparse
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+IMPORT_SNIPPET = (
+    "import time; start = time.perf_counter(); "
+    "import app; app.create_app(); "
+    "print(time.perf_counter() - start)"
+)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def measure_import():
+    output = subprocess.run(
+        [sys.executable, "-c", IMPORT_SNIPPET], cwd=ROOT, capture_output=True, text=True, check=True
+    ).stdout
+    return float(output.strip().splitlines()[-1])
+
+
+def measure_ready(timeout=30):
+    """
+    Seconds from spawning gunicorn until /healthz returns 200.
+    """
+    port = free_port()
+    started = time.perf_counter()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "gunicorn", "-w", "1", "-k", "gthread", "--threads", "64",
+         "-b", f"127.0.0.1:{port}", "app:create_app()"],
+        cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - started < timeout:
+            if server.poll() is not None:
+                raise RuntimeError("gunicorn exited before becoming ready")
+            try:
+                with urllib.request.urlopen(f"http://127.0.0.1:{port}/healthz", timeout=1) as response:
+                    if response.status == 200:
+                        return time.perf_counter() - started
+            except OSError:
+                time.sleep(0.01)
+        raise RuntimeError(f"/healthz did not answer within {timeout}s")
+    finally:
+        server.terminate()
+        server.wait()
+
+
+def summarise(name, samples, target_ms):
+    median_ms = statistics.median(samples) * 1000
+    ok = median_ms <= target_ms
+    print(f"{name:>7}: median {median_ms:7.1f} ms  max {max(samples) * 1000:7.1f} ms  "
+          f"target {target_ms:.0f} ms  {'OK' if ok else 'OVER TARGET'}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure web app import time and gunicorn readiness.")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--import-target-ms", type=float, default=500)
+    parser.add_argument("--ready-target-ms", type=float, default=2000)
+    parser.add_argument("--skip-gunicorn", action="store_true", help="Only measure the import.")
+    args = parser.parse_args()
+
+    results = [summarise("import", [measure_import() for _ in range(args.runs)], args.import_target_ms)]
+    if not args.skip_gunicorn:
+        results.append(summarise("ready", [measure_ready() for _ in range(args.runs)], args.ready_target_ms))
+    sys.exit(0 if all(results) else 1)
+
+if __name__ == '__main__':
+    main()
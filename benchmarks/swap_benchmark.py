@@ -0,0 +1,221 @@
+"""
+End-to-end swap benchmark against the local mock portal.
+
+Runs batches of concurrent swap jobs through swapper.perform_swaps and reports
+swaps/minute, p50/p99 time-to-swap and peak RSS per job for each concurrency
+level. Needs a Redis for the status store (REDIS_HOST / REDIS_PORT).
+
+    python benchmarks/swap_benchmark.py --engine http --concurrency 1 10 100
+    python benchmarks/swap_benchmark.py --engine selenium --concurrency 1 10 --latency-ms 100
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+import time
+
+import psutil
+from werkzeug.serving import make_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.mock_portal import BASE_PATH, PortalState, create_portal_app, index_number
+
+
+def percentile(values, pct):
+    """
+    Nearest-rank percentile of a list of numbers.
+    """
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(0, min(len(ordered) - 1, int(round(pct / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[rank]
+
+
+def tree_rss(process):
+    """
+    Resident memory of a process and all of its children (e.g. chromedriver and Chrome).
+    """
+    total = 0
+    for proc in [process] + process.children(recursive=True):
+        try:
+            total += proc.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+
+class RssSampler(threading.Thread):
+    def __init__(self, interval=0.1):
+        super().__init__(daemon=True)
+        self.process = psutil.Process()
+        self.interval = interval
+        self.peak = 0
+        self.running = True
+
+    def run(self):
+        while self.running:
+            self.peak = max(self.peak, tree_rss(self.process))
+            time.sleep(self.interval)
+
+    def stop(self):
+        self.running = False
+        self.join()
+        return self.peak
+
+
+def start_mock_portal(state):
+    server = make_server("127.0.0.1", 0, create_portal_app(state), threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_level(level, args, state):
+    """
+    Run `level` swap jobs at once and collect their timings.
+    """
+    import config
+    from status_store import set_status_data, get_status_data, delete_status_data
+    from swapper import perform_swaps
+
+    if args.engine == "selenium":
+        # Give every job its own warm browser, like a pool sized for this load
+        from engines import selenium_engine
+        if selenium_engine._driver_pool is not None:
+            selenium_engine._driver_pool.shutdown()
+            selenium_engine._driver_pool = None
+        config.DRIVER_POOL_SIZE = level
+        pool = selenium_engine.get_driver_pool()
+        warm_start = time.time()
+        while pool.stats()["idle"] < level and time.time() - warm_start < 300:
+            time.sleep(0.2)
+        print(f"  pool warm-up for {level} browsers: {time.time() - warm_start:.1f}s")
+
+    state.update({
+        "vacancies": {index: level * 10 for index in state.vacancies},
+        "reset_registrations": True
+    })
+
+    baseline = tree_rss(psutil.Process())
+    sampler = RssSampler()
+    sampler.start()
+
+    durations = []
+    failures = []
+    lock = threading.Lock()
+
+    def job(n):
+        swap_id = f"bench{level}_{n}_{int(time.time())}"
+        swap_items = [{
+            "old_index": index_number(module, 0),
+            "new_indexes": [index_number(module, p) for p in range(1, args.candidates + 1)],
+            "swapped": False
+        } for module in range(args.modules)]
+        try:
+            set_status_data(swap_id, {
+                "status": "Processing",
+                "details": [{"old_index": item["old_index"],
+                             "new_indexes": ", ".join(item["new_indexes"]),
+                             "swapped": False,
+                             "message": "Pending..."} for item in swap_items],
+                "message": None
+            })
+            started = time.time()
+            perform_swaps(f"bench-user-{level}-{n}", "password", swap_items, swap_id)
+            elapsed = time.time() - started
+            status = get_status_data(swap_id)
+        except Exception as e:
+            # A crashed job is a failure, not a job that never ran
+            with lock:
+                failures.append(f"{type(e).__name__}: {e}")
+            return
+        finally:
+            try:
+                delete_status_data(swap_id)
+            except Exception:
+                pass  # Redis is what failed; there is nothing to clean up
+        with lock:
+            if status["status"] == "Completed":
+                durations.append(elapsed)
+            else:
+                failures.append(status.get("message"))
+
+    page_loads_before = state.snapshot()["page_loads"]
+    wall_start = time.time()
+    threads = [threading.Thread(target=job, args=(n,)) for n in range(level)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    wall = time.time() - wall_start
+    peak = sampler.stop()
+
+    swaps = len(durations) * args.modules
+    return {
+        "concurrency": level,
+        "engine": args.engine,
+        "completed_jobs": len(durations),
+        "failed_jobs": len(failures),
+        "swaps_per_minute": round(swaps / wall * 60, 1) if wall else None,
+        "p50_time_to_swap_s": round(percentile(durations, 50), 3) if durations else None,
+        "p99_time_to_swap_s": round(percentile(durations, 99), 3) if durations else None,
+        "peak_rss_per_job_mb": round(max(0, peak - baseline) / level / 2 ** 20, 1),
+        "page_loads_per_job": round((state.snapshot()["page_loads"] - page_loads_before) / level, 1),
+        "errors": sorted(set(filter(None, failures)))[:3]
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark swap throughput against the mock portal.")
+    parser.add_argument("--engine", choices=["http", "selenium"], default="http")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 10, 100])
+    parser.add_argument("--modules", type=int, default=1, help="Modules swapped per job.")
+    parser.add_argument("--candidates", type=int, default=3, help="Candidate new indexes per module.")
+    parser.add_argument("--latency-ms", type=float, default=50, help="Mock portal latency per page load.")
+    parser.add_argument("--json", action="store_true", help="Print results as JSON.")
+    args = parser.parse_args()
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)  # Mock portal access logs
+
+    state = PortalState(
+        modules=args.modules,
+        indexes_per_module=args.candidates + 1,
+        latency_ms=args.latency_ms
+    )
+    server = start_mock_portal(state)
+
+    # Point the app at the mock before any project module reads its config
+    os.environ["PORTAL_BASE_URL"] = f"http://127.0.0.1:{server.server_port}{BASE_PATH}"
+    os.environ["SWAP_ENGINE"] = args.engine
+    os.environ["VACANCY_CACHE_TTL"] = "0"  # Measure real portal visits
+    os.environ["PORTAL_OPEN"] = "00:00"  # Jobs wait for portal hours, so keep the portal open all day
+    os.environ["PORTAL_CLOSE"] = "23:59"
+    os.environ.setdefault("PORTAL_RATE", "0")  # Measure the engines, not the portal rate limit
+    os.environ.setdefault("ACCOUNT_RATE", "0")
+
+    results = []
+    for level in args.concurrency:
+        print(f"Running {level} concurrent {args.engine} job(s)...")
+        results.append(run_level(level, args, state))
+
+    server.shutdown()
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    header = f"{'jobs':>6} {'swaps/min':>10} {'p50 (s)':>9} {'p99 (s)':>9} {'RSS/job (MB)':>13} {'loads/job':>10} {'failed':>7}"
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        print(f"{r['concurrency']:>6} {r['swaps_per_minute']:>10} {r['p50_time_to_swap_s']!s:>9} "
+              f"{r['p99_time_to_swap_s']!s:>9} {r['peak_rss_per_job_mb']:>13} {r['page_loads_per_job']:>10} "
+              f"{r['failed_jobs']:>7}")
+        for error in r["errors"]:
+            print(f"       error: {error}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,312 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+import psutil
+import config
+import job_queue
+import launcher
+from status_store import redis_client, update_overall_status
+
+logger = logging.getLogger(__name__)
+
+# Admission control for swap jobs. The number of jobs a process may run at once is
+# sized from a memory budget, excess jobs wait in a bounded queue, and submissions
+# beyond that are turned away with a 429. Jobs submitted while the portal is closed
+# are parked, without taking a slot, and have their own, larger cap.
+#
+# Workers advertise their slots in worker:<worker_id>:slots (expires unless refreshed
+# by the worker's heartbeat), so the web process can report fleet-wide utilisation.
+
+# Typical resident memory of one running job, per engine
+JOB_MEMORY_MB = {"selenium": 350, "http": 20}
+
+QUEUED_STATUS = "Queued"
+
+
+class CapacityFull(Exception):
+    """Raised when the job queue is full and a submission must be rejected."""
+
+
+def _cgroup_memory_limit():
+    """
+    Returns the container memory limit in bytes, or None if there is none.
+    """
+    for path in ("/sys/fs/cgroup/memory.max", "/sys/fs/cgroup/memory/memory.limit_in_bytes"):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+        except OSError:
+            continue
+        if value.isdigit() and int(value) < 2 ** 60:  # cgroup v1 reports "no limit" as a huge number
+            return int(value)
+    return None
+
+def memory_budget_mb():
+    """
+    Memory swap jobs may use: MEMORY_BUDGET_MB, or 80% of the container (or machine) memory.
+    """
+    if config.MEMORY_BUDGET_MB > 0:
+        return config.MEMORY_BUDGET_MB
+    limit = _cgroup_memory_limit() or psutil.virtual_memory().total
+    return limit / 2 ** 20 * 0.8
+
+def job_memory_mb():
+    return config.JOB_MEMORY_MB or JOB_MEMORY_MB.get(config.SWAP_ENGINE, JOB_MEMORY_MB["selenium"])
+
+def max_concurrent_jobs():
+    """
+    How many swap jobs this process can run at once without exceeding its memory budget.
+    """
+    if config.MAX_CONCURRENT_JOBS > 0:
+        return config.MAX_CONCURRENT_JOBS
+    return max(1, int((memory_budget_mb() - config.BASE_MEMORY_MB) // job_memory_mb()))
+
+def driver_pool_size():
+    """
+    How many browsers the Selenium driver pool keeps: DRIVER_POOL_SIZE, or one per job slot,
+    since the per-job memory budget is mostly the job's browser.
+    """
+    return config.DRIVER_POOL_SIZE if config.DRIVER_POOL_SIZE > 0 else max_concurrent_jobs()
+
+
+class JobSlots:
+    """
+    Runs at most `limit` swap jobs at once in this process (the thread backend)
+    and queues the rest in submission order.
+
+    Each job is called as target(*args, should_stop=...), and should_stop()
+    turns True once the job is cancelled.
+
+    Parked jobs (submitted while the portal is closed) hold no slot until their
+    release time, when they start or join the queue.
+    """
+
+    def __init__(self, limit, max_queued, max_parked):
+        self.limit = limit
+        self.max_queued = max_queued
+        self.max_parked = max_parked
+        self.running = {}  # swap_id -> stop event
+        self.waiting = OrderedDict()  # swap_id -> (target, args), oldest first
+        self.parked = {}  # swap_id -> threading.Timer that releases it
+        self.lock = threading.Lock()
+
+    def submit(self, swap_id, target, *args):
+        """
+        Start target(*args) now if a slot is free, otherwise queue it.
+
+        Returns:
+            int: 0 if the job started, else its position in the queue.
+
+        Raises:
+            CapacityFull: If the queue is full.
+        """
+        with self.lock:
+            if len(self.running) < self.limit:
+                self.running[swap_id] = threading.Event()
+                position = 0
+            elif len(self.waiting) >= self.max_queued:
+                raise CapacityFull(f"{len(self.waiting)} jobs are already waiting.")
+            else:
+                self.waiting[swap_id] = (target, args)
+                position = len(self.waiting)
+        if position == 0:
+            self._start(swap_id, target, args)
+        return position
+
+    def park(self, swap_id, release_at, target, *args):
+        """
+        Hold target(*args) until release_at (epoch seconds), then start or queue it.
+
+        Raises:
+            CapacityFull: If max_parked jobs are already parked.
+        """
+        timer = threading.Timer(max(0, release_at - time.time()), self._release, args=(swap_id, target, args))
+        timer.daemon = True
+        with self.lock:
+            if len(self.parked) >= self.max_parked:
+                raise CapacityFull(f"{len(self.parked)} jobs are already waiting for the portal to open.")
+            self.parked[swap_id] = timer
+        timer.start()
+
+    def _release(self, swap_id, target, args):
+        with self.lock:
+            if self.parked.pop(swap_id, None) is None:
+                return  # Cancelled while parked
+            # An accepted job is never turned away, so the queue limit does not apply here
+            if len(self.running) < self.limit:
+                self.running[swap_id] = threading.Event()
+                position = 0
+            else:
+                self.waiting[swap_id] = (target, args)
+                position = len(self.waiting)
+        if position:
+            update_overall_status(swap_id, status=QUEUED_STATUS, message=queue_message(position))
+        else:
+            self._start(swap_id, target, args)
+
+    def _start(self, swap_id, target, args):
+        with self.lock:
+            stop = self.running[swap_id]
+
+        def run():
+            try:
+                target(*args, should_stop=stop.is_set)
+            finally:
+                self._finished(swap_id)
+        threading.Thread(target=run, name=swap_id, daemon=True).start()
+
+    def _finished(self, swap_id):
+        with self.lock:
+            self.running.pop(swap_id, None)
+            if not self.waiting or len(self.running) >= self.limit:
+                return
+            next_id, (target, args) = self.waiting.popitem(last=False)
+            self.running[next_id] = threading.Event()
+        update_overall_status(next_id, status="Processing", message="")
+        self._start(next_id, target, args)
+
+    def cancel(self, swap_id):
+        """
+        Drop a waiting job, or tell a running one to stop.
+        """
+        with self.lock:
+            self.waiting.pop(swap_id, None)
+            timer = self.parked.pop(swap_id, None)
+            stop = self.running.get(swap_id)
+        if timer is not None:
+            timer.cancel()
+        if stop is not None:
+            stop.set()
+
+    def position(self, swap_id):
+        with self.lock:
+            for position, waiting_id in enumerate(self.waiting, start=1):
+                if waiting_id == swap_id:
+                    return position
+        return None
+
+    def stats(self):
+        with self.lock:
+            return {"running": len(self.running), "queued": len(self.waiting), "parked": len(self.parked)}
+
+_job_slots = None
+_job_slots_lock = threading.Lock()
+
+def get_job_slots():
+    """
+    Returns the process-wide JobSlots used by the thread backend, sized on first use.
+    """
+    global _job_slots
+    with _job_slots_lock:
+        if _job_slots is None:
+            _job_slots = JobSlots(max_concurrent_jobs(), config.MAX_QUEUED_JOBS, config.MAX_PARKED_JOBS)
+            logger.info(f"Running up to {_job_slots.limit} swap jobs at once ({memory_budget_mb():.0f} MB budget).")
+        return _job_slots
+
+
+def worker_slots_key(worker_id):
+    return f"worker:{worker_id}:slots"
+
+def register_worker(worker_id, slots, ttl):
+    """
+    Advertise a worker's job slots for ttl seconds (refresh from its heartbeat).
+    """
+    redis_client.set(worker_slots_key(worker_id), slots, ex=int(ttl))
+
+def unregister_worker(worker_id):
+    redis_client.delete(worker_slots_key(worker_id))
+
+def _fleet_slots():
+    keys = list(redis_client.scan_iter(match=worker_slots_key("*"), count=100))
+    return sum(int(value) for value in redis_client.mget(keys) if value) if keys else 0
+
+def check_queue():
+    """
+    Raises CapacityFull if the Redis job queue is full. Parked jobs do not count.
+    """
+    pending = job_queue.stats()["pending"]
+    if pending >= config.MAX_QUEUED_JOBS:
+        raise CapacityFull(f"{pending} jobs are already waiting.")
+
+def admit(swap_id, username, password, swap_items):
+    """
+    Start or queue a swap job on the configured backend.
+
+    Returns:
+        int: 0 if the job can start right away, else its position in the queue.
+
+    Raises:
+        CapacityFull: If the queue is full.
+    """
+    if config.JOB_BACKEND == "redis":
+        check_queue()
+        job_queue.enqueue(swap_id, username, password, swap_items)
+        return queue_position(swap_id) or 0  # 0 while a free worker slot will claim it
+    from swapper import perform_swaps  # Only the thread backend runs swaps in the web process
+    return get_job_slots().submit(swap_id, perform_swaps, username, password, swap_items, swap_id)
+
+def park(swap_id, username, password, swap_items, opening):
+    """
+    Hold a job submitted while the portal is closed until its release slot before opening.
+
+    Raises:
+        CapacityFull: If MAX_PARKED_JOBS jobs are already parked.
+    """
+    if config.JOB_BACKEND == "redis":
+        parked = job_queue.stats()["parked"]
+        if parked >= config.MAX_PARKED_JOBS:
+            raise CapacityFull(f"{parked} jobs are already waiting for the portal to open.")
+        launcher.park(swap_id, username, password, swap_items, opening)
+        return
+    from swapper import perform_swaps  # Only the thread backend runs swaps in the web process
+    get_job_slots().park(swap_id, launcher.launch_time(opening), perform_swaps, username, password, swap_items, swap_id)
+    launcher.schedule_prewarm(opening)
+
+def queue_message(position):
+    return f"Waiting for a free slot: you are #{position} in the queue."
+
+def cancel(swap_id):
+    if config.JOB_BACKEND != "redis":
+        get_job_slots().cancel(swap_id)
+
+def queue_position(swap_id):
+    """
+    Returns the 1-based position of a waiting job, or None if it is not queued.
+
+    On the Redis backend a pending job only counts as waiting when there are more
+    pending jobs ahead of it than free worker slots; otherwise a worker is about to claim it.
+    """
+    if config.JOB_BACKEND == "redis":
+        position = job_queue.position(swap_id)
+        if position is None:
+            return None
+        free = max(0, _fleet_slots() - job_queue.stats()["running"])
+        return position - free if position > free else None
+    return get_job_slots().position(swap_id)
+
+def utilisation():
+    """
+    Current load against capacity for the /capacity endpoint.
+    """
+    if config.JOB_BACKEND == "redis":
+        stats = job_queue.stats()
+        slots = _fleet_slots()
+        running, queued, parked = stats["running"], stats["pending"], stats["parked"]
+    else:
+        stats = get_job_slots().stats()
+        slots = get_job_slots().limit
+        running, queued, parked = stats["running"], stats["queued"], stats["parked"]
+    return {
+        "backend": config.JOB_BACKEND,
+        "slots": slots,
+        "running": running,
+        "queued": queued,
+        "max_queued": config.MAX_QUEUED_JOBS,
+        "parked": parked,
+        "max_parked": config.MAX_PARKED_JOBS,
+        "utilisation": round(running / slots, 3) if slots else None,
+        "memory_budget_mb": round(memory_budget_mb()),
+        "job_memory_mb": job_memory_mb(),
+        "rss_mb": round(psutil.Process().memory_info().rss / 2 ** 20, 1)
+    }
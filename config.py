@@ -0,0 +1,114 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables manually (if needed)
+load_dotenv()
+
+# Flask
+FLASK_SECRET_KEY = os.getenv("FLASK_SECRET_KEY", "fallback_key_for_dev")
+API_TOKEN = os.environ.get("API_TOKEN")  # Bearer token for the bulk /api endpoints; the API is off when unset
+API_MAX_BATCH = int(os.environ.get("API_MAX_BATCH", 200))  # Most jobs or swap_ids in one API request
+
+# Redis
+REDIS_HOST = os.environ.get("REDIS_HOST", "red-cug9uopopnds7398r2kg")
+REDIS_PORT = int(os.environ.get("REDIS_PORT", 6379))
+REDIS_PASSWORD = os.environ.get("REDIS_PASSWORD", None)
+
+# Portal URLs (point PORTAL_BASE_URL at benchmarks/mock_portal.py for local testing)
+PORTAL_BASE_URL = os.environ.get("PORTAL_BASE_URL", "https://wish.wis.ntu.edu.sg/pls/webexe").rstrip("/")
+PORTAL_LOGIN_URL = os.environ.get(
+    "PORTAL_LOGIN_URL",
+    f"{PORTAL_BASE_URL}/ldap_login.login?w_url={PORTAL_BASE_URL}/aus_stars_planner.main"
+)
+
+# Swap engine: "selenium" drives headless Chrome, "http" posts the portal forms directly
+SWAP_ENGINE = os.environ.get("SWAP_ENGINE", "selenium").lower()
+
+# Selenium
+CHROME_BINARY_PATH = os.environ.get("CHROME_BINARY_PATH", "/usr/bin/google-chrome")
+CHROMEDRIVER_PATH = os.environ.get("CHROMEDRIVER_PATH", "/usr/local/bin/chromedriver")
+DRIVER_POOL_SIZE = int(os.environ.get("DRIVER_POOL_SIZE", 0))  # Pre-launched browsers; 0 = one per job slot (sized from the memory budget)
+DRIVER_POOL_TIMEOUT = int(os.environ.get("DRIVER_POOL_TIMEOUT", 120))
+BROWSER_MAX_ATTEMPTS = int(os.environ.get("BROWSER_MAX_ATTEMPTS", 100))  # Recycle a browser after this many swap attempts (0 disables)
+BROWSER_MAX_RSS_MB = int(os.environ.get("BROWSER_MAX_RSS_MB", 500))  # ...or once its Chrome processes use this much memory (0 disables)
+BROWSER_REAP_INTERVAL = int(os.environ.get("BROWSER_REAP_INTERVAL", 300))  # Seconds between sweeps for leaked Chrome processes (0 disables)
+# "lean" loads pages eagerly, blocks images/fonts/CSS and stops alert waits as soon as the next page appears
+BROWSER_MODE = os.environ.get("BROWSER_MODE", "standard").lower()
+LEAN_BLOCKED_URLS = [
+    pattern.strip() for pattern in os.environ.get(
+        "LEAN_BLOCKED_URLS",
+        "*.png,*.jpg,*.jpeg,*.gif,*.svg,*.ico,*.woff,*.woff2,*.ttf,*.otf,*.css,*google-analytics.com*,*googletagmanager.com*"
+    ).split(",") if pattern.strip()
+]
+
+# HTTP engine
+HTTP_POOL_SIZE = int(os.environ.get("HTTP_POOL_SIZE", 50))  # Max pooled connections to the portal
+HTTP_TIMEOUT = int(os.environ.get("HTTP_TIMEOUT", 20))
+
+# Modules whose vacancies a job reads at once (extra HTTP sessions or in-page requests); 1 checks them one by one
+PARALLEL_CHECKS = int(os.environ.get("PARALLEL_CHECKS", 1))
+
+# Capacity: concurrent jobs per process are sized from a memory budget unless MAX_CONCURRENT_JOBS is set
+MEMORY_BUDGET_MB = float(os.environ.get("MEMORY_BUDGET_MB", 0))  # 0 = 80% of the container's memory limit
+BASE_MEMORY_MB = float(os.environ.get("BASE_MEMORY_MB", 200))  # Reserved for the process itself
+JOB_MEMORY_MB = float(os.environ.get("JOB_MEMORY_MB", 0))  # Memory per running job; 0 = engine default
+MAX_CONCURRENT_JOBS = int(os.environ.get("MAX_CONCURRENT_JOBS", 0))
+MAX_QUEUED_JOBS = int(os.environ.get("MAX_QUEUED_JOBS", 50))  # Submissions beyond this get a 429
+MAX_PARKED_JOBS = int(os.environ.get("MAX_PARKED_JOBS", 1000))  # Same, for jobs waiting for the portal to open
+
+# Swap jobs: "thread" runs them inside the web process, "redis" queues them for worker.py
+JOB_BACKEND = os.environ.get("JOB_BACKEND", "thread").lower()
+JOB_LEASE_SECONDS = int(os.environ.get("JOB_LEASE_SECONDS", 60))
+WORKER_CONCURRENCY = int(os.environ.get("WORKER_CONCURRENCY", 0))  # 0 sizes it from the memory budget
+WORKER_METRICS_PORT = int(os.environ.get("WORKER_METRICS_PORT", 0))  # Prometheus endpoint of worker.py (0 disables it)
+
+# Vacancy polling (seconds)
+POLL_BASE_INTERVAL = float(os.environ.get("POLL_BASE_INTERVAL", 300))
+POLL_MIN_INTERVAL = float(os.environ.get("POLL_MIN_INTERVAL", 60))
+POLL_MAX_INTERVAL = float(os.environ.get("POLL_MAX_INTERVAL", 600))
+POLL_BACKOFF = float(os.environ.get("POLL_BACKOFF", 1.5))  # Interval multiplier while nothing changes
+POLL_JITTER = float(os.environ.get("POLL_JITTER", 0.2))  # +/- fraction of the interval
+POLL_HOT_INTERVAL = float(os.environ.get("POLL_HOT_INTERVAL", 60))  # Interval right after a vacancy change
+POLL_HOT_CYCLES = int(os.environ.get("POLL_HOT_CYCLES", 3))
+PORTAL_OPEN = os.environ.get("PORTAL_OPEN", "10:30")  # Singapore time
+PORTAL_CLOSE = os.environ.get("PORTAL_CLOSE", "22:00")
+SUSPEND_THRESHOLD = float(os.environ.get("SUSPEND_THRESHOLD", 120))  # Return the browser to the pool for waits at least this long
+
+# Portal opening burst: jobs submitted while the portal is closed are parked, then
+# released LAUNCH_RATE per second from LAUNCH_LEAD_SECONDS before opening so they
+# are logged in and waiting when it opens
+LAUNCH_LEAD_SECONDS = float(os.environ.get("LAUNCH_LEAD_SECONDS", 90))
+LAUNCH_RATE = float(os.environ.get("LAUNCH_RATE", 5))  # Parked jobs released per second
+LAUNCH_SPREAD = float(os.environ.get("LAUNCH_SPREAD", 5))  # First checks are spread over this many seconds after opening
+LAUNCH_PREWARM_SECONDS = float(os.environ.get("LAUNCH_PREWARM_SECONDS", 300))  # Start the browser pool this long before opening
+
+# Portal rate limit shared by every job and worker: Redis token buckets, one global and one per
+# portal account (a rate of 0 disables that bucket)
+PORTAL_RATE = float(os.environ.get("PORTAL_RATE", 20))  # Portal requests per second across all jobs
+PORTAL_BURST = int(os.environ.get("PORTAL_BURST", 40))
+ACCOUNT_RATE = float(os.environ.get("ACCOUNT_RATE", 2))  # Portal requests per second for one account
+ACCOUNT_BURST = int(os.environ.get("ACCOUNT_BURST", 6))
+RATE_LIMIT_RESERVE = float(os.environ.get("RATE_LIMIT_RESERVE", 0.25))  # Share of each bucket kept for confirm steps
+RATE_LIMIT_MAX_WAIT = float(os.environ.get("RATE_LIMIT_MAX_WAIT", 30))  # Seconds to wait for a token before giving up
+
+# Server-Sent Events: seconds before a status stream is closed and the browser reconnects
+STATUS_STREAM_SECONDS = int(os.environ.get("STATUS_STREAM_SECONDS", 300))
+# Open streams per process. Each holds a gunicorn thread, so keep this well below --threads;
+# browsers turned away fall back to polling
+STATUS_STREAM_MAX = int(os.environ.get("STATUS_STREAM_MAX", 16))
+
+# Status event log: entries kept per job, and seconds a job's status keys outlive its last update
+STATUS_LOG_MAXLEN = int(os.environ.get("STATUS_LOG_MAXLEN", 500))
+STATUS_TTL = int(os.environ.get("STATUS_TTL", 6 * 3600))
+
+# Portal session reuse: seconds a job's encrypted login cookies are kept for re-login after a restart (0 disables)
+SESSION_CACHE_TTL = int(os.environ.get("SESSION_CACHE_TTL", 900))
+SESSION_CACHE_KEY = os.environ.get("SESSION_CACHE_KEY")  # Encryption secret; falls back to FLASK_SECRET_KEY
+
+# Logging: recent steps and log lines kept in memory per job, dumped when a swap attempt fails.
+# Characters of page HTML included in a dump (0 leaves the page out, as it shows the student's timetable)
+FLIGHT_RECORDER_SIZE = int(os.environ.get("FLIGHT_RECORDER_SIZE", 200))
+FLIGHT_RECORDER_SNAPSHOT_CHARS = int(os.environ.get("FLIGHT_RECORDER_SNAPSHOT_CHARS", 0))
+
+# Shared vacancy cache: seconds a vacancy reading from one job is trusted by others (0 disables)
+VACANCY_CACHE_TTL = int(os.environ.get("VACANCY_CACHE_TTL", 60))
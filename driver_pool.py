@@ -0,0 +1,424 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+from urllib.parse import urlsplit
+import psutil
+import config
+from metrics import BROWSER_RECYCLES, BROWSER_ORPHANS_REAPED
+
+logger = logging.getLogger(__name__)
+
+PORTAL_ORIGIN = "{0.scheme}://{0.netloc}".format(urlsplit(config.PORTAL_BASE_URL))
+
+BROWSER_PROCESS_NAMES = ("chrome", "chromedriver", "google-chrome")
+# Chrome's crash handler detaches from its browser and lives on under init, so it is only
+# reaped along with the dead browser whose profile its --database points into
+CRASHPAD_PROCESS_NAME = "chrome_crashpad"
+REAP_GRACE_SECONDS = 120  # Never reap processes younger than this (a browser may be launching)
+
+
+def driver_processes(driver):
+    """
+    The ChromeDriver process of a driver and everything it started (Chrome and its helpers).
+    """
+    process = getattr(getattr(driver, "service", None), "process", None)
+    if process is None:
+        return []
+    try:
+        root = psutil.Process(process.pid)
+        return [root] + root.children(recursive=True)
+    except psutil.Error:
+        return []
+
+def profile_dir(proc):
+    """
+    The --user-data-dir of a Chrome process (or the --database of a crashpad handler), or None.
+    """
+    try:
+        cmdline = proc.cmdline()
+    except psutil.Error:
+        return None
+    for arg in cmdline:
+        for flag in ("--user-data-dir=", "--database="):
+            if arg.startswith(flag):
+                return os.path.normpath(arg[len(flag):])
+    return None
+
+def in_profiles(path, profiles):
+    return path is not None and any(path == profile or path.startswith(profile + os.sep) for profile in profiles)
+
+def processes_rss(processes):
+    total = 0
+    for proc in processes:
+        try:
+            total += proc.memory_info().rss
+        except psutil.Error:
+            pass
+    return total
+
+def kill_processes(processes, timeout=5):
+    """
+    Terminate processes, then kill whatever is still alive after timeout seconds.
+    """
+    for proc in processes:
+        try:
+            proc.terminate()
+        except psutil.Error:
+            pass
+    _, alive = psutil.wait_procs(processes, timeout=timeout)
+    for proc in alive:
+        try:
+            proc.kill()
+        except psutil.Error:
+            pass
+
+
+class DriverPoolTimeout(Exception):
+    """Raised when no driver could be borrowed from the pool in time."""
+
+
+class DriverPool:
+    """
+    A bounded pool of pre-launched, health-checked Selenium WebDriver instances.
+
+    Swap jobs borrow a driver with acquire() and hand it back with release().
+    Drivers are reset between users, and crashed instances are replaced by a
+    background thread so the pool stays warm.
+    """
+
+    def __init__(self, factory, size=2, acquire_timeout=120, max_uses=0, max_rss_mb=0, reap_interval=0):
+        """
+        Args:
+            factory (callable): Returns a new WebDriver instance (e.g. create_driver).
+            size (int): Maximum number of live drivers owned by the pool.
+            acquire_timeout (int): Seconds to wait for a free driver before giving up.
+            max_uses (int): Recycle a driver after this many recorded uses (0 disables).
+            max_rss_mb (int): Recycle a driver once its processes use this much memory (0 disables).
+            reap_interval (int): Seconds between sweeps for leaked browser processes (0 disables).
+        """
+        self._factory = factory
+        self._size = max(1, size)
+        self._acquire_timeout = acquire_timeout
+        self._max_uses = max_uses
+        self._max_rss_mb = max_rss_mb
+        self._reap_interval = reap_interval
+
+        self._idle = deque()
+        self._live = 0  # Drivers that exist (idle + borrowed + being launched)
+        self._uses = {}  # Every launched driver -> uses recorded since launch
+        self._cond = threading.Condition()
+        self._refill = threading.Event()
+        self._started = False
+
+        # Stats
+        self._acquisitions = 0
+        self._hits = 0
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._replacements = 0
+        self._failed_launches = 0
+        self._recycled = 0
+        self._reaped = 0
+
+    def start(self):
+        """
+        Start the background thread that launches drivers up to the pool size.
+        """
+        with self._cond:
+            if self._started:
+                return
+            self._started = True
+        threading.Thread(target=self._maintain, name="driver-pool", daemon=True).start()
+        self._refill.set()
+
+    def acquire(self, timeout=None):
+        """
+        Borrow a driver from the pool, launching one if the pool is not yet full.
+
+        Returns:
+            WebDriver: A healthy driver that has been reset for a new user.
+
+        Raises:
+            DriverPoolTimeout: If no driver became available within the timeout.
+        """
+        timeout = self._acquire_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        while True:
+            launch = False
+            with self._cond:
+                while not self._idle and self._live >= self._size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise DriverPoolTimeout(f"No browser available after waiting {timeout}s.")
+                    self._cond.wait(remaining)
+
+                if self._idle:
+                    driver = self._idle.popleft()
+                    hit = True
+                else:
+                    self._live += 1  # Reserve a slot for the driver we are about to launch
+                    launch = True
+                    hit = False
+
+            if launch:
+                driver = self._launch()
+                if driver is None:
+                    raise DriverPoolTimeout("Failed to launch a new browser.")
+
+            if hit and not self._is_healthy(driver):
+                logger.warning("Discarding unhealthy pooled driver.")
+                self.discard(driver)
+                continue
+
+            waited = time.monotonic() - start
+            with self._cond:
+                self._acquisitions += 1
+                if hit:
+                    self._hits += 1
+                self._total_wait += waited
+                self._max_wait = max(self._max_wait, waited)
+            return driver
+
+    def release(self, driver):
+        """
+        Return a borrowed driver to the pool after wiping the previous user's state.
+        """
+        if driver is None:
+            return
+        reason = self.recycle_reason(driver)
+        if reason:
+            self.recycle(driver, reason)
+            return
+        if not self._reset(driver):
+            self.discard(driver)
+            return
+        with self._cond:
+            self._idle.append(driver)
+            self._cond.notify()
+
+    def discard(self, driver):
+        """
+        Quit a broken driver and schedule a replacement in the background.
+        """
+        self._quit(driver)
+        with self._cond:
+            self._uses.pop(driver, None)
+            self._live -= 1
+            self._replacements += 1
+            self._cond.notify()
+        self._refill.set()
+
+    def record_use(self, driver):
+        """
+        Count one swap attempt made with a borrowed driver.
+        """
+        with self._cond:
+            if driver in self._uses:
+                self._uses[driver] += 1
+
+    def recycle_reason(self, driver):
+        """
+        Returns why a driver is worn out and should be replaced ("uses" or "memory"), or None.
+        """
+        with self._cond:
+            uses = self._uses.get(driver, 0)
+        if self._max_uses and uses >= self._max_uses:
+            return "uses"
+        if self._max_rss_mb and processes_rss(driver_processes(driver)) > self._max_rss_mb * 2 ** 20:
+            return "memory"
+        return None
+
+    def recycle(self, driver, reason):
+        """
+        Quit a worn-out driver and launch a fresh one in its place.
+        """
+        logger.info(f"Recycling browser ({reason}).")
+        BROWSER_RECYCLES.inc(reason=reason)
+        with self._cond:
+            self._recycled += 1
+        self.discard(driver)
+
+    def rss_bytes(self):
+        """
+        Resident memory of every driver's ChromeDriver and Chrome processes.
+        """
+        with self._cond:
+            drivers = list(self._uses)
+        return sum(processes_rss(driver_processes(driver)) for driver in drivers)
+
+    def reap_orphans(self):
+        """
+        Kill Chrome/ChromeDriver process trees that no pooled driver owns, e.g. left
+        behind by a failed quit() or a crashed ChromeDriver.
+
+        Only trees this process started (or that were re-parented to init when their
+        parent died) are touched, never a process using the profile of a live driver.
+        Crashpad handlers are only killed along with the browser whose profile they belong to.
+
+        Returns:
+            int: Number of process trees killed.
+        """
+        with self._cond:
+            drivers = list(self._uses)
+        owned_processes = [proc for driver in drivers for proc in driver_processes(driver)]
+        owned = {proc.pid for proc in owned_processes}
+        live_profiles = {path for path in map(profile_dir, owned_processes) if path}
+        me = os.getpid()
+        reaped = 0
+        dead_profiles = set()
+        crashpads = []
+        for proc in psutil.process_iter(["name", "ppid", "create_time"]):
+            name = (proc.info["name"] or "").lower()
+            if proc.pid in owned or not name.startswith(BROWSER_PROCESS_NAMES):
+                continue
+            if proc.info["ppid"] not in (me, 1) or time.time() - proc.info["create_time"] < REAP_GRACE_SECONDS:
+                continue
+            if name.startswith(CRASHPAD_PROCESS_NAME):
+                crashpads.append(proc)
+                continue
+            if in_profiles(profile_dir(proc), live_profiles):
+                continue  # Part of a pooled browser that was re-parented
+            try:
+                tree = [proc] + proc.children(recursive=True)
+            except psutil.Error:
+                continue
+            dead_profiles.update(path for path in map(profile_dir, tree) if path and not in_profiles(path, live_profiles))
+            logger.warning(f"Reaping orphaned browser process {proc.pid} ({name}) and {len(tree) - 1} children.")
+            kill_processes(tree)
+            reaped += 1
+        handlers = [proc for proc in crashpads if in_profiles(profile_dir(proc), dead_profiles)]
+        if handlers:
+            kill_processes(handlers)
+        if reaped:
+            BROWSER_ORPHANS_REAPED.inc(reaped)
+            with self._cond:
+                self._reaped += reaped
+        return reaped
+
+    def stats(self):
+        """
+        Returns a snapshot of pool size, wait time and hit rate.
+        """
+        with self._cond:
+            acquisitions = self._acquisitions
+            return {
+                "size": self._size,
+                "live": self._live,
+                "idle": len(self._idle),
+                "in_use": self._live - len(self._idle),
+                "acquisitions": acquisitions,
+                "hits": self._hits,
+                "hit_rate": round(self._hits / acquisitions, 3) if acquisitions else None,
+                "avg_wait_seconds": round(self._total_wait / acquisitions, 3) if acquisitions else 0.0,
+                "max_wait_seconds": round(self._max_wait, 3),
+                "replacements": self._replacements,
+                "failed_launches": self._failed_launches,
+                "recycled": self._recycled,
+                "orphans_reaped": self._reaped,
+            }
+
+    def shutdown(self):
+        """
+        Quit every idle driver. Borrowed drivers are quit when they are released.
+        """
+        with self._cond:
+            drivers = list(self._idle)
+            self._idle.clear()
+            self._live -= len(drivers)
+            self._size = 0
+        for driver in drivers:
+            self._quit(driver)
+            with self._cond:
+                self._uses.pop(driver, None)
+
+    def _launch(self):
+        """
+        Launch a driver for a slot that has already been reserved in self._live.
+        """
+        try:
+            driver = self._factory()
+            with self._cond:
+                self._uses[driver] = 0
+            return driver
+        except Exception as e:
+            logger.error(f"Failed to launch browser for pool: {e}")
+            with self._cond:
+                self._live -= 1
+                self._failed_launches += 1
+                self._cond.notify()
+            return None
+
+    def _maintain(self):
+        """
+        Background loop that keeps the pool filled with warm drivers.
+        """
+        next_reap = time.monotonic() + self._reap_interval
+        while True:
+            self._refill.wait(self._reap_interval or None)
+            self._refill.clear()
+            if self._reap_interval and time.monotonic() >= next_reap:
+                next_reap = time.monotonic() + self._reap_interval
+                try:
+                    self.reap_orphans()
+                except Exception as e:
+                    logger.warning(f"Failed to reap orphaned browser processes: {e}")
+            while True:
+                with self._cond:
+                    if self._live >= self._size:
+                        break
+                    self._live += 1
+                driver = self._launch()
+                if driver is None:
+                    # Back off before trying again so a broken Chrome install does not spin
+                    time.sleep(5)
+                    continue
+                with self._cond:
+                    self._idle.append(driver)
+                    self._cond.notify()
+
+    @staticmethod
+    def _quit(driver):
+        """
+        Quit a driver, killing its processes directly if quit() fails so they are not left behind.
+        """
+        if driver is None:
+            return
+        processes = driver_processes(driver)
+        try:
+            driver.quit()
+        except Exception as e:
+            logger.warning(f"Error quitting driver, killing its processes: {e}")
+            kill_processes(processes)
+
+    @staticmethod
+    def _is_healthy(driver):
+        try:
+            driver.execute_script("return 1")
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _reset(driver):
+        """
+        Clear cookies, storage and extra windows so the next user starts clean.
+        """
+        try:
+            handles = driver.window_handles
+            for handle in handles[1:]:
+                driver.switch_to.window(handle)
+                driver.close()
+            driver.switch_to.window(handles[0])
+
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            driver.execute_cdp_cmd("Network.clearBrowserCache", {})
+            driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": PORTAL_ORIGIN, "storageTypes": "all"})
+            driver.get("about:blank")
+            return True
+        except Exception as e:
+            logger.warning(f"Failed to reset pooled driver: {e}")
+            return False
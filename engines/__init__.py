@@ -0,0 +1,21 @@
+import config
+from engines.base import SwapEngine, EngineCrashed
+
+ENGINES = ("selenium", "http")
+
+def get_engine_class(name=None):
+    """
+    Returns the engine class selected for this deployment (SWAP_ENGINE).
+    Engines are imported lazily so an HTTP-only deployment never loads Selenium.
+    """
+    name = (name or config.SWAP_ENGINE).lower()
+    if name == "selenium":
+        from engines.selenium_engine import SeleniumEngine
+        return SeleniumEngine
+    if name == "http":
+        from engines.http_engine import HttpEngine
+        return HttpEngine
+    raise ValueError(f"Unknown SWAP_ENGINE '{name}'. Expected one of: {', '.join(ENGINES)}")
+
+def create_engine(swap_id, name=None):
+    return get_engine_class(name)(swap_id)
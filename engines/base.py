@@ -0,0 +1,217 @@
+import logging
+import re
+from collections import namedtuple
+import config
+import session_cache
+from metrics import SESSION_RESTORES
+
+logger = logging.getLogger(__name__)
+
+PORTAL_LOGIN_URL = config.PORTAL_LOGIN_URL
+PLANNER_URL = f"{config.PORTAL_BASE_URL}/AUS_STARS_PLANNER.planner"
+TIMETABLE_URL = f"{config.PORTAL_BASE_URL}/AUS_STARS_PLANNER.time_table"
+
+PORTAL_CLOSED_MESSAGE = "Portal is closed now. Please try again from 10:30am - 10:00pm."
+LOGIN_FAILED_MESSAGE = "Incorrect username/password. Please try again."
+
+# Result of one visit to the change index page for a module.
+# vacancies maps every index in the new_index_nmbr dropdown to (vacancies, waitlist);
+# clash is True when the portal rejected new_index with a module clash alert;
+# closed is True when the portal answered Go with its closed alert.
+SwapAttempt = namedtuple("SwapAttempt", ["success", "new_index", "message", "vacancies", "clash", "closed"], defaults=[False, False])
+
+def swap_succeeded(alert_text):
+    """
+    True if the alert shown after the confirm step is the portal's success message
+    ("Change index to 80271 is successful."), rather than a rejection.
+    """
+    return bool(alert_text) and re.search(r"\bsuccessful\b", alert_text, re.IGNORECASE) is not None
+
+def pick_index(new_indexes, table):
+    """
+    Returns the first preferred index that has a vacancy, or None.
+    """
+    for new_index in new_indexes:
+        if new_index in table and table[new_index][0] > 0:
+            return new_index
+    return None
+
+def no_vacancy_message(new_indexes, table):
+    """
+    Describe why none of the preferred indexes could be taken.
+    """
+    full = [i for i in new_indexes if i in table]
+    missing = [i for i in new_indexes if i not in table]
+    parts = []
+    if full:
+        parts.append(f"Index {', '.join(full)} have no vacancies.")
+    if missing:
+        parts.append(f"Index {', '.join(missing)} not found in the dropdown options.")
+    return " ".join(parts)
+
+
+class EngineCrashed(Exception):
+    """
+    Raised when the underlying browser or HTTP session is no longer usable.
+    The caller should restart() the engine and log in again.
+    """
+
+
+class SwapEngine:
+    """
+    Interface shared by every swap backend.
+
+    An engine owns one authenticated portal session for one swap job and
+    reports progress through the status store using its swap_id.
+    """
+
+    name = "base"
+
+    def __init__(self, swap_id):
+        self.swap_id = swap_id
+        self.account = None  # Portal username, for the per-account rate limit
+
+    def login(self, username, password):
+        """
+        Log in to the NTU portal and land on the STARS planner page.
+
+        Returns:
+            bool: True if login succeeded, False otherwise.
+        """
+        raise NotImplementedError
+
+    def authenticate(self, username, password):
+        """
+        Reuse this job's cached portal session if it is still valid, and only
+        fall back to a full login() when it is missing or has expired.
+
+        Returns:
+            bool: True if the engine is logged in, False otherwise.
+        """
+        self.account = username
+        if self.restore_session():
+            return True
+        if not self.login(username, password):
+            return False
+        try:
+            session_cache.save(self.swap_id, self.export_cookies())
+        except Exception as e:
+            logger.warning(f"Failed to cache portal session for {self.swap_id}: {e}")
+        return True
+
+    def restore_session(self):
+        """
+        Inject the cached cookies and probe the planner page with them.
+
+        Returns:
+            bool: True if the cached session is still logged in.
+        """
+        try:
+            cookies = session_cache.load(self.swap_id)
+            if not cookies:
+                SESSION_RESTORES.inc(engine=self.name, outcome="missing")
+                return False
+            self.import_cookies(cookies)
+            if not self.probe():
+                session_cache.clear(self.swap_id)
+                SESSION_RESTORES.inc(engine=self.name, outcome="expired")
+                return False
+        except EngineCrashed:
+            raise
+        except Exception as e:
+            logger.warning(f"Could not restore cached portal session for {self.swap_id}: {e}")
+            SESSION_RESTORES.inc(engine=self.name, outcome="error")
+            return False
+        SESSION_RESTORES.inc(engine=self.name, outcome="reused")
+        logger.info(f"Reused cached portal session for {self.swap_id}.")
+        return True
+
+    def export_cookies(self):
+        """
+        Returns:
+            list: The portal cookies of the current session, as session_cache cookie dicts.
+        """
+        raise NotImplementedError
+
+    def import_cookies(self, cookies):
+        """
+        Load cookies exported by any engine into the current session.
+        """
+        raise NotImplementedError
+
+    def probe(self):
+        """
+        Cheaply check whether the current session is logged in, leaving it on the planner page.
+
+        Returns:
+            bool: True if the planner page loaded without a login.
+        """
+        raise NotImplementedError
+
+    def attempt_swap(self, old_index, new_indexes, idx):
+        """
+        Visit the change index page for old_index once, read the vacancies of
+        every index in the dropdown, and swap to the first of new_indexes
+        (in order of preference) that has a vacancy.
+
+        Returns:
+            SwapAttempt: (success, new_index, message, vacancies, clash, closed). The engine
+                does not fail the job when the portal is closed; the caller waits for it to open.
+
+        Raises:
+            EngineCrashed: If the session died and the engine must be restarted.
+        """
+        raise NotImplementedError
+
+    def check_vacancies(self, old_indexes, max_parallel):
+        """
+        Read the change index dropdown for several modules concurrently under
+        the current login, without swapping anything.
+
+        Args:
+            old_indexes (list): Currently registered index of each module to check.
+            max_parallel (int): Most pages in flight at once for this job.
+
+        Returns:
+            dict: old_index -> SwapAttempt with success False and the vacancy table
+                (empty, with the reason in message, if the page could not be read;
+                closed is set if the portal is closed).
+        """
+        raise NotImplementedError
+
+    def refresh(self):
+        """
+        Replace worn-out resources (e.g. a browser whose memory has grown) between checks.
+
+        Returns:
+            bool: True if the engine was reset and must authenticate() before the next attempt.
+        """
+        return False
+
+    def suspend(self):
+        """
+        Give back expensive resources (e.g. the pooled browser) while the job waits
+        between checks. resume() must be called before the next attempt.
+        """
+        self.close()
+
+    def resume(self, username, password):
+        """
+        Reacquire resources after suspend() and authenticate() again.
+
+        Returns:
+            bool: True if login succeeded, False otherwise.
+        """
+        raise NotImplementedError
+
+    def restart(self):
+        """
+        Throw away the current session and start a fresh, logged-out one.
+        """
+        raise NotImplementedError
+
+    def close(self):
+        """
+        Release every resource held by the engine.
+        """
+        raise NotImplementedError
@@ -0,0 +1,334 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+
+import requests
+from requests.adapters import HTTPAdapter
+
+import config
+import flight_recorder
+import rate_limiter
+from metrics import SWAP_STEP_SECONDS, SWAP_ATTEMPTS, StepTimer
+from status_store import update_status, update_overall_status
+from portal_parsers import (
+    parse_html, find_alert, find_refresh_url, find_planner_table, find_submit, find_index_radio, vacancy_table
+)
+from engines.base import (
+    SwapEngine, SwapAttempt, EngineCrashed, pick_index, no_vacancy_message, swap_succeeded, PORTAL_LOGIN_URL, PLANNER_URL, TIMETABLE_URL,
+    PORTAL_CLOSED_MESSAGE, LOGIN_FAILED_MESSAGE
+)
+
+logger = logging.getLogger(__name__)
+
+USER_AGENT = (
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 "
+    "(KHTML, like Gecko) Chrome/132.0.0.0 Safari/537.36"
+)
+
+# One adapter (and therefore one urllib3 connection pool) is shared by every
+# job's session, so jobs reuse TLS connections to the portal while keeping
+# their own cookies.
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=config.HTTP_POOL_SIZE)
+
+def new_session():
+    """
+    Create a requests.Session that draws connections from the shared pool.
+    """
+    session = requests.Session()
+    session.mount("https://", _adapter)
+    session.mount("http://", _adapter)
+    session.headers["User-Agent"] = USER_AGENT
+    return session
+
+def form_payload(form, overrides=None, submit=None):
+    """
+    Serialise a form the way a browser would on submit.
+
+    Args:
+        form (Tag): The <form> element.
+        overrides (dict): Field values to set, e.g. a chosen radio or select option.
+        submit (str): Value of the submit button that was "clicked".
+    """
+    payload = {}
+    for field in form.find_all(["input", "select", "textarea"]):
+        name = field.get("name")
+        if not name:
+            continue
+        if field.name == "select":
+            option = field.find("option", selected=True) or field.find("option")
+            payload[name] = option.get("value", option.text.strip()) if option else ""
+        elif field.name == "textarea":
+            payload[name] = field.text
+        else:
+            field_type = (field.get("type") or "text").lower()
+            if field_type in ("submit", "button", "image", "reset"):
+                if submit is not None and field.get("value") == submit:
+                    payload[name] = field.get("value", "")
+                continue
+            if field_type in ("radio", "checkbox") and not field.has_attr("checked"):
+                continue
+            payload[name] = field.get("value", "")
+    payload.update(overrides or {})
+    return payload
+
+
+class HttpEngine(SwapEngine):
+    """
+    Swap engine that posts the portal's forms directly with requests + bs4.
+    Needs no browser, so each job costs one session and a few KB of HTML.
+    """
+
+    name = "http"
+
+    def __init__(self, swap_id):
+        super().__init__(swap_id)
+        self.session = new_session()
+        self.url = None
+        self.soup = None
+
+    def _load(self, response):
+        """
+        Remember the page we are on, following meta refresh redirects.
+        """
+        response.raise_for_status()
+        soup = parse_html(response.text)
+        refresh_url = find_refresh_url(soup)
+        if refresh_url:
+            return self._load(self._request("GET", urljoin(response.url, refresh_url)))
+        self.url = response.url
+        self.soup = soup
+        return soup
+
+    def _request(self, method, url, data=None, priority=rate_limiter.ROUTINE):
+        rate_limiter.acquire(self.account, priority)  # Every portal request takes a token
+        try:
+            return self.session.request(method, url, data=data, timeout=config.HTTP_TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise EngineCrashed(str(e)) from e
+
+    def _submit(self, element, overrides=None, submit=None, priority=rate_limiter.ROUTINE):
+        """
+        Submit the form that contains element, as if the named submit button was clicked.
+        """
+        form = element if element.name == "form" else element.find_parent("form")
+        if form is None:
+            raise ValueError("Element is not inside a form.")
+        action = urljoin(self.url, form.get("action") or self.url)
+        payload = form_payload(form, overrides, submit)
+        if (form.get("method") or "get").lower() == "post":
+            return self._load(self._request("POST", action, data=payload, priority=priority))
+        return self._load(self._request("GET", action + "?" + requests.compat.urlencode(payload), priority=priority))
+
+    def _back_to_timetable(self):
+        back_button = find_submit(self.soup, "Back to Timetable")
+        if back_button is not None:
+            self._submit(back_button, submit="Back to Timetable")
+        if find_planner_table(self.soup) is None:
+            self._load(self._request("GET", PLANNER_URL))
+
+    def login(self, username, password):
+        timer = StepTimer(SWAP_STEP_SECONDS, engine=self.name)
+        soup = self._load(self._request("GET", PORTAL_LOGIN_URL))
+        timer.lap("login_page")
+
+        username_field = soup.find("input", id="UID")
+        if username_field is None:
+            raise ValueError("Login page did not contain the UID field.")
+        soup = self._submit(username_field, {username_field["name"]: username}, submit="OK")
+        timer.lap("login_uid")
+
+        password_field = soup.find("input", id="PW")
+        if password_field is None:
+            update_overall_status(self.swap_id, status="Error", message=LOGIN_FAILED_MESSAGE)
+            logger.error(LOGIN_FAILED_MESSAGE)
+            return False
+        soup = self._submit(password_field, {password_field["name"]: password}, submit="OK")
+        timer.lap("login_pw")
+
+        # Check if redirected to the time_table page
+        if self.url.startswith(TIMETABLE_URL) or find_planner_table(soup) is None:
+            plan_button = find_submit(soup, "Plan/ Registration")
+            if plan_button is not None:
+                soup = self._submit(plan_button, submit="Plan/ Registration")
+                logger.info("Submitted the 'Plan/ Registration' form to proceed to the planner.")
+                timer.lap("login_planner")
+
+        if find_planner_table(soup) is None:
+            update_overall_status(self.swap_id, status="Error", message=LOGIN_FAILED_MESSAGE)
+            logger.error(LOGIN_FAILED_MESSAGE)
+            return False
+        return True
+
+    def export_cookies(self):
+        return [{
+            "name": cookie.name,
+            "value": cookie.value,
+            "domain": cookie.domain,
+            "path": cookie.path,
+            "secure": cookie.secure,
+            "httpOnly": cookie.has_nonstandard_attr("HttpOnly"),
+            "expires": cookie.expires
+        } for cookie in self.session.cookies]
+
+    def import_cookies(self, cookies):
+        for cookie in cookies:
+            self.session.cookies.set(
+                cookie["name"],
+                cookie["value"],
+                domain=cookie.get("domain", ""),
+                path=cookie.get("path", "/"),
+                secure=cookie.get("secure", False),
+                expires=cookie.get("expires"),
+                rest={"HttpOnly": None} if cookie.get("httpOnly") else {}
+            )
+
+    def probe(self):
+        soup = self._load(self._request("GET", PLANNER_URL))
+        return find_planner_table(soup) is not None
+
+    def check_vacancies(self, old_indexes, max_parallel):
+        timer = StepTimer(SWAP_STEP_SECONDS, engine=self.name)
+        if self.soup is None or find_planner_table(self.soup) is None:
+            self._load(self._request("GET", PLANNER_URL))
+        planner, planner_url = self.soup, self.url
+
+        def check(old_index):
+            radio_button = find_index_radio(planner, old_index)
+            if radio_button is None:
+                return SwapAttempt(False, None, f"Old index  {old_index} not found. Swap cannot proceed.", {})
+            form = radio_button.find_parent("form")
+            action = urljoin(planner_url, form.get("action") or planner_url)
+            payload = form_payload(form, {radio_button["name"]: old_index, "opt": "C"}, "Go")
+
+            # Each check gets its own session carrying a copy of the login cookies,
+            # so the requests run side by side on the shared connection pool
+            session = new_session()
+            session.cookies.update(self.session.cookies)
+            rate_limiter.acquire(self.account)
+            try:
+                response = session.post(action, data=payload, timeout=config.HTTP_TIMEOUT)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                raise EngineCrashed(str(e)) from e
+            soup = parse_html(response.text)
+            vacancies = vacancy_table(soup)
+            if vacancies is None:
+                alert_text = find_alert(soup)
+                if alert_text is not None:
+                    return SwapAttempt(False, None, PORTAL_CLOSED_MESSAGE, {}, closed=True)
+                return SwapAttempt(False, None, f"Change index page for {old_index} did not load.", {})
+            return SwapAttempt(False, None, "", vacancies)
+
+        with ThreadPoolExecutor(max_workers=min(max_parallel, len(old_indexes))) as executor:
+            results = dict(zip(old_indexes, executor.map(check, old_indexes)))
+        timer.lap("parallel_check")
+        return results
+
+    def attempt_swap(self, old_index, new_indexes, idx):
+        try:
+            return self._attempt_swap(old_index, new_indexes, idx)
+        except rate_limiter.RateLimited:
+            raise
+        except Exception as e:
+            title = self.soup.title.get_text(strip=True) if self.soup is not None and self.soup.title else None
+            flight_recorder.dump(f"Swap attempt for {old_index} failed: {e}", url=self.url, title=title,
+                                 page_source=lambda: str(self.soup))
+            raise
+
+    def _attempt_swap(self, old_index, new_indexes, idx):
+        swap_id = self.swap_id
+        timer = StepTimer(SWAP_STEP_SECONDS, engine=self.name)
+        update_status(swap_id, idx, f"Checking vacancies for {old_index} -> {', '.join(new_indexes)}")
+
+        # 1) Make sure we are on the planner page
+        if self.soup is None or find_planner_table(self.soup) is None:
+            self._load(self._request("GET", PLANNER_URL))
+
+        # 2) Locate the radio button for old_index
+        radio_button = find_index_radio(self.soup, old_index)
+        if radio_button is None:
+            error_message = f"Old index  {old_index} not found. Swap cannot proceed."
+            update_status(swap_id, idx, error_message)
+            update_overall_status(swap_id, status="Error", message=error_message)
+            logger.error(error_message)
+            return SwapAttempt(False, None, error_message, {})
+
+        # 3-4) Choose "Change Index" and submit Go
+        soup = self._submit(radio_button, {radio_button["name"]: old_index, "opt": "C"}, submit="Go")
+        timer.lap("go")
+
+        # 5) The change index page has the new_index_nmbr dropdown; an alert instead means the portal is closed
+        vacancies = vacancy_table(soup)
+        if vacancies is None:
+            alert_text = find_alert(soup)
+            if alert_text is not None:
+                logger.info(f"Alert detected: {alert_text}")
+                SWAP_ATTEMPTS.inc(engine=self.name, outcome="portal_closed")
+                logger.warning(PORTAL_CLOSED_MESSAGE)
+                return SwapAttempt(False, None, PORTAL_CLOSED_MESSAGE, {}, closed=True)
+            error_message = f"Change index page for {old_index} did not load. Current URL: {self.url}"
+            update_status(swap_id, idx, error_message)
+            logger.error(error_message)
+            self._back_to_timetable()
+            return SwapAttempt(False, None, error_message, {})
+
+        # 6) Pick the first preferred index with a vacancy from the parsed dropdown
+        new_index = pick_index(new_indexes, vacancies)
+        timer.lap("dropdown_parse")
+        if new_index is None:
+            SWAP_ATTEMPTS.inc(engine=self.name, outcome="no_vacancy")
+            error_message = no_vacancy_message(new_indexes, vacancies)
+            update_status(swap_id, idx, error_message)
+            logger.error(error_message)
+            self._back_to_timetable()
+            return SwapAttempt(False, None, error_message, vacancies)
+
+        # 7) Select the new index and submit OK
+        update_status(swap_id, idx, f"Attempting to swap {old_index} -> {new_index}")
+        dropdown = soup.find("select", attrs={"name": "new_index_nmbr"})
+        soup = self._submit(dropdown, {"new_index_nmbr": new_index}, submit="OK")
+        timer.lap("ok")
+
+        # Catch Module Clash error with other existing modules
+        confirm_button = find_submit(soup, "Confirm to Change Index Number")
+        if confirm_button is None:
+            alert_text = find_alert(soup)
+            clash = alert_text is not None
+            alert_text = alert_text or f"Confirm page for {new_index} did not load."
+            SWAP_ATTEMPTS.inc(engine=self.name, outcome="clash" if clash else "error")
+            update_status(swap_id, idx, alert_text)
+            logger.error(alert_text)
+            self._back_to_timetable()
+            return SwapAttempt(False, new_index, alert_text, vacancies, clash=clash)
+
+        # 8) Confirm the change and read the official result alert
+        soup = self._submit(confirm_button, submit="Confirm to Change Index Number", priority=rate_limiter.CONFIRM)
+        timer.lap("confirm")
+        alert_text = find_alert(soup)
+        logger.info(f"Alert text: {alert_text}")
+        if find_planner_table(soup) is None:
+            self._back_to_timetable()
+        if not swap_succeeded(alert_text):
+            # The portal turned the change down at the last step (e.g. the vacancy was just taken)
+            SWAP_ATTEMPTS.inc(engine=self.name, outcome="error")
+            error_message = alert_text or f"The portal did not confirm the change to {new_index}."
+            update_status(swap_id, idx, error_message)
+            logger.error(error_message)
+            return SwapAttempt(False, new_index, error_message, vacancies)
+        SWAP_ATTEMPTS.inc(engine=self.name, outcome="swapped")
+
+        return SwapAttempt(True, new_index, "", vacancies)
+
+    def restart(self):
+        self.session.cookies.clear()
+        self.session = new_session()
+        self.url = None
+        self.soup = None
+
+    def resume(self, username, password):
+        self.restart()
+        return self.authenticate(username, password)
+
+    def close(self):
+        # Session.close() would close the shared adapter, so only drop our cookies
+        self.session.cookies.clear()
+        self.soup = None
@@ -0,0 +1,545 @@
+import logging
+import threading
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support.ui import WebDriverWait, Select
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.chrome.service import Service
+from selenium.common.exceptions import (
+    TimeoutException, WebDriverException, SessionNotCreatedException, NoAlertPresentException, UnexpectedAlertPresentException
+)
+
+import capacity
+import config
+import flight_recorder
+import rate_limiter
+from driver_pool import DriverPool
+from metrics import SWAP_STEP_SECONDS, SWAP_ATTEMPTS, LIVE_BROWSERS, BROWSER_RSS_BYTES, StepTimer
+from status_store import update_status, update_overall_status
+from portal_parsers import parse_html, parse_index_options, find_alert, vacancy_table
+from engines.base import (
+    SwapEngine, SwapAttempt, EngineCrashed, pick_index, no_vacancy_message, swap_succeeded, PORTAL_LOGIN_URL, PLANNER_URL, TIMETABLE_URL,
+    PORTAL_CLOSED_MESSAGE, LOGIN_FAILED_MESSAGE
+)
+
+logger = logging.getLogger(__name__)
+
+LEAN = config.BROWSER_MODE == "lean"
+ALERT_POLL_SECONDS = 0.1 if LEAN else 0.5
+
+# Elements that mark each page of the swap flow
+PLANNER_TABLE = (By.XPATH, "//table[@bordercolor='#E0E0E0']")
+CHANGE_INDEX_FORM = (By.NAME, "AUS_STARS_MENU")
+CONFIRM_FORM = (By.XPATH, "//*[@id='top']/div/section[2]/div/div/form[1]")
+
+# Reads the change index dropdown of several modules at once from the planner page:
+# each module's Go form is posted with fetch() under the browser's login cookies,
+# at most arguments[1] at a time, and the options (or alert text) are returned.
+CHECK_VACANCIES_SCRIPT = """
+const oldIndexes = arguments[0], maxParallel = arguments[1], done = arguments[arguments.length - 1];
+const results = {};
+async function check(oldIndex) {
+    const radio = document.querySelector(`input[type='radio'][value='${oldIndex}']`);
+    if (!radio || !radio.form) {
+        results[oldIndex] = {error: `Old index  ${oldIndex} not found. Swap cannot proceed.`};
+        return;
+    }
+    const form = radio.form;
+    const data = new FormData(form);
+    data.set(radio.name, oldIndex);
+    data.set('opt', 'C');
+    const go = form.querySelector("input[type='submit'][value='Go']");
+    if (go && go.name) {
+        data.set(go.name, go.value);
+    }
+    const params = new URLSearchParams(data);
+    try {
+        const response = form.method.toLowerCase() === 'post'
+            ? await fetch(form.action, {method: 'POST', body: params, credentials: 'same-origin'})
+            : await fetch(`${form.action}?${params}`, {credentials: 'same-origin'});
+        results[oldIndex] = {html: await response.text()};
+    } catch (e) {
+        results[oldIndex] = {error: String(e)};
+    }
+}
+const queue = oldIndexes.slice();
+const workers = Array.from({length: Math.min(maxParallel, queue.length)}, async () => {
+    while (queue.length) {
+        await check(queue.shift());
+    }
+});
+Promise.all(workers).then(() => done(results));
+"""
+
+def create_driver():
+    """
+    Create and return a new Selenium WebDriver instance.
+    """
+    options = Options()
+    options.binary_location = config.CHROME_BINARY_PATH
+    options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')  # Avoid shared memory crashes
+    options.add_argument('--window-size=1920x1080')  # Optional, for better rendering
+    if LEAN:
+        # Return from get()/click() at DOMContentLoaded instead of waiting for every subresource
+        options.page_load_strategy = 'eager'
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        options.add_experimental_option("prefs", {"profile.managed_default_content_settings.images": 2})
+
+    service = Service(config.CHROMEDRIVER_PATH)
+    with SWAP_STEP_SECONDS.time(engine="selenium", step="driver_create"):
+        driver = webdriver.Chrome(service=service, options=options)
+    if LEAN:
+        try:
+            # Blocked URLs stay in force for the lifetime of the tab, across pool resets
+            driver.execute_cdp_cmd("Network.enable", {})
+            driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": config.LEAN_BLOCKED_URLS})
+        except WebDriverException as e:
+            logger.warning(f"Could not block non-essential resources: {e}")
+    return driver
+
+def wait_for_alert(driver, timeout, next_page=None):
+    """
+    Wait for a JavaScript alert, accept it and return its text.
+
+    In lean mode the wait also ends as soon as next_page (a locator for the page
+    that follows when there is no alert) is present, instead of running out the
+    full timeout on the common no-alert path.
+
+    Returns:
+        str or None: The alert text, or None if no alert appeared.
+    """
+    if not LEAN:
+        next_page = None
+
+    def alert_or_next_page(d):
+        try:
+            alert = d.switch_to.alert
+            return ("alert", alert.text)
+        except NoAlertPresentException:
+            pass
+        if next_page and d.find_elements(*next_page):
+            return ("page", None)
+        return False
+
+    try:
+        kind, alert_text = WebDriverWait(
+            driver, timeout, poll_frequency=ALERT_POLL_SECONDS, ignored_exceptions=(UnexpectedAlertPresentException,)
+        ).until(alert_or_next_page)
+    except TimeoutException:
+        return None
+    if kind == "alert":
+        driver.switch_to.alert.accept()  # Close the alert
+    return alert_text
+
+_driver_pool = None
+_driver_pool_lock = threading.Lock()
+
+def get_driver_pool():
+    """
+    Returns the process-wide pool of pre-launched browsers, starting it on first use.
+    """
+    global _driver_pool
+    with _driver_pool_lock:
+        if _driver_pool is None:
+            _driver_pool = DriverPool(
+                create_driver,
+                size=capacity.driver_pool_size(),
+                acquire_timeout=config.DRIVER_POOL_TIMEOUT,
+                max_uses=config.BROWSER_MAX_ATTEMPTS,
+                max_rss_mb=config.BROWSER_MAX_RSS_MB,
+                reap_interval=config.BROWSER_REAP_INTERVAL
+            )
+            _driver_pool.start()
+            LIVE_BROWSERS.set_function(lambda: _driver_pool.stats()["live"])
+            BROWSER_RSS_BYTES.set_function(lambda: _driver_pool.rss_bytes())
+        return _driver_pool
+
+def login_to_portal(driver, username, password, swap_id):
+    """
+    Log in to the NTU portal.
+    Returns True if login succeeded, False otherwise.
+    """
+    timer = StepTimer(SWAP_STEP_SECONDS, engine="selenium")
+    rate_limiter.acquire(username)
+    driver.get(PORTAL_LOGIN_URL)
+    timer.lap("login_page")
+
+    username_field = driver.find_element(By.ID, "UID")
+    username_field.send_keys(username)
+    ok_button = driver.find_element(By.XPATH, "//input[@value='OK']")
+    rate_limiter.acquire(username)
+    ok_button.click()
+
+    WebDriverWait(driver, 10).until(EC.presence_of_element_located((By.ID, "PW")))
+    timer.lap("login_uid")
+
+    password_field = driver.find_element(By.ID, "PW")
+    password_field.send_keys(password)
+    ok_button = driver.find_element(By.XPATH, "//input[@value='OK']")
+    rate_limiter.acquire(username)
+    ok_button.click()
+
+    # Check if login is successful or redirected to a different page
+    try:
+        # Wait for the URL to either be the expected URL or the alternate URL
+        WebDriverWait(driver, 10).until(
+        lambda d: d.current_url in [PLANNER_URL, TIMETABLE_URL]
+    )
+        timer.lap("login_pw")
+
+        # Check if redirected to the time_table URL
+        if driver.current_url == TIMETABLE_URL:
+            # Check for the "Plan/ Registration" button
+            try:
+                plan_button = driver.find_element(By.XPATH, "//input[@value='Plan/ Registration']")
+                rate_limiter.acquire(username)
+                plan_button.click()
+                logger.info("Clicked the 'Plan/ Registration' button to proceed to the planner.")
+            except Exception as e:
+                error_message = "Unable to find or click the 'Plan/ Registration' button."
+                update_overall_status(swap_id, status="Error", message=error_message)
+                logger.error(f"{error_message} {e}")
+                return False
+
+        # Proceed to wait for the table if on the planner page
+        WebDriverWait(driver, 10).until(EC.presence_of_element_located(PLANNER_TABLE))
+        timer.lap("login_planner")
+        return True
+    # If login fails, print exception
+    except Exception:
+        # If login fails, update status and exit
+        update_overall_status(swap_id, status="Error", message=LOGIN_FAILED_MESSAGE)
+        logger.error(LOGIN_FAILED_MESSAGE)
+        return False
+
+def attempt_swap(old_index, new_indexes, idx, driver, swap_id, account=None):
+    """
+    Visits the change index page for old_index once and swaps to the first of
+    new_indexes that has a vacancy.
+    Returns a SwapAttempt; success is True if the swap went through.
+    """
+    new_index = None
+    vacancies = {}
+    timer = StepTimer(SWAP_STEP_SECONDS, engine="selenium")
+    try:
+        update_status(swap_id, idx, f"Checking vacancies for {old_index} -> {', '.join(new_indexes)}")
+        # 1) Wait for the table element to appear on the main page, loading the planner
+        # if an earlier attempt was cut short on another page
+        try:
+            WebDriverWait(driver, 2).until(EC.presence_of_element_located(PLANNER_TABLE))
+        except TimeoutException:
+            rate_limiter.acquire(account)
+            driver.get(PLANNER_URL)
+            WebDriverWait(driver, 10).until(EC.presence_of_element_located(PLANNER_TABLE))
+
+        # 2) Locate the radio button for old_index by its value attribute and click it.
+        try:
+            # Wait for the radio button to be present
+            WebDriverWait(driver, 10).until(
+                EC.presence_of_element_located((By.XPATH, f"//input[@type='radio' and @value='{old_index}']"))
+            )
+
+            # Locate and click the radio button
+            radio_button = driver.find_element(By.XPATH, f"//input[@type='radio' and @value='{old_index}']")
+            radio_button.click()
+            timer.lap("radio_select")
+
+        except TimeoutException:
+            # If the radio button is not found within the timeout period
+            error_message = f"Old index  {old_index} not found. Swap cannot proceed."
+            update_status(swap_id, idx, error_message)
+            update_overall_status(swap_id, status="Error", message=error_message)
+            logger.error(error_message)
+            return SwapAttempt(False, None, error_message, {})  # Return a value indicating failure
+
+        except Exception as e:
+            # Handle any unexpected errors
+            error_message = f"Unexpected error locating radio button for index {old_index}: {str(e)}"
+            update_status(swap_id, idx, error_message)
+            logger.error(error_message)
+            return SwapAttempt(False, None, error_message, {})  # Return a value indicating failure
+
+        # 3) Select the "Change Index" option from the dropdown
+        dropdown = Select(driver.find_element(By.NAME, "opt"))
+        dropdown.select_by_value("C")
+
+        # 4) Click the 'Go' button
+        header = driver.find_element(By.CLASS_NAME, "site-header__body")
+        driver.execute_script("arguments[0].style.visibility = 'hidden';", header)  # Hide the header
+        go_button = driver.find_element(By.XPATH, "//input[@type='submit' and @value='Go']")
+        rate_limiter.acquire(account)
+        go_button.click()
+        timer.lap("go")
+
+        """
+        Swap index page after choosing the mod and index you want to swap
+        """
+
+        # 5) Check for an alert, if portal is closed
+        alert_text = wait_for_alert(driver, 5, next_page=CHANGE_INDEX_FORM)
+        timer.lap("alert_wait_go")
+        if alert_text is not None:
+            logger.info(f"Alert detected: {alert_text}")
+            SWAP_ATTEMPTS.inc(engine="selenium", outcome="portal_closed")
+            logger.warning(PORTAL_CLOSED_MESSAGE)
+            return SwapAttempt(False, None, PORTAL_CLOSED_MESSAGE, {}, closed=True)
+        # If no alert, proceed to the swap index page
+        logger.debug("No alert detected, proceeding to the swap index page.")
+
+        # 6) Wait for the swap index page
+        WebDriverWait(driver, 10).until(EC.presence_of_element_located(CHANGE_INDEX_FORM))
+        timer.lap("change_index_page")
+
+        # 7) Read every index in the dropdown in one round trip and pick the first preferred index with a vacancy
+        try:
+            dropdown_element = driver.find_element(By.NAME, "new_index_nmbr")
+            options = driver.execute_script(
+                "return Array.from(arguments[0].options).map(o => [o.value, o.text]);", dropdown_element
+            )
+            vacancies = parse_index_options(options)
+            timer.lap("dropdown_parse")
+            logger.info(f"Vacancies for {old_index}: {vacancies}")
+
+            new_index = pick_index(new_indexes, vacancies)
+            if new_index is None:
+                # None of the preferred indexes can be taken right now
+                error_message = no_vacancy_message(new_indexes, vacancies)
+                update_status(swap_id, idx, error_message)
+                logger.error(error_message)
+
+                # Click the 'Back To Timetable' button
+                back_button = driver.find_element(By.XPATH, "//input[@type='submit' and @value='Back to Timetable']")
+                rate_limiter.acquire(account)
+                back_button.click()
+
+                SWAP_ATTEMPTS.inc(engine="selenium", outcome="no_vacancy")
+                return SwapAttempt(False, None, error_message, vacancies)
+
+            # Select the new index in the dropdown
+            select_dropdown = Select(dropdown_element)
+            select_dropdown.select_by_value(new_index)
+            update_status(swap_id, idx, f"Attempting to swap {old_index} -> {new_index}")
+
+        except rate_limiter.RateLimited:
+            raise  # Not an error in the page; handled below
+
+        except Exception as e:
+            # Catch any unexpected errors
+            error_message = f"Unexpected error while checking new indexes {', '.join(new_indexes)}: {str(e)}"
+            update_overall_status(swap_id, status="Error", message=error_message)
+            logger.error(error_message)
+
+            # Click the 'Back To Timetable' button
+            back_button = driver.find_element(By.XPATH, "//input[@type='submit' and @value='Back to Timetable']")
+            rate_limiter.acquire(account)
+            back_button.click()
+
+            return SwapAttempt(False, None, error_message, {})
+
+        # 8) Click 'OK'
+        ok_button2 = driver.find_element(By.XPATH, "//input[@type='submit' and @value='OK']")
+        rate_limiter.acquire(account)
+        ok_button2.click()
+        timer.lap("ok")
+
+        # Catch Module Clash error with other existing modules
+        alert_text = wait_for_alert(driver, 5, next_page=CONFIRM_FORM)
+        timer.lap("alert_wait_ok")
+        if alert_text is not None:
+            logger.info(f"Alert detected: {alert_text}")
+            SWAP_ATTEMPTS.inc(engine="selenium", outcome="clash")
+            update_status(swap_id, idx, alert_text)
+            logger.error(alert_text)
+
+            # Click the 'Back To Timetable' button
+            back_button = driver.find_element(By.XPATH, "//input[@type='submit' and @value='Back to Timetable']")
+            rate_limiter.acquire(account)
+            back_button.click()
+
+            return SwapAttempt(False, new_index, alert_text, vacancies, clash=True)
+        # If no alert, proceed to the confirm page
+        logger.debug("No slot clash alert detected, proceeding to confirm swap index.")
+
+        """
+        Confirm Swap Index page after choosing the mod and index you want to swap
+        """
+
+        # 9) Wait for the confirm swap index page
+        WebDriverWait(driver, 10).until(EC.presence_of_element_located(CONFIRM_FORM))
+
+        # 10) Click the 'Confirm to Change Index Number' button
+        confirm_change_button = driver.find_element(By.XPATH, "//input[@type='submit' and @value='Confirm to Change Index Number']")
+        rate_limiter.acquire(account, rate_limiter.CONFIRM)  # Confirm steps go ahead of routine checks
+        confirm_change_button.click()
+
+        # 11) Wait for the official changed index alert to pop up and click OK
+        WebDriverWait(driver, 10).until(
+            EC.alert_is_present()
+        )
+
+        alert = driver.switch_to.alert
+        alert_text = alert.text
+        logger.info(f"Alert text: {alert_text}")
+        alert.accept()      # Accept (click OK) on the alert
+        timer.lap("confirm")
+        if not swap_succeeded(alert_text):
+            # The portal turned the change down at the last step (e.g. the vacancy was just taken)
+            SWAP_ATTEMPTS.inc(engine="selenium", outcome="error")
+            error_message = alert_text or f"The portal did not confirm the change to {new_index}."
+            update_status(swap_id, idx, error_message)
+            logger.error(error_message)
+            return SwapAttempt(False, new_index, error_message, vacancies)
+        SWAP_ATTEMPTS.inc(engine="selenium", outcome="swapped")
+
+        return SwapAttempt(True, new_index, "", vacancies)  # Successful swap, no error message
+
+    except rate_limiter.RateLimited:
+        # Out of portal tokens partway through: leave the browser on the planner page for the next attempt
+        try:
+            driver.get(PLANNER_URL)
+        except WebDriverException as e:
+            logger.warning(f"Could not return to the planner page: {e}")
+        raise
+
+    except SessionNotCreatedException as e:
+        logger.error("Session expired. Re-logging in...")
+        flight_recorder.dump(f"Swap attempt for {old_index} lost its browser session: {e}")
+        raise EngineCrashed(str(e)) from e
+
+    except Exception as e:
+        try:
+            current_url = driver.current_url
+            page_title = driver.title
+        except WebDriverException:
+            # The browser itself is gone, so the caller has to restart it
+            flight_recorder.dump(f"Swap attempt for {old_index} crashed the browser: {e}")
+            raise EngineCrashed(str(e)) from e
+        error_message = (
+            f"Error during swap attempt for {old_index} -> {new_index or ', '.join(new_indexes)}: {e}. "
+            f"Current URL: {current_url}, Page Title: {page_title}"
+        )
+        update_status(swap_id, idx, error_message)
+        flight_recorder.dump(error_message, url=current_url, title=page_title, page_source=lambda: driver.page_source)
+        return SwapAttempt(False, new_index, error_message, vacancies)
+
+
+class SeleniumEngine(SwapEngine):
+    """
+    Swap engine that drives a pooled headless Chrome through the portal.
+    """
+
+    name = "selenium"
+
+    def __init__(self, swap_id):
+        super().__init__(swap_id)
+        self.pool = get_driver_pool()
+        # Borrow a warm browser from the pool
+        self.driver = self.pool.acquire()
+
+    def login(self, username, password):
+        try:
+            return login_to_portal(self.driver, username, password, self.swap_id)
+        except WebDriverException as e:
+            raise EngineCrashed(str(e)) from e
+
+    def export_cookies(self):
+        cookies = self.driver.execute_cdp_cmd("Network.getCookies", {"urls": [config.PORTAL_BASE_URL]})["cookies"]
+        return [{
+            "name": cookie["name"],
+            "value": cookie["value"],
+            "domain": cookie["domain"],
+            "path": cookie["path"],
+            "secure": cookie["secure"],
+            "httpOnly": cookie["httpOnly"],
+            "expires": None if cookie.get("session") else cookie.get("expires")
+        } for cookie in cookies]
+
+    def import_cookies(self, cookies):
+        # CDP sets cookies without first navigating to the portal's domain
+        params = []
+        for cookie in cookies:
+            param = {key: cookie[key] for key in ("name", "value", "path", "secure", "httpOnly") if key in cookie}
+            if cookie.get("domain"):
+                param["domain"] = cookie["domain"]
+            else:
+                param["url"] = config.PORTAL_BASE_URL
+            if cookie.get("expires"):
+                param["expires"] = cookie["expires"]
+            params.append(param)
+        self.driver.execute_cdp_cmd("Network.setCookies", {"cookies": params})
+
+    def check_vacancies(self, old_indexes, max_parallel):
+        timer = StepTimer(SWAP_STEP_SECONDS, engine=self.name)
+        try:
+            if not self.driver.find_elements(*PLANNER_TABLE):
+                rate_limiter.acquire(self.account)
+                self.driver.get(PLANNER_URL)
+            for _ in old_indexes:
+                rate_limiter.acquire(self.account)  # One token per module the script fetches
+            self.driver.set_script_timeout(config.HTTP_TIMEOUT * 2)
+            results = self.driver.execute_async_script(CHECK_VACANCIES_SCRIPT, list(old_indexes), max_parallel)
+        except TimeoutException:
+            results = {}
+        except WebDriverException as e:
+            raise EngineCrashed(str(e)) from e
+        timer.lap("parallel_check")
+
+        checks = {}
+        for old_index in old_indexes:
+            result = results.get(old_index) or {"error": "Vacancy check timed out."}
+            if "html" not in result:
+                checks[old_index] = SwapAttempt(False, None, result["error"], {})
+                continue
+            # The pages come back raw and are read with the same parsers as the HTTP engine
+            soup = parse_html(result["html"])
+            vacancies = vacancy_table(soup)
+            if vacancies is None:
+                if find_alert(soup) is not None:
+                    # As in attempt_swap, an alert instead of the page means the portal is closed
+                    checks[old_index] = SwapAttempt(False, None, PORTAL_CLOSED_MESSAGE, {}, closed=True)
+                else:
+                    checks[old_index] = SwapAttempt(False, None, f"Change index page for {old_index} did not load.", {})
+            else:
+                checks[old_index] = SwapAttempt(False, None, "", vacancies)
+        return checks
+
+    def probe(self):
+        try:
+            rate_limiter.acquire(self.account)
+            self.driver.get(PLANNER_URL)
+            return bool(self.driver.find_elements(*PLANNER_TABLE))
+        except WebDriverException as e:
+            raise EngineCrashed(str(e)) from e
+
+    def attempt_swap(self, old_index, new_indexes, idx):
+        self.pool.record_use(self.driver)
+        return attempt_swap(old_index, new_indexes, idx, self.driver, self.swap_id, self.account)
+
+    def refresh(self):
+        # Chrome's memory grows over a long job; swap in a fresh browser once it is worn out
+        reason = self.pool.recycle_reason(self.driver)
+        if reason is None:
+            return False
+        self.pool.recycle(self.driver, reason)
+        self.driver = None
+        self.driver = self.pool.acquire()
+        return True
+
+    def restart(self):
+        # Pool replaces the crashed browser in the background
+        self.pool.discard(self.driver)
+        self.driver = None
+        self.driver = self.pool.acquire()
+
+    def resume(self, username, password):
+        if self.driver is None:
+            self.driver = self.pool.acquire()
+        return self.authenticate(username, password)
+
+    def close(self):
+        if self.driver:
+            self.pool.release(self.driver)
+            self.driver = None
@@ -0,0 +1,179 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime, timezone
+import config
+
+logger = logging.getLogger(__name__)
+
+# Structured, non-blocking logging for swap jobs.
+#
+# A log call only puts the record on a queue; one listener thread formats it as a JSON
+# line and writes it to the console, so slow console output never holds up a portal step.
+# Records logged from a job's thread are tagged with its swap_id, the last step it
+# finished and the seconds since it started.
+#
+# Each job also keeps a flight recorder: its last FLIGHT_RECORDER_SIZE steps and log
+# lines, in memory. When a swap attempt fails they are written out as one record along
+# with the page the job was on, so the lead-up to a failure can be read back without
+# running every job with debug logging.
+
+# Attributes every LogRecord has; anything else was passed in `extra` and goes in the JSON
+_STANDARD_ATTRIBUTES = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime"}
+
+_local = threading.local()
+_listener = None
+_listener_lock = threading.Lock()
+
+
+class FlightRecorder:
+    """
+    Bounded in-memory record of one job's recent steps and log lines.
+    """
+
+    def __init__(self, swap_id, size=None):
+        self.swap_id = swap_id
+        self.started = time.perf_counter()
+        self.step = None
+        self.events = deque(maxlen=size or config.FLIGHT_RECORDER_SIZE)
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def record_step(self, step, seconds):
+        """
+        Note that the job finished a step that took `seconds`.
+        """
+        self.step = step
+        self.events.append({"t": time.time(), "elapsed": round(self.elapsed(), 3), "step": step, "seconds": round(seconds, 3)})
+
+    def record_log(self, record):
+        self.events.append({
+            "t": record.created,
+            "elapsed": round(self.elapsed(), 3),
+            "step": self.step,
+            "level": record.levelname,
+            "message": record.getMessage()
+        })
+
+    def dump(self, reason, url=None, title=None, snapshot=None):
+        """
+        Log everything recorded so far as a single record.
+        """
+        logger.error(reason, extra={
+            "event": "flight_recorder",
+            "url": url,
+            "title": title,
+            "snapshot": snapshot,
+            "events": list(self.events)
+        })
+
+
+def current():
+    """
+    Returns the flight recorder of the job running in this thread, or None.
+    """
+    return getattr(_local, "recorder", None)
+
+@contextmanager
+def recording(swap_id):
+    """
+    Tag logs from this thread with swap_id and keep a flight recorder for it.
+    """
+    previous = current()
+    _local.recorder = FlightRecorder(swap_id)
+    try:
+        yield _local.recorder
+    finally:
+        _local.recorder = previous
+
+def dump(reason, url=None, title=None, page_source=None):
+    """
+    Write out the current job's flight recorder along with the page it was on.
+
+    Args:
+        reason (str): What went wrong.
+        url (str): Current page URL.
+        title (str): Current page title.
+        page_source (callable): Returns the page HTML. Only called, and the result cut to
+            FLIGHT_RECORDER_SNAPSHOT_CHARS, when snapshots are enabled.
+    """
+    snapshot = None
+    if page_source is not None and config.FLIGHT_RECORDER_SNAPSHOT_CHARS > 0:
+        try:
+            snapshot = page_source()[:config.FLIGHT_RECORDER_SNAPSHOT_CHARS]
+        except Exception as e:
+            snapshot = f"<unavailable: {e}>"
+    recorder = current()
+    if recorder is None:
+        logger.error(reason, extra={"event": "flight_recorder", "url": url, "title": title, "snapshot": snapshot, "events": []})
+    else:
+        recorder.dump(reason, url=url, title=title, snapshot=snapshot)
+
+
+class JobContextFilter(logging.Filter):
+    """
+    Runs in the thread that logs, before the record is queued: tags it with the job's
+    context and keeps it in the job's recorder.
+    """
+
+    def filter(self, record):
+        recorder = current()
+        if recorder is not None:
+            if not hasattr(record, "swap_id"):
+                record.swap_id = recorder.swap_id
+            if not hasattr(record, "step") and recorder.step:
+                record.step = recorder.step
+            record.elapsed = round(recorder.elapsed(), 3)
+            if getattr(record, "event", None) != "flight_recorder":
+                recorder.record_log(record)
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    One JSON object per record: ts, level, logger, message, then any extra fields.
+    """
+
+    def format(self, record):
+        payload = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage()
+        }
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRIBUTES:
+                payload[key] = value
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, default=str)
+
+
+def setup_logging(level=logging.INFO):
+    """
+    Send every log record through a queue to a background thread that writes it to the
+    console as JSON. Safe to call more than once.
+    """
+    global _listener
+    with _listener_lock:
+        if _listener is not None:
+            return
+        console = logging.StreamHandler()  # Outputs logs to the console, which Docker captures
+        console.setFormatter(JsonFormatter())
+        log_queue = queue.SimpleQueue()
+        handler = logging.handlers.QueueHandler(log_queue)
+        handler.addFilter(JobContextFilter())
+
+        root = logging.getLogger()
+        root.setLevel(level)
+        root.addHandler(handler)
+        _listener = logging.handlers.QueueListener(log_queue, console, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_listener.stop)  # Flush what is still queued on exit
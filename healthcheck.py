@@ -0,0 +1,61 @@
+"""
+Explicit health check for a deployment, run on demand instead of at app import:
+
+    python healthcheck.py              # Chrome, ChromeDriver and Redis
+    python healthcheck.py --no-redis   # Only the browser binaries (e.g. during a Docker build)
+
+Exits non-zero if any check fails, so it can gate a deploy or a container probe.
+"""
+import argparse
+import re
+import subprocess
+import sys
+
+import config
+
+def binary_version(path):
+    """
+    Returns the version string printed by `<path> --version`, e.g. "132.0.6834.159".
+    """
+    output = subprocess.run([path, "--version"], capture_output=True, text=True, timeout=30).stdout.strip()
+    match = re.search(r"\d+(\.\d+)+", output)
+    if not match:
+        raise RuntimeError(f"Could not read a version from {path}: {output!r}")
+    return match.group(0)
+
+def check_browser():
+    chrome = binary_version(config.CHROME_BINARY_PATH)
+    chromedriver = binary_version(config.CHROMEDRIVER_PATH)
+    print(f"Google Chrome Version: {chrome}")
+    print(f"ChromeDriver Version: {chromedriver}")
+    if chrome.split(".")[0] != chromedriver.split(".")[0]:
+        raise RuntimeError(f"Chrome {chrome} and ChromeDriver {chromedriver} have different major versions.")
+
+def check_redis():
+    from status_store import redis_client
+    redis_client.ping()
+    print(f"Redis: reachable at {config.REDIS_HOST}:{config.REDIS_PORT}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Check Chrome/ChromeDriver versions and Redis connectivity.")
+    parser.add_argument("--no-browser", action="store_true", help="Skip the Chrome/ChromeDriver check.")
+    parser.add_argument("--no-redis", action="store_true", help="Skip the Redis check.")
+    args = parser.parse_args()
+
+    checks = []
+    if not args.no_browser:
+        checks.append(("browser", check_browser))
+    if not args.no_redis:
+        checks.append(("redis", check_redis))
+
+    failed = False
+    for name, check in checks:
+        try:
+            check()
+        except Exception as e:
+            print(f"{name} check failed: {e}")
+            failed = True
+    sys.exit(1 if failed else 0)
+
+if __name__ == '__main__':
+    main()
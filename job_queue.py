@@ -0,0 +1,243 @@
+import json
+import logging
+import time
+from cryptography.fernet import InvalidToken
+import config
+import session_cache
+from status_store import redis_client, update_overall_status
+
+logger = logging.getLogger(__name__)
+
+# Durable swap job queue in Redis.
+#
+# A job is a hash at job:<swap_id> holding the credentials and swap_items. The password
+# is Fernet-encrypted with the session cache's key, and goes when the hash is deleted
+# at the end of the job. Its id
+# sits in the jobs:pending list until a worker claims it, after which it is held
+# in the jobs:leases sorted set (score = lease expiry). Workers heartbeat to extend
+# the lease; leases that expire (crashed worker) are put back on the queue.
+# Jobs submitted while the portal is closed wait in the jobs:parked sorted set
+# (score = release time) until release_parked() moves them onto jobs:pending.
+
+JOBS_PENDING = "jobs:pending"
+JOBS_LEASES = "jobs:leases"
+JOBS_PARKED = "jobs:parked"
+JOB_TTL = 4 * 3600  # Job hashes outlive the 2 hour swap limit plus any queueing
+MAX_ATTEMPTS = 5  # Give up on a job that keeps killing workers
+
+def job_key(swap_id):
+    return f"job:{swap_id}"
+
+# Pop the next job and take a lease on it atomically
+_claim = redis_client.register_script("""
+while true do
+    local swap_id = redis.call('RPOP', KEYS[1])
+    if not swap_id then return false end
+    local job = 'job:' .. swap_id
+    if redis.call('EXISTS', job) == 1 then
+        redis.call('ZADD', KEYS[2], ARGV[1], swap_id)
+        redis.call('HSET', job, 'worker', ARGV[2])
+        redis.call('HSETNX', job, 'started_at', ARGV[3])
+        redis.call('HINCRBY', job, 'attempts', 1)
+        return swap_id
+    end
+    -- The job was cancelled while it was queued; skip it
+end
+""")
+
+# Extend the lease only if this worker still owns the job
+_heartbeat = redis_client.register_script("""
+local job = 'job:' .. ARGV[1]
+if redis.call('HGET', job, 'worker') ~= ARGV[2] then return 0 end
+redis.call('ZADD', KEYS[1], 'XX', ARGV[3], ARGV[1])
+redis.call('EXPIRE', job, ARGV[4])
+return 1
+""")
+
+# Hand a job back to the front of the queue (graceful worker shutdown)
+_release = redis_client.register_script("""
+local job = 'job:' .. ARGV[1]
+if redis.call('HGET', job, 'worker') ~= ARGV[2] then return 0 end
+redis.call('ZREM', KEYS[2], ARGV[1])
+redis.call('HDEL', job, 'worker')
+redis.call('RPUSH', KEYS[1], ARGV[1])
+return 1
+""")
+
+# Requeue every job whose lease has expired; drop those out of attempts
+_requeue_expired = redis_client.register_script("""
+local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1])
+local requeued, dropped = {}, {}
+for _, swap_id in ipairs(expired) do
+    redis.call('ZREM', KEYS[2], swap_id)
+    local job = 'job:' .. swap_id
+    if redis.call('EXISTS', job) == 1 then
+        if tonumber(redis.call('HGET', job, 'attempts') or '0') >= tonumber(ARGV[2]) then
+            redis.call('DEL', job)
+            table.insert(dropped, swap_id)
+        else
+            redis.call('HDEL', job, 'worker')
+            redis.call('RPUSH', KEYS[1], swap_id)
+            table.insert(requeued, swap_id)
+        end
+    end
+end
+return {requeued, dropped}
+""")
+
+# Save swap progress, unless the job was cancelled or deleted (a bare HSET would recreate it without a TTL)
+_checkpoint = redis_client.register_script("""
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+redis.call('HSET', KEYS[1], 'swap_items', ARGV[1])
+return 1
+""")
+
+# Move every parked job whose release time has come onto the pending queue
+_release_parked = redis_client.register_script("""
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+local released = {}
+for _, swap_id in ipairs(due) do
+    redis.call('ZREM', KEYS[1], swap_id)
+    if redis.call('EXISTS', 'job:' .. swap_id) == 1 then
+        redis.call('LPUSH', KEYS[2], swap_id)
+        table.insert(released, swap_id)
+    end
+end
+return released
+""")
+
+def enqueue(swap_id, username, password, swap_items, release_at=None):
+    """
+    Add a swap job to the queue.
+
+    Args:
+        release_at (float): Park the job until this time (epoch seconds) instead of queueing it now.
+    """
+    now = time.time()
+    parked = release_at is not None and release_at > now
+    pipe = redis_client.pipeline()
+    pipe.hset(job_key(swap_id), mapping={
+        "username": username,
+        "password": session_cache.encrypt(password),
+        "swap_items": json.dumps(swap_items),
+        "attempts": 0
+    })
+    # A parked job must outlive its wait for the portal to open
+    pipe.expire(job_key(swap_id), int(JOB_TTL + (release_at - now if parked else 0)))
+    if parked:
+        pipe.zadd(JOBS_PARKED, {swap_id: release_at})
+    else:
+        pipe.lpush(JOBS_PENDING, swap_id)
+    pipe.execute()
+
+def release_parked(now=None):
+    """
+    Queue every parked job that is due.
+
+    Returns:
+        list: The swap_ids that were released.
+    """
+    return _release_parked(keys=[JOBS_PARKED, JOBS_PENDING], args=[now or time.time()])
+
+def claim(worker_id):
+    """
+    Claim the next pending job for worker_id.
+
+    Returns:
+        dict: The job (swap_id, username, password, swap_items, started_at), or None if the queue is empty.
+    """
+    now = time.time()
+    swap_id = _claim(keys=[JOBS_PENDING, JOBS_LEASES], args=[now + config.JOB_LEASE_SECONDS, worker_id, now])
+    if not swap_id:
+        return None
+    job = redis_client.hgetall(job_key(swap_id))
+    if not job:
+        return None
+    try:
+        password = session_cache.decrypt(job["password"])
+    except InvalidToken:
+        # Encrypted with another key (SESSION_CACHE_KEY or FLASK_SECRET_KEY changed); the job cannot log in
+        logger.error(f"Dropping job {swap_id}: its credentials cannot be decrypted.")
+        cancel(swap_id)
+        update_overall_status(swap_id, status="Error", message="Your job could not be resumed. Please submit it again.")
+        return None
+    return {
+        "swap_id": swap_id,
+        "username": job["username"],
+        "password": password,
+        "swap_items": json.loads(job["swap_items"]),
+        "started_at": float(job.get("started_at") or now),
+        "attempts": int(job.get("attempts", 1))
+    }
+
+def heartbeat(swap_id, worker_id):
+    """
+    Extend the lease on a job. Returns False if the worker no longer owns it
+    (the job was cancelled or reclaimed), in which case it must stop working on it.
+    """
+    return bool(_heartbeat(
+        keys=[JOBS_LEASES],
+        args=[swap_id, worker_id, time.time() + config.JOB_LEASE_SECONDS, JOB_TTL]
+    ))
+
+def checkpoint(swap_id, swap_items):
+    """
+    Persist which swap_items are already swapped so a resumed job skips them.
+    Returns False if the job no longer exists (it was cancelled), in which case nothing is written.
+    """
+    return bool(_checkpoint(keys=[job_key(swap_id)], args=[json.dumps(swap_items)]))
+
+def complete(swap_id):
+    """
+    Remove a finished job from the queue.
+    """
+    pipe = redis_client.pipeline()
+    pipe.zrem(JOBS_LEASES, swap_id)
+    pipe.delete(job_key(swap_id))
+    pipe.execute()
+
+def release(swap_id, worker_id):
+    """
+    Put an unfinished job back on the queue so another worker resumes it.
+    """
+    return bool(_release(keys=[JOBS_PENDING, JOBS_LEASES], args=[swap_id, worker_id]))
+
+def cancel(swap_id):
+    """
+    Cancel a job whether it is queued or running. Its worker notices on the next heartbeat.
+    """
+    pipe = redis_client.pipeline()
+    pipe.delete(job_key(swap_id))
+    pipe.zrem(JOBS_LEASES, swap_id)
+    pipe.lrem(JOBS_PENDING, 0, swap_id)
+    pipe.zrem(JOBS_PARKED, swap_id)
+    pipe.execute()
+
+def requeue_expired():
+    """
+    Put jobs orphaned by crashed workers back on the queue.
+
+    Returns:
+        tuple: (requeued swap_ids, dropped swap_ids that ran out of attempts)
+    """
+    requeued, dropped = _requeue_expired(keys=[JOBS_PENDING, JOBS_LEASES], args=[time.time(), MAX_ATTEMPTS])
+    return requeued, dropped
+
+def position(swap_id):
+    """
+    Returns the 1-based position of a pending job (1 = claimed next), or None if it is not pending.
+    """
+    pipe = redis_client.pipeline()
+    pipe.lpos(JOBS_PENDING, swap_id)
+    pipe.llen(JOBS_PENDING)
+    index, length = pipe.execute()
+    # Jobs are pushed on the left and claimed from the right
+    return length - index if index is not None else None
+
+def stats():
+    pipe = redis_client.pipeline()
+    pipe.llen(JOBS_PENDING)
+    pipe.zcard(JOBS_LEASES)
+    pipe.zcard(JOBS_PARKED)
+    pending, running, parked = pipe.execute()
+    return {"pending": pending, "running": running, "parked": parked}
@@ -0,0 +1,100 @@
+import logging
+import threading
+import time
+import config
+import job_queue
+from scheduler import PollScheduler
+from status_store import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Jobs submitted while the portal is closed are parked and released in a
+# staggered burst around opening time, instead of everyone resubmitting at 10:30:
+#   launch:slots:<opening>  counter handing out release slots for one opening
+#
+# Slot n is released at opening - LAUNCH_LEAD_SECONDS + n / LAUNCH_RATE, so early
+# submissions log in ahead of opening and the rest follow at a steady rate.
+
+_prewarm_timers = {}  # opening -> threading.Timer, for the thread backend
+_prewarm_lock = threading.Lock()
+
+def slots_key(opening):
+    return f"launch:slots:{int(opening)}"
+
+def next_opening(now=None):
+    """
+    Returns the epoch time the portal next opens, or None if it is open now.
+    """
+    now = now or time.time()
+    seconds = PollScheduler().seconds_until_open(now)
+    return now + seconds if seconds > 0 else None
+
+def launch_time(opening):
+    """
+    Hand out the next release slot for the given opening.
+
+    Returns:
+        float: When the job should be released onto the queue (epoch seconds).
+    """
+    pipe = redis_client.pipeline()
+    pipe.incr(slots_key(opening))
+    pipe.expireat(slots_key(opening), int(opening + 3600))
+    slot, _ = pipe.execute()
+    return opening - config.LAUNCH_LEAD_SECONDS + (slot - 1) / config.LAUNCH_RATE
+
+def park(swap_id, username, password, swap_items, opening):
+    """
+    Queue a job submitted outside portal hours for release around opening.
+
+    Returns:
+        float: The job's release time.
+    """
+    release_at = launch_time(opening)
+    job_queue.enqueue(swap_id, username, password, swap_items, release_at=release_at)
+    logger.info(f"Parked job {swap_id} until {release_at:.0f} (portal opens at {opening:.0f}).")
+    return release_at
+
+def release_due():
+    """
+    Move parked jobs whose slot has come onto the queue. Safe to call from every worker.
+    """
+    released = job_queue.release_parked()
+    if released:
+        logger.info(f"Released {len(released)} parked job(s).")
+    return released
+
+def prewarm():
+    """
+    Start the browser pool shortly before opening, so the burst of released
+    jobs finds warm browsers instead of all launching Chrome at once.
+    """
+    if config.SWAP_ENGINE != "selenium":
+        return
+    opening = next_opening()
+    if opening is None or opening - time.time() <= config.LAUNCH_PREWARM_SECONDS:
+        from engines.selenium_engine import get_driver_pool
+        get_driver_pool()
+
+def schedule_prewarm(opening):
+    """
+    Call prewarm() LAUNCH_PREWARM_SECONDS before the given opening, once per opening.
+    Workers prewarm from their launch loop; this is for the thread backend, where
+    parked jobs run in the web process and nothing else would start the pool early.
+    """
+    if config.SWAP_ENGINE != "selenium":
+        return
+    with _prewarm_lock:
+        if opening in _prewarm_timers:
+            return
+        for past in [o for o in _prewarm_timers if o < time.time()]:
+            del _prewarm_timers[past]
+        timer = threading.Timer(max(0, opening - config.LAUNCH_PREWARM_SECONDS - time.time()), _prewarm_safely)
+        timer.daemon = True
+        _prewarm_timers[opening] = timer
+    timer.start()
+
+def _prewarm_safely():
+    try:
+        prewarm()
+    except Exception as e:
+        logger.error(f"Failed to prewarm the browser pool: {e}")
@@ -0,0 +1,195 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+import flight_recorder
+
+# Minimal in-process metrics with Prometheus text exposition.
+# Recording is a lock plus a bisect, so it is cheap enough for the swap hot path.
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + (extra or [])
+    if not pairs:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") for _, v in pairs)
+    return "{" + ",".join(f'{k}="{v}"' for (k, _), v in zip(pairs, escaped)) + "}"
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return lines
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self.values = {}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def _samples(self):
+        with self.lock:
+            items = list(self.values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in items]
+
+
+class Gauge(_Metric):
+    kind = "gauge"
+
+    def __init__(self, name, documentation, labels=()):
+        super().__init__(name, documentation, labels)
+        self.values = {}
+        self.function = None
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self._key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, function):
+        """
+        Read the value from function() at scrape time instead of tracking it.
+        """
+        self.function = function
+
+    def _samples(self):
+        if self.function is not None:
+            try:
+                return [f"{self.name} {self.function()}"]
+            except Exception:
+                return []
+        with self.lock:
+            items = list(self.values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {value}" for key, value in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(buckets)
+        self.series = {}  # label values -> [bucket counts..., +Inf count, sum]
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        position = bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = self.series[key] = [0] * (len(self.buckets) + 2)
+            series[position] += 1
+            series[-1] += value
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def _samples(self):
+        with self.lock:
+            items = [(key, list(series)) for key, series in self.series.items()]
+        lines = []
+        for key, series in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), series[:-1]):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, [('le', bound)])} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {series[-1]}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class StepTimer:
+    """
+    Times consecutive steps of a flow: each lap() records the time since the previous lap,
+    in the histogram and in the flight recorder of the job running in this thread.
+    """
+
+    def __init__(self, histogram, **labels):
+        self.histogram = histogram
+        self.labels = labels
+        self.last = time.perf_counter()
+
+    def lap(self, step):
+        now = time.perf_counter()
+        self.histogram.observe(now - self.last, step=step, **self.labels)
+        recorder = flight_recorder.current()
+        if recorder is not None:
+            recorder.record_step(step, now - self.last)
+        self.last = now
+
+
+_registry = []
+
+def _register(metric):
+    _registry.append(metric)
+    return metric
+
+def render():
+    """
+    Returns every metric in the Prometheus text exposition format.
+    """
+    lines = []
+    for metric in _registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Metrics shared across the app
+SWAP_STEP_SECONDS = _register(Histogram(
+    "swap_step_seconds", "Time spent in each portal step of login and swap attempts.", labels=("engine", "step")
+))
+REDIS_OP_SECONDS = _register(Histogram(
+    "redis_op_seconds", "Latency of status store Redis operations.", labels=("op",),
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1)
+))
+ACTIVE_JOBS = _register(Gauge("active_swap_jobs", "Swap jobs currently running in this process."))
+LIVE_BROWSERS = _register(Gauge("live_browsers", "Headless Chrome instances owned by the driver pool."))
+BROWSER_RSS_BYTES = _register(Gauge("browser_rss_bytes", "Resident memory of the driver pool's ChromeDriver and Chrome processes."))
+BROWSER_RECYCLES = _register(Counter("browser_recycles_total", "Browsers replaced for being worn out.", labels=("reason",)))
+BROWSER_ORPHANS_REAPED = _register(Counter(
+    "browser_orphans_reaped_total", "Leaked Chrome/ChromeDriver process trees killed by the driver pool."
+))
+SWAP_ATTEMPTS = _register(Counter("swap_attempts_total", "Swap attempts by outcome.", labels=("engine", "outcome")))
+SESSION_RESTORES = _register(Counter(
+    "session_restores_total", "Attempts to reuse a cached portal session instead of logging in.", labels=("engine", "outcome")
+))
+RATE_LIMIT_WAIT_SECONDS = _register(Histogram(
+    "portal_rate_limit_wait_seconds", "Time portal requests waited for a rate limit token.", labels=("priority",),
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+))
+RATE_LIMIT_DENIED = _register(Counter(
+    "portal_rate_limit_denied_total", "Token requests turned down because a bucket was empty.", labels=("bucket", "priority")
+))
@@ -0,0 +1,72 @@
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+class SwapPlanner:
+    """
+    Decides which modules to attempt, in what order, and with which candidate
+    indexes, based on the module clash alerts seen so far in a job.
+
+    The portal only reports a clash after a full Go -> dropdown -> OK round trip,
+    and it does not say which lesson clashed. So a clash is recorded against the
+    user's timetable at the time (the set of indexes they hold): the candidate
+    is not retried until that timetable changes, i.e. until another requested
+    swap goes through. The other requested modules held at the time of a clash
+    are its suspects, which gives a conflict graph across the requested swaps:
+    a module whose swap could free up a clashing slot is attempted before the
+    modules waiting on it.
+    """
+
+    def __init__(self, swap_items):
+        self.swap_items = swap_items
+        self.clashes = {}  # (idx, new_index) -> timetable the clash was seen with
+        self.suspects = {}  # idx -> indexes of other unswapped items that may cause its clashes
+
+    def timetable(self):
+        """
+        The indexes the user currently holds for the requested modules.
+        """
+        return frozenset(item["new_index"] if item["swapped"] else item["old_index"] for item in self.swap_items)
+
+    def record_clash(self, idx, new_index):
+        timetable = self.timetable()
+        self.clashes[(idx, new_index)] = timetable
+        self.suspects[idx] = {
+            other for other, item in enumerate(self.swap_items) if other != idx and not item["swapped"]
+        }
+        logger.info(f"Index {new_index} clashes with the current timetable; skipping it until it changes.")
+
+    def record_swap(self, idx, new_index):
+        item = self.swap_items[idx]
+        item["swapped"] = True
+        item["new_index"] = new_index
+        # The timetable changed, so clashes recorded against the old one may be gone
+        for suspects in self.suspects.values():
+            suspects.discard(idx)
+
+    def candidates(self, idx):
+        """
+        The preferred indexes for a module, minus those known to clash with the current timetable.
+        """
+        timetable = self.timetable()
+        return [
+            new_index for new_index in self.swap_items[idx]["new_indexes"]
+            if self.clashes.get((idx, new_index)) != timetable
+        ]
+
+    def blocked(self, idx):
+        """
+        Candidates skipped because they clash with the current timetable.
+        """
+        usable = set(self.candidates(idx))
+        return [new_index for new_index in self.swap_items[idx]["new_indexes"] if new_index not in usable]
+
+    def order(self):
+        """
+        Unswapped modules in attempt order: modules other modules are waiting on
+        first, then modules without known clashes, then the rest in request order.
+        """
+        pending = [idx for idx, item in enumerate(self.swap_items) if not item["swapped"]]
+        dependents = {idx: sum(idx in self.suspects.get(other, ()) for other in pending) for idx in pending}
+        return sorted(pending, key=lambda idx: (-dependents[idx], bool(self.blocked(idx)), idx))
@@ -0,0 +1,104 @@
+import re
+from bs4 import BeautifulSoup
+
+# Pure functions that read STARS portal pages from raw HTML, shared by the swap
+# engines and checked against the recorded pages in benchmarks/fixtures/portal
+# (python benchmarks/parser_benchmark.py). None of them touch the network or a browser.
+
+_ALERT_RE = re.compile(r"""alert\(\s*(["'])(.*?)\1\s*\)""", re.DOTALL)
+_REFRESH_RE = re.compile(r"url\s*=\s*['\"]?([^'\";]+)", re.IGNORECASE)
+
+def parse_html(html):
+    return BeautifulSoup(html, "html.parser")
+
+def find_alert(soup):
+    """
+    Returns the text of the first JavaScript alert() on the page, or None.
+    """
+    for script in soup.find_all("script"):
+        match = _ALERT_RE.search(script.string or "")
+        if match:
+            return match.group(2)
+    return None
+
+def find_refresh_url(soup):
+    """
+    Returns the target of a <meta http-equiv="refresh"> redirect (possibly relative), or None.
+    """
+    refresh = soup.find("meta", attrs={"http-equiv": lambda v: v and v.lower() == "refresh"})
+    match = _REFRESH_RE.search(refresh.get("content", "")) if refresh else None
+    return match.group(1).strip() if match else None
+
+def find_planner_table(soup):
+    return soup.find("table", attrs={"bordercolor": lambda v: v and v.upper() == "#E0E0E0"})
+
+def find_submit(soup, value):
+    return soup.find("input", attrs={"type": "submit", "value": value})
+
+def find_index_radio(soup, old_index):
+    return soup.find("input", attrs={"type": "radio", "value": old_index})
+
+def timetable_indexes(soup):
+    """
+    The indexes the user is registered in, from the radio buttons of the planner table.
+
+    Returns:
+        list: Index numbers in table order, or [] if this is not the planner page.
+    """
+    table = find_planner_table(soup)
+    if table is None:
+        return []
+    return [radio["value"] for radio in table.find_all("input", attrs={"type": "radio"}) if radio.get("value")]
+
+def parse_index_options(options):
+    """
+    Parse the new_index_nmbr dropdown into a vacancy table.
+
+    Args:
+        options (iterable): (value, text) pairs, where text looks like "01172 / 9 / 1"
+            (index / vacancies / waitlist).
+
+    Returns:
+        dict: index -> (vacancies, waitlist), in dropdown order.
+    """
+    table = {}
+    for value, text in options:
+        parts = [part.strip() for part in text.split("/")]
+        if len(parts) < 3:
+            continue  # Placeholder options such as "Select an index"
+        try:
+            table[value or parts[0]] = (int(parts[1]), int(parts[2]))
+        except ValueError:
+            continue
+    return table
+
+def vacancy_table(soup):
+    """
+    Read the change index page's new_index_nmbr dropdown.
+
+    Returns:
+        dict: index -> (vacancies, waitlist), or None if the page has no dropdown.
+    """
+    dropdown = soup.find("select", attrs={"name": "new_index_nmbr"})
+    if dropdown is None:
+        return None
+    return parse_index_options((option.get("value", ""), option.text) for option in dropdown.find_all("option"))
+
+def page_kind(soup):
+    """
+    Which step of the portal a page belongs to: "login_uid", "login_pw", "timetable",
+    "planner", "change_index", "confirm" or "unknown".
+    """
+    if soup.find("input", id="PW") is not None:
+        return "login_pw"
+    if soup.find("input", id="UID") is not None:
+        return "login_uid"
+    if soup.find("select", attrs={"name": "new_index_nmbr"}) is not None:
+        return "change_index"
+    if find_submit(soup, "Confirm to Change Index Number") is not None:
+        return "confirm"
+    if find_planner_table(soup) is not None:
+        return "planner"
+    if find_submit(soup, "Plan/ Registration") is not None:
+        return "timetable"
+    return "unknown"
@@ -0,0 +1,118 @@
+import hashlib
+import logging
+import math
+import random
+import time
+import config
+from metrics import RATE_LIMIT_WAIT_SECONDS, RATE_LIMIT_DENIED
+from status_store import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Token buckets that every portal request takes a token from, shared by all jobs and workers:
+#   ratelimit:portal             the whole deployment (PORTAL_RATE / PORTAL_BURST)
+#   ratelimit:account:<hash>     one portal account (ACCOUNT_RATE / ACCOUNT_BURST)
+# Each is a hash with tokens and ts (when tokens was last refilled, Redis server time).
+#
+# Routine requests leave RATE_LIMIT_RESERVE of every bucket untouched, so when the
+# portal is busy the confirm step of a swap that found a vacancy goes first.
+
+GLOBAL_KEY = "ratelimit:portal"
+
+ROUTINE = "routine"
+CONFIRM = "confirm"
+
+
+class RateLimited(Exception):
+    """Raised when no portal request token became free within RATE_LIMIT_MAX_WAIT."""
+
+
+def account_key(account):
+    # Hashed so the bucket key does not reveal the username
+    return f"ratelimit:account:{hashlib.sha256(account.encode()).hexdigest()[:16]}"
+
+# Take `requested` tokens from every bucket, or none if any bucket is short.
+# ARGV: requested, then rate, burst, reserve for each key.
+# Returns {1} when granted, else {0, seconds to wait, position of the short bucket}.
+_take = redis_client.register_script("""
+local now = redis.call('TIME')
+now = tonumber(now[1]) + tonumber(now[2]) / 1000000
+local requested = tonumber(ARGV[1])
+local levels, wait, short = {}, 0, 0
+for i, key in ipairs(KEYS) do
+    local rate, burst, reserve = tonumber(ARGV[i * 3 - 1]), tonumber(ARGV[i * 3]), tonumber(ARGV[i * 3 + 1])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+    levels[i] = math.min(burst, tokens + elapsed * rate)
+    local needed = requested + reserve
+    if levels[i] < needed and (needed - levels[i]) / rate > wait then
+        wait = (needed - levels[i]) / rate
+        short = i
+    end
+end
+if short > 0 then return {0, tostring(wait), short} end
+for i, key in ipairs(KEYS) do
+    local rate, burst = tonumber(ARGV[i * 3 - 1]), tonumber(ARGV[i * 3])
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - requested), 'ts', tostring(now))
+    redis.call('EXPIRE', key, math.ceil(burst / rate) + 60)
+end
+return {1}
+""")
+
+def _buckets(account, priority):
+    """
+    The (name, key, rate, burst, reserve) of every enabled bucket for a request.
+    """
+    buckets = []
+    if config.PORTAL_RATE > 0:
+        buckets.append(("portal", GLOBAL_KEY, config.PORTAL_RATE, config.PORTAL_BURST))
+    if config.ACCOUNT_RATE > 0 and account:
+        buckets.append(("account", account_key(account), config.ACCOUNT_RATE, config.ACCOUNT_BURST))
+    return [
+        (name, key, rate, burst, 0 if priority == CONFIRM else min(math.ceil(burst * config.RATE_LIMIT_RESERVE), burst - 1))
+        for name, key, rate, burst in buckets
+    ]
+
+def acquire(account, priority=ROUTINE, max_wait=None):
+    """
+    Block until a portal request may be sent for this account.
+
+    Args:
+        account (str): Portal username the request is made for.
+        priority (str): CONFIRM for the final confirm step of a swap, ROUTINE otherwise.
+        max_wait (float): Seconds to wait before giving up (default RATE_LIMIT_MAX_WAIT).
+
+    Returns:
+        float: Seconds spent waiting.
+
+    Raises:
+        RateLimited: If no token became free in time.
+    """
+    buckets = _buckets(account, priority)
+    if not buckets:
+        return 0.0
+    started = time.monotonic()
+    deadline = started + (config.RATE_LIMIT_MAX_WAIT if max_wait is None else max_wait)
+    keys = [key for _, key, _, _, _ in buckets]
+    args = [1]
+    for _, _, rate, burst, reserve in buckets:
+        args += [rate, burst, reserve]
+    while True:
+        try:
+            result = _take(keys=keys, args=args)
+        except Exception as e:
+            # Never stop swaps because the limiter itself is unavailable
+            logger.warning(f"Rate limiter unavailable, sending the request unthrottled: {e}")
+            return 0.0
+        if result[0] == 1:
+            waited = time.monotonic() - started
+            RATE_LIMIT_WAIT_SECONDS.observe(waited, priority=priority)
+            return waited
+        RATE_LIMIT_DENIED.inc(bucket=buckets[int(result[2]) - 1][0], priority=priority)
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            RATE_LIMIT_WAIT_SECONDS.observe(time.monotonic() - started, priority=priority)
+            raise RateLimited("The portal is busy right now; will try again on the next check.")
+        # A little jitter so jobs waiting on the same bucket do not all retry at once
+        time.sleep(min(float(result[1]) + random.uniform(0, 0.05), remaining))
@@ -0,0 +1,97 @@
+import random
+from datetime import datetime, timedelta, timezone
+import config
+
+# The portal runs on Singapore time, which has no daylight saving
+PORTAL_TZ = timezone(timedelta(hours=8))
+
+def _parse_hhmm(value):
+    hours, minutes = value.split(":")
+    return int(hours), int(minutes)
+
+
+class PollScheduler:
+    """
+    Chooses when a swap job should next check for vacancies.
+
+    The interval backs off geometrically while nothing changes, drops to a short
+    "hot" interval for a few cycles after any vacancy count moves (students are
+    actively dropping), is jittered so jobs do not check in lockstep, and never
+    lands outside portal hours.
+    """
+
+    def __init__(self, base_interval=None, min_interval=None, max_interval=None, backoff=None,
+                 jitter=None, hot_interval=None, hot_cycles=None, portal_open=None, portal_close=None):
+        self.base_interval = base_interval or config.POLL_BASE_INTERVAL
+        self.min_interval = min_interval or config.POLL_MIN_INTERVAL
+        self.max_interval = max_interval or config.POLL_MAX_INTERVAL
+        self.backoff = backoff or config.POLL_BACKOFF
+        self.jitter = config.POLL_JITTER if jitter is None else jitter
+        self.hot_interval = hot_interval or config.POLL_HOT_INTERVAL
+        self.hot_cycles = config.POLL_HOT_CYCLES if hot_cycles is None else hot_cycles
+        self.portal_open = _parse_hhmm(portal_open or config.PORTAL_OPEN)
+        self.portal_close = _parse_hhmm(portal_close or config.PORTAL_CLOSE)
+
+        self.interval = self.base_interval
+        self.hot_remaining = 0
+        self.last_vacancies = None
+
+    def is_open(self, when=None):
+        """
+        Returns True if the portal accepts swaps at the given time (epoch seconds, default now).
+        """
+        local = datetime.fromtimestamp(when, PORTAL_TZ) if when is not None else datetime.now(PORTAL_TZ)
+        minutes = local.hour * 60 + local.minute
+        return self.portal_open[0] * 60 + self.portal_open[1] <= minutes < self.portal_close[0] * 60 + self.portal_close[1]
+
+    def seconds_until_open(self, when=None):
+        """
+        Seconds from the given time until the portal next opens (0 if it is open).
+        """
+        local = datetime.fromtimestamp(when, PORTAL_TZ) if when is not None else datetime.now(PORTAL_TZ)
+        if self.is_open(local.timestamp()):
+            return 0
+        opening = local.replace(hour=self.portal_open[0], minute=self.portal_open[1], second=0, microsecond=0)
+        if opening <= local:
+            opening += timedelta(days=1)
+        return (opening - local).total_seconds()
+
+    def observe(self, vacancies):
+        """
+        Feed in the vacancy table seen this cycle (index -> (vacancies, waitlist)).
+
+        Returns:
+            bool: True if any vacancy count changed since the previous cycle.
+        """
+        current = {index: counts[0] for index, counts in vacancies.items()}
+        previous = self.last_vacancies or {}
+        # Only compare indexes seen in both cycles, so a module that errored out is not a "change"
+        changed = any(previous[index] != count for index, count in current.items() if index in previous)
+        self.last_vacancies = {**previous, **current}
+
+        if changed:
+            self.hot_remaining = self.hot_cycles
+        return changed
+
+    def next_delay(self, now=None):
+        """
+        Returns the number of seconds to wait before the next check.
+        """
+        now = now if now is not None else datetime.now(PORTAL_TZ).timestamp()
+
+        if self.hot_remaining > 0:
+            self.hot_remaining -= 1
+            self.interval = self.base_interval  # Restart the backoff once activity dies down
+            delay = self.hot_interval
+        else:
+            delay = self.interval
+            self.interval = min(self.max_interval, self.interval * self.backoff)
+
+        delay *= random.uniform(1 - self.jitter, 1 + self.jitter)
+        delay = max(self.min_interval, delay)
+
+        # Never schedule a check while the portal is closed; wait for it to open instead
+        if not self.is_open(now + delay):
+            delay += self.seconds_until_open(now + delay)
+            delay += random.uniform(0, self.min_interval)  # Spread jobs out after opening
+        return delay
@@ -0,0 +1,74 @@
+import base64
+import hashlib
+import json
+import logging
+from cryptography.fernet import Fernet, InvalidToken
+import config
+from status_store import redis_client
+
+logger = logging.getLogger(__name__)
+
+# Portal session cookies of running jobs, so a restarted browser or HTTP session
+# can skip the UID/PW login:
+#   session:<swap_id>  Fernet-encrypted JSON list of cookies (expires after SESSION_CACHE_TTL)
+#
+# Cookies are kept in one engine-neutral shape:
+#   {"name", "value", "domain", "path", "secure", "httpOnly", "expires"}
+
+def _cipher():
+    # Any secret string works: it is hashed down to the 32 bytes Fernet needs
+    secret = config.SESSION_CACHE_KEY or config.FLASK_SECRET_KEY
+    return Fernet(base64.urlsafe_b64encode(hashlib.sha256(secret.encode()).digest()))
+
+_fernet = _cipher()
+
+def encrypt(text):
+    """
+    Encrypt a string for storage in Redis. Also used for the passwords of queued jobs.
+    """
+    return _fernet.encrypt(text.encode()).decode()
+
+def decrypt(token, ttl=None):
+    """
+    Reverse encrypt().
+
+    Raises:
+        InvalidToken: If the token was written with another key or is older than ttl seconds.
+    """
+    return _fernet.decrypt(token.encode(), ttl=ttl).decode()
+
+def session_key(swap_id):
+    return f"session:{swap_id}"
+
+def save(swap_id, cookies):
+    """
+    Encrypt and store the portal cookies of a logged-in job.
+
+    Args:
+        cookies (list): Cookie dicts in the shape described above.
+    """
+    if config.SESSION_CACHE_TTL <= 0 or not cookies:
+        return
+    token = encrypt(json.dumps(cookies))
+    redis_client.set(session_key(swap_id), token, ex=config.SESSION_CACHE_TTL)
+
+def load(swap_id):
+    """
+    Returns:
+        list or None: The cached cookies, or None if there are none (or they cannot be decrypted).
+    """
+    if config.SESSION_CACHE_TTL <= 0:
+        return None
+    token = redis_client.get(session_key(swap_id))
+    if not token:
+        return None
+    try:
+        return json.loads(decrypt(token, ttl=config.SESSION_CACHE_TTL))
+    except (InvalidToken, ValueError):
+        # Written with another key, or older than the TTL allows
+        logger.warning(f"Discarding unreadable cached session for {swap_id}.")
+        clear(swap_id)
+        return None
+
+def clear(swap_id):
+    redis_client.delete(session_key(swap_id))
@@ -0,0 +1,227 @@
+import json
+import redis
+import config
+from metrics import REDIS_OP_SECONDS
+
+# Connect to Redis (Read from Environment Variables)
+redis_client = redis.StrictRedis(
+    host=config.REDIS_HOST,
+    port=config.REDIS_PORT,
+    password=config.REDIS_PASSWORD,
+    decode_responses=True
+)
+
+# Status for a swap session is kept in two hashes so that each update touches
+# only the fields it changes:
+#   status:<swap_id>          status, message, count (number of modules), version
+#   status:<swap_id>:details  <idx>:old_index, <idx>:new_indexes, <idx>:swapped, <idx>:message
+#
+# version goes up by one with every write, so /swap-status can answer a poll with
+# 304 Not Modified after reading just that field.
+#
+# Every update is also published as a small JSON patch on status:<swap_id>:events
+# so /swap-status/stream can push it to the browser.
+#
+# Every change is appended to an event log, a Redis Stream capped at STATUS_LOG_MAXLEN
+# entries, by the same script that applies it to the hashes, so the hashes are always
+# the current snapshot of the log:
+#   status:<swap_id>:log      e=init|module|overall, plus i (module), s (status or swapped flag), m (message)
+#
+# All three keys expire STATUS_TTL seconds after the last update, so abandoned sessions
+# do not stay in Redis forever.
+
+def status_key(swap_id):
+    return f"status:{swap_id}"
+
+def details_key(swap_id):
+    return f"status:{swap_id}:details"
+
+def events_channel(swap_id):
+    return f"status:{swap_id}:events"
+
+def log_key(swap_id):
+    return f"status:{swap_id}:log"
+
+# Patch one module's fields, but only while the session still exists (not stopped/logged out)
+_update_module = redis_client.register_script("""
+local count = redis.call('HGET', KEYS[1], 'count')
+if not count or tonumber(ARGV[1]) >= tonumber(count) then return 0 end
+redis.call('HSET', KEYS[2], ARGV[1] .. ':message', ARGV[2])
+if ARGV[3] == '1' then
+    redis.call('HSET', KEYS[2], ARGV[1] .. ':swapped', '1')
+end
+redis.call('HINCRBY', KEYS[1], 'version', 1)
+redis.call('XADD', KEYS[4], 'MAXLEN', '~', ARGV[5], '*', 'e', 'module', 'i', ARGV[1], 's', ARGV[3], 'm', ARGV[2])
+for _, key in ipairs({KEYS[1], KEYS[2], KEYS[4]}) do
+    redis.call('EXPIRE', key, ARGV[6])
+end
+redis.call('PUBLISH', KEYS[3], ARGV[4])
+return 1
+""")
+
+# Patch the overall status, but only while the session still exists
+_update_overall = redis_client.register_script("""
+if redis.call('EXISTS', KEYS[1]) == 0 then return 0 end
+redis.call('HSET', KEYS[1], 'status', ARGV[1], 'message', ARGV[2])
+redis.call('HINCRBY', KEYS[1], 'version', 1)
+redis.call('XADD', KEYS[4], 'MAXLEN', '~', ARGV[4], '*', 'e', 'overall', 's', ARGV[1], 'm', ARGV[2])
+for _, key in ipairs({KEYS[1], KEYS[3], KEYS[4]}) do
+    redis.call('EXPIRE', key, ARGV[5])
+end
+redis.call('PUBLISH', KEYS[2], ARGV[3])
+return 1
+""")
+
+# Utility function to set and get status data from Redis
+def set_status_data(swap_id, data, ttl=None):
+    """
+    Replace the whole status of a swap session in one transaction, starting a new event log.
+
+    Args:
+        swap_id (str): Unique swap session ID.
+        data (dict): Status in the shape served by /swap-status.
+        ttl (int): Seconds to keep the status without updates (default STATUS_TTL).
+    """
+    ttl = int(ttl or config.STATUS_TTL)
+    details = {}
+    for idx, detail in enumerate(data["details"]):
+        details[f"{idx}:old_index"] = detail["old_index"]
+        details[f"{idx}:new_indexes"] = detail["new_indexes"]
+        details[f"{idx}:swapped"] = "1" if detail["swapped"] else "0"
+        details[f"{idx}:message"] = detail["message"] or ""
+
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(status_key(swap_id), details_key(swap_id), log_key(swap_id))
+    pipe.hset(status_key(swap_id), mapping={
+        "status": data["status"],
+        "message": data.get("message") or "",
+        "count": len(data["details"]),
+        "version": 1
+    })
+    if details:
+        pipe.hset(details_key(swap_id), mapping=details)
+    pipe.xadd(log_key(swap_id), {"e": "init", "s": data["status"], "m": data.get("message") or ""},
+              maxlen=config.STATUS_LOG_MAXLEN, approximate=True)
+    for key in (status_key(swap_id), details_key(swap_id), log_key(swap_id)):
+        pipe.expire(key, ttl)
+    with REDIS_OP_SECONDS.time(op="set_status"):
+        pipe.execute()
+
+def _to_status_data(overall, details):
+    """
+    Rebuild the JSON shape served by /swap-status from the two hashes.
+    """
+    if not overall:
+        return {"status": "idle", "details": []}
+    return {
+        "status": overall["status"],
+        "details": [{
+            "old_index": details.get(f"{idx}:old_index"),
+            "new_indexes": details.get(f"{idx}:new_indexes"),
+            "swapped": details.get(f"{idx}:swapped") == "1",
+            "message": details.get(f"{idx}:message") or None
+        } for idx in range(int(overall.get("count", 0)))],
+        "message": overall.get("message") or None
+    }
+
+def get_status_data(swap_id):
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.hgetall(status_key(swap_id))
+    pipe.hgetall(details_key(swap_id))
+    with REDIS_OP_SECONDS.time(op="get_status"):
+        overall, details = pipe.execute()
+    return _to_status_data(overall, details)
+
+def get_status_version(swap_id):
+    """
+    Read only the version and overall status of a swap session, for conditional requests.
+
+    Returns:
+        tuple: (version, status), or (None, None) if the session does not exist.
+    """
+    with REDIS_OP_SECONDS.time(op="get_status_version"):
+        version, status = redis_client.hmget(status_key(swap_id), "version", "status")
+    return version, status
+
+def get_status_many(swap_ids):
+    """
+    Read the status of many swap sessions in one pipelined round trip.
+
+    Returns:
+        dict: swap_id -> status data (as get_status_data), or None for unknown sessions.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for swap_id in swap_ids:
+        pipe.hgetall(status_key(swap_id))
+        pipe.hgetall(details_key(swap_id))
+    with REDIS_OP_SECONDS.time(op="get_status_many"):
+        replies = pipe.execute()
+    return {
+        swap_id: _to_status_data(overall, details) if overall else None
+        for swap_id, overall, details in zip(swap_ids, replies[0::2], replies[1::2])
+    }
+
+def delete_status_data(swap_id):
+    redis_client.delete(status_key(swap_id), details_key(swap_id), log_key(swap_id))
+
+def _to_event(entry_id, fields):
+    """
+    Expand a compact log entry into the JSON shape served by /swap-status/history.
+    """
+    event = {"id": entry_id, "time": int(entry_id.split("-")[0]) / 1000, "type": fields.get("e")}
+    if event["type"] == "module":
+        event["idx"] = int(fields["i"])
+        event["swapped"] = fields.get("s") == "1"
+    else:
+        event["status"] = fields.get("s")
+    event["message"] = fields.get("m") or None
+    return event
+
+def get_status_history(swap_id, before=None, count=50):
+    """
+    Page through a swap session's status changes, newest first.
+
+    Args:
+        swap_id (str): Unique swap session ID.
+        before (str): Only return events older than this event id (the last id of the previous page).
+        count (int): Maximum number of events to return.
+
+    Returns:
+        list: Events, newest first.
+    """
+    with REDIS_OP_SECONDS.time(op="get_status_history"):
+        entries = redis_client.xrevrange(log_key(swap_id), max=f"({before}" if before else "+", min="-", count=count)
+    return [_to_event(entry_id, fields) for entry_id, fields in entries]
+
+def update_status(swap_id, idx, message, success=False):
+    """
+    Updates the status of a specific module swap in Redis.
+
+    Args:
+        swap_id (str): Unique swap session ID.
+        idx (int): Index of the module in the details list.
+        message (str): Message to update in the status.
+        success (bool): Whether the swap was successful.
+    """
+    patch = json.dumps({"type": "module", "idx": idx, "message": message, "swapped": success or None})
+    with REDIS_OP_SECONDS.time(op="update_status"):
+        _update_module(
+            keys=[status_key(swap_id), details_key(swap_id), events_channel(swap_id), log_key(swap_id)],
+            args=[idx, message, "1" if success else "0", patch, config.STATUS_LOG_MAXLEN, config.STATUS_TTL]
+        )
+
+def update_overall_status(swap_id, status, message):
+    """
+    Updates the overall status and message of the swap operation in Redis.
+
+    Args:
+        swap_id (str): Unique swap session ID.
+        status (str): The overall status to set (e.g., "Error", "Completed").
+        message (str): The overall message to set.
+    """
+    patch = json.dumps({"type": "overall", "status": status, "message": message or None})
+    with REDIS_OP_SECONDS.time(op="update_overall_status"):
+        _update_overall(
+            keys=[status_key(swap_id), events_channel(swap_id), details_key(swap_id), log_key(swap_id)],
+            args=[status, message or "", patch, config.STATUS_LOG_MAXLEN, config.STATUS_TTL]
+        )
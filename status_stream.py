@@ -0,0 +1,109 @@
+import json
+import logging
+import queue
+import threading
+import time
+import config
+from status_store import redis_client, get_status_data
+
+logger = logging.getLogger(__name__)
+
+KEEPALIVE_SECONDS = 15  # Comment line sent when idle so proxies keep the connection open
+
+
+class StatusBroadcaster:
+    """
+    Fans status patches from Redis pub/sub out to every open /swap-status/stream
+    in this process.
+
+    The whole process shares one pattern subscription (and so one Redis
+    connection) no matter how many browsers are listening; each listener gets
+    its own bounded in-memory queue.
+
+    Every open stream holds a server thread, so at most max_streams are open
+    at once; the rest of the threads stay free for ordinary requests.
+    """
+
+    def __init__(self, client, max_streams):
+        self.client = client
+        self.listeners = {}  # swap_id -> set of queues
+        self.lock = threading.Lock()
+        self.started = False
+        self.stream_slots = threading.BoundedSemaphore(max_streams)
+
+    def _ensure_started(self):
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+        threading.Thread(target=self._listen, name="status-broadcaster", daemon=True).start()
+
+    def _listen(self):
+        while True:
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.psubscribe("status:*:events")
+                for message in pubsub.listen():
+                    if message["type"] != "pmessage":
+                        continue
+                    swap_id = message["channel"][len("status:"):-len(":events")]
+                    with self.lock:
+                        targets = list(self.listeners.get(swap_id, ()))
+                    for target in targets:
+                        try:
+                            target.put_nowait(message["data"])
+                        except queue.Full:
+                            pass  # A stalled browser only loses patches; it resyncs on reconnect
+            except Exception as e:
+                logger.error(f"Status broadcaster lost its Redis subscription: {e}")
+                time.sleep(1)
+
+    def subscribe(self, swap_id):
+        self._ensure_started()
+        listener = queue.Queue(maxsize=100)
+        with self.lock:
+            self.listeners.setdefault(swap_id, set()).add(listener)
+        return listener
+
+    def open_stream(self):
+        """
+        Take a stream slot. Returns False if max_streams are already open.
+        Pair every successful call with close_stream().
+        """
+        return self.stream_slots.acquire(blocking=False)
+
+    def close_stream(self):
+        self.stream_slots.release()
+
+    def unsubscribe(self, swap_id, listener):
+        with self.lock:
+            listeners = self.listeners.get(swap_id)
+            if listeners:
+                listeners.discard(listener)
+                if not listeners:
+                    del self.listeners[swap_id]
+
+    def stream(self, swap_id, max_seconds):
+        """
+        Generate Server-Sent Events for one swap session: a full snapshot first,
+        then a patch for every status update, for up to max_seconds (the browser
+        reconnects automatically after that).
+        """
+        listener = self.subscribe(swap_id)
+        try:
+            # Subscribe before reading the snapshot so no update slips between the two
+            snapshot = get_status_data(swap_id)
+            yield f"event: snapshot\ndata: {json.dumps(snapshot)}\n\n"
+
+            deadline = time.time() + max_seconds
+            while time.time() < deadline:
+                try:
+                    data = listener.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"data: {data}\n\n"
+        finally:
+            self.unsubscribe(swap_id, listener)
+
+broadcaster = StatusBroadcaster(redis_client, config.STATUS_STREAM_MAX)
@@ -0,0 +1,95 @@
+import logging
+import time
+import uuid
+import config
+import capacity
+import launcher
+from status_store import set_status_data, delete_status_data, update_overall_status
+
+logger = logging.getLogger(__name__)
+
+# Starting swap jobs, shared by the browser form (/swap-index) and the bulk JSON API (/api/jobs).
+
+def parse_new_indexes(raw):
+    """
+    Accepts "80271, 80272" (as typed in the form) or ["80271", "80272"].
+    """
+    if isinstance(raw, str):
+        raw = raw.split(",")
+    return [str(index).strip() for index in raw if str(index).strip()]
+
+def swap_items_from(swaps):
+    """
+    Validate the modules of one job as sent to the JSON API.
+
+    Args:
+        swaps (list): Dicts with old_index and new_indexes (a list, or a comma separated string).
+
+    Returns:
+        list: swap_items for perform_swaps.
+
+    Raises:
+        ValueError: If a module is missing its old index or new indexes.
+    """
+    if not isinstance(swaps, list) or not swaps:
+        raise ValueError("swaps must be a non-empty list")
+    swap_items = []
+    for i, swap in enumerate(swaps):
+        if not isinstance(swap, dict):
+            raise ValueError(f"Module {i + 1} must be an object")
+        old_index = str(swap.get("old_index") or "").strip()
+        new_indexes = parse_new_indexes(swap.get("new_indexes") or [])
+        if not old_index:
+            raise ValueError(f"Missing old index for module {i + 1}")
+        if not new_indexes:
+            raise ValueError(f"Invalid new index data for module {i + 1}")
+        swap_items.append({"old_index": old_index, "new_indexes": new_indexes, "swapped": False})
+    return swap_items
+
+def submit(username, password, swap_items):
+    """
+    Create the status for a new swap job and start, queue or park it.
+
+    Returns:
+        tuple: (swap_id, status_data as first shown on the status page)
+
+    Raises:
+        capacity.CapacityFull: If the queue is full; nothing is left behind in Redis.
+    """
+    # Generate a unique ID for this swap session; the same student may submit twice within a second
+    swap_id = f"{username}_{uuid.uuid4().hex}"
+
+    # Jobs submitted outside portal hours wait for it to open instead of failing
+    opening = launcher.next_opening()
+
+    # Initialize Redis with status data
+    status_data = {
+        "status": "Scheduled" if opening else "Processing",
+        "details": [{"old_index": item["old_index"],
+                     "new_indexes": ", ".join(item["new_indexes"]),
+                     "swapped": False,
+                     "message": "Pending..."} for item in swap_items],
+        "message": f"The portal is closed now. Your swap will start when it opens at {config.PORTAL_OPEN}." if opening else None
+    }
+    # A parked job's status has to last until the portal opens, as nothing updates it before then
+    set_status_data(swap_id, status_data, ttl=config.STATUS_TTL + (opening - time.time() if opening else 0))
+
+    try:
+        if opening:
+            # Park the job without taking a slot; it is released in a staggered burst just before opening
+            capacity.park(swap_id, username, password, swap_items, opening)
+            position = 0
+        else:
+            # Start the job, or queue it behind others while every slot is busy
+            position = capacity.admit(swap_id, username, password, swap_items)
+    except capacity.CapacityFull as e:
+        # Turn the submission away quickly instead of running the container out of memory
+        delete_status_data(swap_id)
+        logger.warning(f"Rejected swap job {swap_id}: {e}")
+        raise
+
+    if position:
+        status_data["status"] = capacity.QUEUED_STATUS
+        status_data["message"] = capacity.queue_message(position)
+        update_overall_status(swap_id, status=status_data["status"], message=status_data["message"])
+    return swap_id, status_data
@@ -0,0 +1,275 @@
+import logging
+import random
+import time
+import config
+import flight_recorder
+import session_cache
+import vacancy_cache
+from metrics import ACTIVE_JOBS
+from planner import SwapPlanner
+from rate_limiter import RateLimited
+from scheduler import PollScheduler
+from status_store import update_status, update_overall_status
+from engines import create_engine, EngineCrashed
+from engines.base import no_vacancy_message, pick_index
+
+logger = logging.getLogger(__name__)
+
+TIME_LIMIT = 2 * 3600  # Give up after 2 hours
+
+def _wait(seconds, should_stop):
+    """
+    Sleep for up to seconds, waking early if should_stop() becomes True.
+    Returns True if the wait was interrupted.
+    """
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        if should_stop():
+            return True
+        time.sleep(min(5, max(0, deadline - time.time())))
+    return should_stop()
+
+def _login(login, should_stop):
+    """
+    Run login() (the engine's authenticate or resume), retrying while the shared portal
+    rate limit is saturated, e.g. by a burst of logins at opening, instead of failing the job.
+    Returns login()'s result, or False if the job was stopped while waiting.
+    """
+    while True:
+        try:
+            return login()
+        except RateLimited as e:
+            logger.warning(f"Login is waiting for the portal rate limit: {e}")
+            if should_stop():
+                return False
+
+def _cached_vacancies(new_indexes):
+    """
+    Returns (vacancy table, age in seconds) if the shared cache says every
+    candidate index is full, or None if the portal should be checked.
+    """
+    if config.VACANCY_CACHE_TTL <= 0:
+        return None
+    try:
+        worth_visiting, cached = vacancy_cache.may_have_vacancy(new_indexes)
+    except Exception as e:
+        logger.warning(f"Vacancy cache unavailable: {e}")
+        return None
+    if worth_visiting:
+        return None
+    table = {index: (entry[0], entry[1]) for index, entry in cached.items()}
+    age = time.time() - min(entry[2] for entry in cached.values())
+    return table, age
+
+def _share_vacancies(vacancies):
+    if config.VACANCY_CACHE_TTL <= 0:
+        return
+    try:
+        vacancy_cache.record(vacancies)
+    except Exception as e:
+        logger.warning(f"Failed to update vacancy cache: {e}")
+
+def perform_swaps(username, password, swap_items, swap_id, start_time=None, checkpoint=None, should_stop=None):
+    """
+    Keep attempting the requested swaps until all are done or the time limit is reached.
+
+    Args:
+        username (str): Portal username.
+        password (str): Portal password.
+        swap_items (list): Dicts with old_index, new_indexes and swapped. Items already
+            marked swapped (e.g. from a resumed job) are skipped.
+        swap_id (str): Unique swap session ID.
+        start_time (float): When the job was first started, so a resumed job keeps its time limit.
+        checkpoint (callable): Called with swap_items after every successful swap.
+        should_stop (callable): Returns True when the job should stop early (cancelled or worker shutdown).
+
+    Returns:
+        bool: True if the job finished (completed, timed out or failed), False if it was stopped early.
+    """
+    # Tag everything the job logs with its swap_id and keep its flight recorder
+    with flight_recorder.recording(swap_id):
+        return _perform_swaps(username, password, swap_items, swap_id, start_time, checkpoint, should_stop)
+
+def _perform_swaps(username, password, swap_items, swap_id, start_time, checkpoint, should_stop):
+    should_stop = should_stop or (lambda: False)
+    scheduler = PollScheduler()
+    planner = SwapPlanner(swap_items)
+    engine = None
+    ACTIVE_JOBS.inc()
+
+    try:
+        # Submitted while the portal is closed: sleep until shortly before it opens
+        opens_in = scheduler.seconds_until_open()
+        if opens_in > config.LAUNCH_LEAD_SECONDS:
+            if _wait(opens_in - config.LAUNCH_LEAD_SECONDS, should_stop):
+                return False
+        start_time = start_time or time.time()  # The time limit starts once the job can run
+
+        # Start a portal session with the engine selected for this deployment
+        engine = create_engine(swap_id)
+        if not _login(lambda: engine.authenticate(username, password), should_stop):
+            return not should_stop()
+
+        # Logged in ahead of opening; hold the session and make the first check as the portal opens
+        opens_in = scheduler.seconds_until_open()
+        if opens_in > 0:
+            update_overall_status(swap_id, status="Scheduled", message=f"Logged in. Checking as soon as the portal opens at {config.PORTAL_OPEN}.")
+            if _wait(opens_in + random.uniform(0, config.LAUNCH_SPREAD), should_stop):
+                return False
+            update_overall_status(swap_id, status="Processing", message="")
+
+        while True:
+            vacancies = {}
+            # Modules other modules' clashes may depend on go first
+            visits = []
+            for idx in planner.order():
+                # Never retry an index known to clash with the current timetable
+                candidates = planner.candidates(idx)
+                if not candidates:
+                    update_status(swap_id, idx, message=f"Index {', '.join(planner.blocked(idx))} clash with your timetable. Waiting for your other swaps to go through.")
+                    continue
+
+                # Skip the portal when another job has just seen every candidate full
+                cached = _cached_vacancies(candidates)
+                if cached is not None:
+                    table, age = cached
+                    vacancies.update(table)
+                    update_status(swap_id, idx, message=f"{no_vacancy_message(candidates, table)} (checked {int(age)}s ago)")
+                    continue
+                visits.append((idx, candidates))
+
+            # Read every module's vacancies at once; only modules with a free candidate need a swap visit
+            checks = {}
+            if config.PARALLEL_CHECKS > 1 and len(visits) > 1:
+                try:
+                    checks = engine.check_vacancies([swap_items[idx]["old_index"] for idx, _ in visits], config.PARALLEL_CHECKS)
+                except EngineCrashed as e:
+                    logger.error(f"Engine error: {e}")
+                    engine.restart()
+                    _login(lambda: engine.authenticate(username, password), should_stop)
+                except Exception as e:
+                    logger.error(f"Parallel vacancy check failed, checking modules one by one: {e}")
+
+            portal_closed = False
+            for idx, candidates in visits:
+                item = swap_items[idx]
+                if should_stop():
+                    return False
+                try:
+                    check = checks.get(item["old_index"])
+                    if check is not None and check.closed:
+                        portal_closed = True
+                        break
+                    if check is not None:
+                        vacancies.update(check.vacancies)
+                        _share_vacancies(check.vacancies)
+                        if pick_index(candidates, check.vacancies) is None:
+                            update_status(swap_id, idx, message=check.message or no_vacancy_message(candidates, check.vacancies))
+                            continue
+
+                    # One change index page visit checks every candidate index for this module;
+                    # after a clash, go straight on to the next candidate that has a vacancy
+                    while True:
+                        attempt = engine.attempt_swap(
+                            old_index=item["old_index"],
+                            new_indexes=candidates,
+                            idx=idx
+                        )
+                        if attempt.closed:
+                            break
+                        vacancies.update(attempt.vacancies)
+                        _share_vacancies(attempt.vacancies)
+                        if not attempt.clash:
+                            break
+                        planner.record_clash(idx, attempt.new_index)
+                        candidates = planner.candidates(idx)
+                        if pick_index(candidates, attempt.vacancies) is None:
+                            break
+
+                    if attempt.closed:
+                        # No other module can be swapped either; wait for the portal below
+                        portal_closed = True
+                        break
+                    if attempt.success:
+                        planner.record_swap(idx, attempt.new_index)
+                        update_status(
+                            swap_id,
+                            idx,
+                            message=f"Successfully swapped index {item['old_index']} to {attempt.new_index}.",
+                            success=True
+                        )
+                        if checkpoint:
+                            checkpoint(swap_items)
+                    elif attempt.message:
+                        update_status(swap_id, idx, message=attempt.message)
+                except EngineCrashed as e:
+                    logger.error(f"Engine error: {e}")
+                    engine.restart()  # Restart the browser/session
+                    _login(lambda: engine.authenticate(username, password), should_stop)  # Reuses the cached session cookies when still valid
+                except Exception as e:
+                    error_message = f"Error during swap attempt: {e}"
+                    update_status(swap_id, idx, message=error_message)
+                    logger.error(error_message)
+            # Check if all items are swapped
+            all_swapped = all(item["swapped"] for item in swap_items)
+            if all_swapped:
+                update_overall_status(swap_id, status="Completed", message=f"All modules have been successfully swapped.")
+                return True
+
+            # Clashes only clear when the timetable changes, which needs a module that can still be swapped
+            if not any(planner.candidates(idx) for idx in planner.order()):
+                message = "Every remaining index clashes with your timetable."
+                update_overall_status(swap_id, status="Error", message=message)
+                logger.error(message)
+                return True
+
+            if time.time() - start_time >= TIME_LIMIT:
+                update_overall_status(swap_id, status="Timed Out", message="Time limit reached before completing the swap.")
+                logger.error("Time limit reached before completing the swap.")
+                return True
+
+            # Let the scheduler pick the next check based on what we just saw. It never picks
+            # a time outside portal hours, so a portal closed by the clock sleeps until it opens
+            scheduler.observe(vacancies)
+            delay = scheduler.next_delay()
+            if portal_closed:
+                # The portal turned the job away; wait for it rather than failing the job
+                message = f"The portal is closed. Your swap will resume when it opens at {config.PORTAL_OPEN}." if scheduler.seconds_until_open() else \
+                    "The portal is closed. Your swap will resume when it reopens."
+                update_overall_status(swap_id, status="Scheduled", message=message)
+                logger.warning(message)
+                delay = max(delay, scheduler.seconds_until_open())
+            remaining = start_time + TIME_LIMIT - time.time()
+            if delay >= remaining:
+                if not scheduler.is_open(time.time() + remaining):
+                    update_overall_status(swap_id, status="Timed Out", message="Time limit reached before the portal reopens.")
+                    logger.error("Time limit reached before the portal reopens.")
+                    return True
+                delay = remaining  # One last check right at the time limit
+
+            # Hand the browser back to the pool instead of holding it through a long wait
+            suspended = delay >= config.SUSPEND_THRESHOLD
+            if suspended:
+                engine.suspend()
+            elif engine.refresh() and not _login(lambda: engine.authenticate(username, password), should_stop):
+                return not should_stop()
+            if _wait(delay, should_stop):
+                return False
+            if suspended and not _login(lambda: engine.resume(username, password), should_stop):
+                return not should_stop()
+            if portal_closed:
+                update_overall_status(swap_id, status="Processing", message="")
+    except Exception as e:
+        update_overall_status(swap_id, status="Error", message=f"An error occurred: {str(e)}")
+        logger.error(f"An error occurred: {str(e)}")
+        return True
+    finally:
+        ACTIVE_JOBS.dec()
+        if engine:
+            engine.close()
+        if not should_stop():
+            # The job is over; a job stopped for a worker shutdown keeps its session for the next worker
+            try:
+                session_cache.clear(swap_id)
+            except Exception as e:
+                logger.warning(f"Failed to clear cached portal session: {e}")
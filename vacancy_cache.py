@@ -0,0 +1,80 @@
+import time
+import config
+from status_store import redis_client
+
+# Vacancies seen by any job, shared across users:
+#   vacancy:<index>      hash with vacancies, waitlist, observed_at (expires after VACANCY_CACHE_TTL)
+#   vacancy_cache:stats  hash with hits, misses, age_total (sum of ages of cache hits, in seconds)
+
+STATS_KEY = "vacancy_cache:stats"
+
+def vacancy_key(index):
+    return f"vacancy:{index}"
+
+def record(vacancies, observed_at=None):
+    """
+    Store a vacancy table parsed from the new_index_nmbr dropdown.
+
+    Args:
+        vacancies (dict): index -> (vacancies, waitlist)
+    """
+    if not vacancies:
+        return
+    observed_at = observed_at or time.time()
+    pipe = redis_client.pipeline(transaction=False)
+    for index, (vacancy_count, waitlist) in vacancies.items():
+        pipe.hset(vacancy_key(index), mapping={
+            "vacancies": vacancy_count,
+            "waitlist": waitlist,
+            "observed_at": observed_at
+        })
+        pipe.expire(vacancy_key(index), config.VACANCY_CACHE_TTL)
+    pipe.execute()
+
+def lookup(indexes):
+    """
+    Read cached vacancies for the given indexes.
+
+    Returns:
+        dict: index -> (vacancies, waitlist, observed_at) for every index found in the cache.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    for index in indexes:
+        pipe.hgetall(vacancy_key(index))
+    cached = {}
+    for index, entry in zip(indexes, pipe.execute()):
+        if entry:
+            cached[index] = (int(entry["vacancies"]), int(entry["waitlist"]), float(entry["observed_at"]))
+    return cached
+
+def may_have_vacancy(new_indexes):
+    """
+    Decide whether a portal visit is worth making for these candidate indexes.
+
+    Returns:
+        tuple: (bool, cached) - False only when every candidate is cached as full.
+    """
+    cached = lookup(new_indexes)
+    now = time.time()
+    hit = len(cached) == len(new_indexes) and all(entry[0] <= 0 for entry in cached.values())
+
+    pipe = redis_client.pipeline(transaction=False)
+    if hit:
+        pipe.hincrby(STATS_KEY, "hits", 1)
+        pipe.hincrbyfloat(STATS_KEY, "age_total", max(now - entry[2] for entry in cached.values()))
+    else:
+        pipe.hincrby(STATS_KEY, "misses", 1)
+    pipe.execute()
+    return not hit, cached
+
+def stats():
+    entry = redis_client.hgetall(STATS_KEY)
+    hits = int(entry.get("hits", 0))
+    misses = int(entry.get("misses", 0))
+    return {
+        "ttl_seconds": config.VACANCY_CACHE_TTL,
+        "hits": hits,
+        "misses": misses,
+        "hit_rate": round(hits / (hits + misses), 3) if hits + misses else None,
+        "avg_hit_age_seconds": round(float(entry.get("age_total", 0)) / hits, 1) if hits else None
+    }
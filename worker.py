@@ -0,0 +1,201 @@
+import argparse
+import logging
+import os
+import signal
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import capacity
+import config
+import flight_recorder
+import job_queue
+import launcher
+import metrics
+from status_store import update_overall_status
+from swapper import perform_swaps
+
+logger = logging.getLogger("worker")
+
+REAP_INTERVAL = 15  # Seconds between scans for jobs orphaned by crashed workers
+POLL_INTERVAL = 1  # Seconds to wait when the queue is empty
+LAUNCH_INTERVAL = 1  # Seconds between releases of parked jobs
+
+
+class Worker:
+    """
+    Claims swap jobs from the Redis queue and runs each one in its own thread.
+    Run as many worker processes, on as many nodes, as needed.
+    """
+
+    def __init__(self, concurrency):
+        self.concurrency = concurrency
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self.jobs = {}  # swap_id -> (thread, stop event)
+        self.lock = threading.Lock()
+        self.stopping = threading.Event()
+
+    def run(self):
+        logger.info(f"Worker {self.worker_id} started with concurrency {self.concurrency}.")
+        self._advertise()
+        threading.Thread(target=self._heartbeat_loop, name="heartbeat", daemon=True).start()
+
+        last_reap = 0
+        last_launch = 0
+        while not self.stopping.is_set():
+            if time.time() - last_reap >= REAP_INTERVAL:
+                self._reap()
+                last_reap = time.time()
+            if time.time() - last_launch >= LAUNCH_INTERVAL:
+                self._launch()
+                last_launch = time.time()
+
+            job = None
+            with self.lock:
+                has_capacity = len(self.jobs) < self.concurrency
+            if has_capacity:
+                try:
+                    job = job_queue.claim(self.worker_id)
+                except Exception as e:
+                    logger.error(f"Failed to claim job: {e}")
+            if job:
+                self._start(job)
+            else:
+                self.stopping.wait(POLL_INTERVAL)
+
+        # Graceful shutdown: stop every job and hand it back to the queue
+        with self.lock:
+            running = list(self.jobs.items())
+        for swap_id, (thread, stop) in running:
+            stop.set()
+        for swap_id, (thread, stop) in running:
+            thread.join()
+        try:
+            capacity.unregister_worker(self.worker_id)
+        except Exception as e:
+            logger.error(f"Failed to unregister worker: {e}")
+        logger.info(f"Worker {self.worker_id} stopped.")
+
+    def shutdown(self, *args):
+        self.stopping.set()
+
+    def _start(self, job):
+        stop = threading.Event()
+        thread = threading.Thread(target=self._run_job, args=(job, stop), name=job["swap_id"], daemon=True)
+        with self.lock:
+            self.jobs[job["swap_id"]] = (thread, stop)
+        logger.info(f"Claimed job {job['swap_id']} (attempt {job['attempts']}).")
+        thread.start()
+
+    def _run_job(self, job, stop):
+        swap_id = job["swap_id"]
+        try:
+            update_overall_status(swap_id, status="Processing", message="")  # Out of the queue
+            finished = perform_swaps(
+                job["username"],
+                job["password"],
+                job["swap_items"],
+                swap_id,
+                start_time=job["started_at"],
+                checkpoint=lambda swap_items: job_queue.checkpoint(swap_id, swap_items),
+                should_stop=stop.is_set
+            )
+            if finished:
+                job_queue.complete(swap_id)
+            elif self.stopping.is_set():
+                # Worker is shutting down; let another worker resume from the last checkpoint
+                job_queue.release(swap_id, self.worker_id)
+            # Otherwise the job was cancelled or reclaimed, so there is nothing to clean up
+        except Exception as e:
+            logger.error(f"Job {swap_id} failed: {e}")
+        finally:
+            with self.lock:
+                self.jobs.pop(swap_id, None)
+
+    def _launch(self):
+        try:
+            launcher.prewarm()
+            launcher.release_due()
+        except Exception as e:
+            logger.error(f"Failed to release parked jobs: {e}")
+
+    def _advertise(self):
+        # Let the web process count this worker's slots in /capacity
+        try:
+            capacity.register_worker(self.worker_id, self.concurrency, ttl=config.JOB_LEASE_SECONDS)
+        except Exception as e:
+            logger.error(f"Failed to advertise worker slots: {e}")
+
+    def _heartbeat_loop(self):
+        while True:
+            time.sleep(config.JOB_LEASE_SECONDS / 3)
+            self._advertise()
+            with self.lock:
+                running = list(self.jobs.items())
+            for swap_id, (thread, stop) in running:
+                try:
+                    if not job_queue.heartbeat(swap_id, self.worker_id):
+                        logger.info(f"Lost lease on job {swap_id}; stopping it.")
+                        stop.set()
+                except Exception as e:
+                    logger.error(f"Heartbeat failed for job {swap_id}: {e}")
+
+    def _reap(self):
+        try:
+            requeued, dropped = job_queue.requeue_expired()
+        except Exception as e:
+            logger.error(f"Failed to requeue expired jobs: {e}")
+            return
+        for swap_id in requeued:
+            logger.info(f"Requeued orphaned job {swap_id}.")
+        for swap_id in dropped:
+            update_overall_status(swap_id, status="Error", message="The swap job failed repeatedly and was stopped.")
+            logger.error(f"Dropped job {swap_id} after {job_queue.MAX_ATTEMPTS} attempts.")
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = metrics.render().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass  # Scrapes would otherwise flood the worker log
+
+
+def serve_metrics(port):
+    """
+    Expose this worker's metrics for Prometheus; the swaps run here, not in the web process.
+    """
+    server = ThreadingHTTPServer(("0.0.0.0", port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+    logger.info(f"Serving metrics on port {port}.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run swap jobs from the Redis queue.")
+    parser.add_argument("--concurrency", type=int, default=config.WORKER_CONCURRENCY,
+                        help="Number of swap jobs this process runs at once (default: sized from the memory budget).")
+    parser.add_argument("--metrics-port", type=int, default=config.WORKER_METRICS_PORT,
+                        help="Port for the Prometheus metrics endpoint (0 disables it).")
+    args = parser.parse_args()
+
+    flight_recorder.setup_logging(logging.INFO)
+
+    if args.metrics_port:
+        serve_metrics(args.metrics_port)
+
+    concurrency = args.concurrency or capacity.max_concurrent_jobs()
+    if config.DRIVER_POOL_SIZE <= 0:
+        config.DRIVER_POOL_SIZE = concurrency  # One browser per job slot
+    worker = Worker(concurrency)
+    signal.signal(signal.SIGTERM, worker.shutdown)
+    signal.signal(signal.SIGINT, worker.shutdown)
+    worker.run()
+
+if __name__ == '__main__':
+    main()